@@ -1,19 +1,655 @@
+import asyncio
+import contextvars
+import functools
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
 import mysql.connector
 from mysql.connector import Error
 
+from app.utils import metricas
+
+logger = logging.getLogger(__name__)
+
+# Configuración de la conexión (se puede sobrescribir con variables de entorno)
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "sistema-notas-db.ctmika2a025d.us-east-2.rds.amazonaws.com"),  # Tu Endpoint de AWS
+    "database": os.getenv("DB_NAME", "sistema_notas"),
+    "user": os.getenv("DB_USER", "admin"),                    # Tu Master username
+    "password": os.getenv("DB_PASSWORD", "GoMyGCRTES12*"),    # Tu Master password
+    "port": int(os.getenv("DB_PORT", "3306")),
+    "auth_plugin": "mysql_native_password",
+}
+
+# Configuración del pool de conexiones
+POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+POOL_BORROW_TIMEOUT = float(os.getenv("DB_POOL_BORROW_TIMEOUT", "5"))     # segundos esperando una conexión libre
+POOL_RECYCLE_SECONDS = float(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))  # vida máxima de una conexión
+POOL_HEALTHCHECK_IDLE = float(os.getenv("DB_POOL_HEALTHCHECK_IDLE", "30"))  # ping si estuvo ociosa más de esto
+
+# Hilos dedicados a ejecutar consultas bloqueantes desde los handlers async.
+# Por defecto igual al máximo del pool: más hilos solo esperarían una conexión libre.
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", str(POOL_MAX_SIZE)))
+
+# Las sentencias que tarden más que esto se registran en el log como WARNING
+SLOW_QUERY_SECONDS = float(os.getenv("DB_SLOW_QUERY_SECONDS", "0.5"))
+
+# Réplicas de lectura: "host[:puerto],host[:puerto]". Vacío = todo va al primario.
+DB_REPLICA_HOSTS = os.getenv("DB_REPLICA_HOSTS", "")
+DB_REPLICA_POOL_MAX_SIZE = int(os.getenv("DB_REPLICA_POOL_MAX_SIZE", str(POOL_MAX_SIZE)))
+DB_REPLICA_RETRY_SECONDS = float(os.getenv("DB_REPLICA_RETRY_SECONDS", "30"))   # réplica caída: no reintentar antes
+DB_REPLICA_BORROW_TIMEOUT = float(os.getenv("DB_REPLICA_BORROW_TIMEOUT", "1"))  # espera máxima antes de probar otra
+# Tras un commit, las lecturas del mismo usuario van al primario durante este tiempo (lag de replicación)
+DB_READ_YOUR_WRITES_SECONDS = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "5"))
+
+
+def _crear_conexion_mysql(config=None):
+    connection = mysql.connector.connect(**(config or DB_CONFIG))
+    if not connection.is_connected():
+        raise Error("La conexión no quedó activa")
+    return connection
+
+
+def _crear_conexion_replica(host, port):
+    connection = _crear_conexion_mysql({**DB_CONFIG, "host": host, "port": port})
+    # Una escritura accidental en la réplica falla en lugar de divergir del primario
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SET SESSION TRANSACTION READ ONLY")
+    finally:
+        cursor.close()
+    return connection
+
+
+def _parsear_replicas(valor: str):
+    replicas = []
+    for parte in valor.split(","):
+        parte = parte.strip()
+        if not parte:
+            continue
+        host, _, port = parte.partition(":")
+        replicas.append((host, int(port) if port else DB_CONFIG["port"]))
+    return replicas
+
+
+class PoolTimeoutError(Error):
+    """No se obtuvo una conexión del pool dentro del tiempo de espera."""
+
+
+# ---------------------- Conteo de consultas ----------------------
+_contador_actual = contextvars.ContextVar("contador_consultas", default=None)
+
+
+class ContadorConsultas:
+    """Sentencias enviadas a la base de datos (incluye COMMIT) dentro de un contexto."""
+
+    def __init__(self):
+        self.total = 0
+        self.sentencias = []
+
+    def registrar(self, sql: str):
+        self.total += 1
+        self.sentencias.append(" ".join(sql.split())[:120])
+
+
+@contextmanager
+def contar_consultas():
+    """
+    Cuenta las sentencias ejecutadas dentro del bloque, también las que corren
+    en el executor vía run_db (que copia las context vars).
+    """
+    contador = ContadorConsultas()
+    token = _contador_actual.set(contador)
+    try:
+        yield contador
+    finally:
+        _contador_actual.reset(token)
+
+
+# ---------------------- Lecturas propias tras escribir ----------------------
+_sesion_actual = contextvars.ContextVar("sesion_lectura", default=None)
+
+
+class MarcasLocales:
+    """
+    Marcas con vencimiento ("el usuario 42 escribió", "cambió el grupo notas") en
+    memoria del proceso: solo protegen las lecturas atendidas por el mismo worker.
+    Con CACHE_BACKEND=redis la caché instala su backend (usar_marcas) y la ventana
+    vale para todos los workers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._vencen = {}  # clave -> instante (monotonic) en que deja de valer
+
+    def marcar(self, clave, segundos):
+        ahora = time.monotonic()
+        with self._lock:
+            self._vencen[clave] = ahora + segundos
+            if len(self._vencen) > 10000:
+                # Olvidar las marcas que ya salieron de la ventana
+                for otra, vence in list(self._vencen.items()):
+                    if vence <= ahora:
+                        del self._vencen[otra]
+
+    def alguna_vigente(self, claves):
+        ahora = time.monotonic()
+        with self._lock:
+            return any(self._vencen.get(clave, 0) > ahora for clave in claves)
+
+
+_marcas = MarcasLocales()
+
+
+def usar_marcas(marcas):
+    """Reemplaza dónde se guardan las marcas de lecturas propias (lo llama la caché con Redis)."""
+    global _marcas
+    _marcas = marcas
+
+
+class SesionLectura:
+    """Estado de una petición para decidir si sus lecturas pueden ir a una réplica."""
+
+    def __init__(self):
+        self.clave = None
+        self.escribio = False
+
+
+@contextmanager
+def sesion_lectura():
+    """
+    Abarca una petición: después de un commit en el primario, las lecturas siguientes
+    de la petición (y del mismo usuario por DB_READ_YOUR_WRITES_SECONDS) van al primario.
+    """
+    sesion = SesionLectura()
+    token = _sesion_actual.set(sesion)
+    try:
+        yield sesion
+    finally:
+        _sesion_actual.reset(token)
+
+
+def identificar_sesion(clave):
+    """Asocia la petición en curso a un usuario (lo llama la autenticación)."""
+    sesion = _sesion_actual.get()
+    if sesion is not None:
+        sesion.clave = clave
+
+
+def _marcar_escritura():
+    sesion = _sesion_actual.get()
+    if sesion is None:
+        return
+    sesion.escribio = True
+    if sesion.clave is not None and _get_lectores():
+        _guardar_marca(f"sesion:{sesion.clave}")
+
+
+def registrar_cambio(grupo):
+    """
+    Lo llama la caché al invalidar un grupo. Durante DB_READ_YOUR_WRITES_SECONDS las
+    lecturas de ese grupo van al primario: un resultado leído de una réplica atrasada
+    quedaría guardado en la caché (o bajo el ETag nuevo) como si fuera actual.
+    Con la caché en memoria esto solo vale para el worker que invalidó.
+    """
+    if _get_lectores():
+        _guardar_marca(f"grupo:{grupo}")
+
+
+def _guardar_marca(clave):
+    try:
+        _marcas.marcar(clave, DB_READ_YOUR_WRITES_SECONDS)
+    except Exception as e:
+        logger.warning("⚠️ No se pudo registrar la escritura reciente %s: %s", clave, e)
+
+
+def _debe_leer_del_primario(grupos):
+    sesion = _sesion_actual.get()
+    if sesion is not None and sesion.escribio:
+        return True
+    claves = [sesion.clave] if sesion is not None and sesion.clave is not None else []
+    if not claves and not grupos:
+        return False
+    marcas = [f"sesion:{clave}" for clave in claves] + [f"grupo:{grupo}" for grupo in grupos]
+    try:
+        return _marcas.alguna_vigente(marcas)
+    except Exception as e:
+        # Sin saber si hubo escrituras recientes, el primario es la opción segura
+        logger.warning("⚠️ No se pudieron consultar las escrituras recientes: %s", e)
+        return True
+
+
+def _registrar_sentencia(sql):
+    contador = _contador_actual.get()
+    if contador is not None:
+        contador.registrar(sql if isinstance(sql, str) else sql.decode())
+
+
+def _medir_sentencia(sql, duracion):
+    sql = sql if isinstance(sql, str) else sql.decode()
+    metricas.registrar_consulta(sql, duracion)
+    if duracion >= SLOW_QUERY_SECONDS:
+        logger.warning("Consulta lenta", extra={
+            "sentencia": metricas.etiqueta_sentencia(sql),
+            "duracion_ms": round(duracion * 1000, 2),
+            "sql": " ".join(sql.split())[:300],
+        })
+
+
+class _CursorContado:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        _registrar_sentencia(operation)
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            _medir_sentencia(operation, time.perf_counter() - inicio)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        _registrar_sentencia(operation)
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            _medir_sentencia(operation, time.perf_counter() - inicio)
+
+
+class PooledConnection:
+    """
+    Envoltorio de una conexión del pool.
+    Se usa igual que una conexión normal; close() la devuelve al pool en lugar de cerrarla.
+    """
+
+    def __init__(self, pool, raw, creada_en):
+        self._pool = pool
+        self._raw = raw
+        self.creada_en = creada_en
+        self.usada_en = time.monotonic()
+        self._prestada = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        return _CursorContado(self._raw.cursor(*args, **kwargs))
+
+    def commit(self):
+        _registrar_sentencia("COMMIT")
+        inicio = time.perf_counter()
+        try:
+            return self._raw.commit()
+        finally:
+            _medir_sentencia("COMMIT", time.perf_counter() - inicio)
+            if self._pool.escritura:
+                _marcar_escritura()
+
+    def close(self):
+        if self._prestada:
+            self._pool._devolver(self)
+
+    def discard(self):
+        """Cierra la conexión de verdad en lugar de devolverla (p. ej. con resultados sin leer)."""
+        if self._prestada:
+            self._pool._devolver(self, descartar=True)
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones con tamaño mínimo/máximo, verificación de salud,
+    reciclaje de conexiones viejas y tiempo máximo de espera al pedir una conexión.
+    """
+
+    def __init__(self, factory=_crear_conexion_mysql, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE,
+                 borrow_timeout=POOL_BORROW_TIMEOUT, recycle_seconds=POOL_RECYCLE_SECONDS,
+                 healthcheck_idle=POOL_HEALTHCHECK_IDLE, nombre="primario", escritura=True):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Tamaños de pool inválidos")
+        self._factory = factory
+        self.nombre = nombre
+        self.escritura = escritura  # los commits en este pool activan la lectura de escrituras propias
+        self.min_size = min_size
+        self.max_size = max_size
+        self.borrow_timeout = borrow_timeout
+        self.recycle_seconds = recycle_seconds
+        self.healthcheck_idle = healthcheck_idle
+
+        self._cond = threading.Condition()
+        self._libres = deque()
+        self._total = 0
+        self._en_uso = 0
+        self._esperando = 0
+        self._stats = {
+            "creadas": 0,
+            "cerradas": 0,
+            "recicladas": 0,
+            "fallos_salud": 0,
+            "prestamos": 0,
+            "timeouts": 0,
+            "espera_total_s": 0.0,
+            "espera_max_s": 0.0,
+        }
+        self._llenar_minimo()
+
+    # ---------------------- Préstamo ----------------------
+    def get_connection(self, timeout=None):
+        timeout = self.borrow_timeout if timeout is None else timeout
+        inicio = time.monotonic()
+        limite = inicio + timeout
+
+        while True:
+            conn = None
+            crear = False
+            with self._cond:
+                while not self._libres and self._total >= self.max_size:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeoutError(
+                            f"No hay conexiones libres en el pool tras {timeout:.1f}s"
+                        )
+                    self._esperando += 1
+                    try:
+                        self._cond.wait(restante)
+                    finally:
+                        self._esperando -= 1
+                if self._libres:
+                    conn = self._libres.pop()
+                else:
+                    # Reservamos el hueco antes de abrir la conexión fuera del lock
+                    self._total += 1
+                    crear = True
+
+            if crear:
+                try:
+                    conn = self._nueva_conexion()
+                except Exception:
+                    with self._cond:
+                        self._total -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._es_saludable(conn):
+                self._descartar(conn)
+                continue
+
+            with self._cond:
+                conn._prestada = True
+                self._en_uso += 1
+                espera = time.monotonic() - inicio
+                self._stats["prestamos"] += 1
+                self._stats["espera_total_s"] += espera
+                self._stats["espera_max_s"] = max(self._stats["espera_max_s"], espera)
+            return conn
+
+    def _devolver(self, conn, descartar=False):
+        conn._prestada = False
+        reutilizable = False
+        if not descartar:
+            try:
+                # No dejar transacciones abiertas en conexiones reutilizadas
+                if conn._raw.in_transaction:
+                    conn._raw.rollback()
+                reutilizable = not self._expirada(conn)
+            except Exception:
+                reutilizable = False
+
+        with self._cond:
+            self._en_uso -= 1
+            if reutilizable:
+                conn.usada_en = time.monotonic()
+                self._libres.append(conn)
+                self._cond.notify()
+                return
+            self._stats["recicladas"] += 1
+        self._descartar(conn)
+
+    # ---------------------- Ciclo de vida ----------------------
+    def _nueva_conexion(self):
+        raw = self._factory()
+        with self._cond:
+            self._stats["creadas"] += 1
+        return PooledConnection(self, raw, time.monotonic())
+
+    def _llenar_minimo(self):
+        for _ in range(self.min_size):
+            with self._cond:
+                if self._total >= self.min_size:
+                    return
+                self._total += 1
+            try:
+                conn = self._nueva_conexion()
+            except Exception as e:
+                with self._cond:
+                    self._total -= 1
+                logger.error("❌ Error abriendo conexión inicial del pool: %s", e)
+                return
+            with self._cond:
+                self._libres.append(conn)
+                self._cond.notify()
+
+    def _expirada(self, conn):
+        return self.recycle_seconds > 0 and time.monotonic() - conn.creada_en > self.recycle_seconds
+
+    def _es_saludable(self, conn):
+        if self._expirada(conn):
+            with self._cond:
+                self._stats["recicladas"] += 1
+            return False
+        if time.monotonic() - conn.usada_en < self.healthcheck_idle:
+            return True
+        try:
+            conn._raw.ping(reconnect=False)
+            return True
+        except Exception:
+            with self._cond:
+                self._stats["fallos_salud"] += 1
+            return False
+
+    def _descartar(self, conn):
+        try:
+            conn._raw.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._total -= 1
+            self._stats["cerradas"] += 1
+            self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            libres = list(self._libres)
+            self._libres.clear()
+        for conn in libres:
+            self._descartar(conn)
+
+    # ---------------------- Estadísticas ----------------------
+    def stats(self):
+        with self._cond:
+            prestamos = self._stats["prestamos"]
+            return {
+                "nombre": self.nombre,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "total": self._total,
+                "en_uso": self._en_uso,
+                "libres": len(self._libres),
+                "esperando": self._esperando,
+                "creadas": self._stats["creadas"],
+                "cerradas": self._stats["cerradas"],
+                "recicladas": self._stats["recicladas"],
+                "fallos_salud": self._stats["fallos_salud"],
+                "prestamos": prestamos,
+                "timeouts": self._stats["timeouts"],
+                "espera_promedio_ms": round(self._stats["espera_total_s"] / prestamos * 1000, 3) if prestamos else 0.0,
+                "espera_max_ms": round(self._stats["espera_max_s"] * 1000, 3),
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_executor = None
+_lectores = None  # lista de Replica; None = aún no se leyó DB_REPLICA_HOSTS
+_turno_lectura = itertools.count()
+
+
+class Replica:
+    """Pool de una réplica de lectura y hasta cuándo se la considera caída."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.caida_hasta = 0.0
+        self.fallos = 0
+
+    def disponible(self, ahora):
+        return ahora >= self.caida_hasta
+
+    def marcar_caida(self, error):
+        self.fallos += 1
+        self.caida_hasta = time.monotonic() + DB_REPLICA_RETRY_SECONDS
+        logger.warning("Réplica %s no disponible por %ss: %s", self.pool.nombre, DB_REPLICA_RETRY_SECONDS, error)
+
+
+def init_pool(**kwargs):
+    """
+    Reemplaza el pool global por uno nuevo (por ejemplo con otra fábrica de conexiones).
+    """
+    global _pool
+    with _pool_lock:
+        anterior, _pool = _pool, ConnectionPool(**kwargs)
+    if anterior is not None:
+        anterior.close_all()
+    return _pool
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+def init_replicas(factories=None, **kwargs):
+    """
+    Reemplaza los pools de lectura. `factories` es una lista de (nombre, fábrica);
+    por defecto se crean a partir de DB_REPLICA_HOSTS. Una lista vacía deja todo en el primario.
+    """
+    global _lectores
+    if factories is None:
+        factories = [
+            (f"{host}:{port}", functools.partial(_crear_conexion_replica, host, port))
+            for host, port in _parsear_replicas(DB_REPLICA_HOSTS)
+        ]
+    opciones = {"min_size": 0, "max_size": DB_REPLICA_POOL_MAX_SIZE, "borrow_timeout": DB_REPLICA_BORROW_TIMEOUT}
+    opciones.update(kwargs)
+    nuevos = [
+        Replica(ConnectionPool(factory=factory, nombre=nombre, escritura=False, **opciones))
+        for nombre, factory in factories
+    ]
+    with _pool_lock:
+        anteriores, _lectores = _lectores or [], nuevos
+    for replica in anteriores:
+        replica.pool.close_all()
+    return nuevos
+
+
+def _get_lectores():
+    if _lectores is None:
+        init_replicas()
+    return _lectores
+
+
+def get_pool_stats():
+    stats = get_pool().stats()
+    if _lectores:
+        ahora = time.monotonic()
+        stats["replicas"] = [
+            {**replica.pool.stats(), "disponible": replica.disponible(ahora), "fallos": replica.fallos}
+            for replica in _lectores
+        ]
+    return stats
+
+
+def close_pool():
+    global _pool, _executor, _lectores
+    with _pool_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+        if _pool is not None:
+            _pool.close_all()
+            _pool = None
+        lectores, _lectores = _lectores or [], None
+    for replica in lectores:
+        replica.pool.close_all()
+
+
 def get_db_connection():
+    """
+    Presta una conexión del pool. Llamar a conn.close() la devuelve al pool.
+    """
     try:
-        connection = mysql.connector.connect(
-            host='sistema-notas-db.ctmika2a025d.us-east-2.rds.amazonaws.com',  # Tu Endpoint de AWS
-            database='sistema_notas',
-            user='admin',                    # Tu Master username
-            password='GoMyGCRTES12*',      # Tu Master password
-            port=3306,
-            auth_plugin='mysql_native_password'
-        )
-        if connection.is_connected():
-            print("✅ Conexión a AWS RDS MySQL exitosa")
-            return connection
+        return get_pool().get_connection()
     except Error as e:
-        print(f"❌ Error conectando a AWS RDS: {e}")
-        return None
\ No newline at end of file
+        logger.error("❌ Error obteniendo conexión a AWS RDS: %s", e)
+        return None
+
+
+def get_read_connection(*grupos):
+    """
+    Presta una conexión para consultas de solo lectura: una réplica por turnos
+    (round-robin), saltando las caídas o saturadas. Usa el primario si no hay
+    réplicas disponibles, si la petición/usuario acaba de escribir o si cambió
+    hace poco alguno de los `grupos` de caché que se van a leer.
+    Se devuelve con conn.close() igual que get_db_connection().
+    """
+    lectores = _get_lectores()
+    if lectores and not _debe_leer_del_primario(grupos):
+        ahora = time.monotonic()
+        inicio = next(_turno_lectura)
+        for i in range(len(lectores)):
+            replica = lectores[(inicio + i) % len(lectores)]
+            if not replica.disponible(ahora):
+                continue
+            try:
+                return replica.pool.get_connection()
+            except PoolTimeoutError:
+                continue  # saturada, pero viva: probar la siguiente
+            except Exception as e:
+                replica.marcar_caida(e)
+    return get_db_connection()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _pool_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="db")
+    return _executor
+
+
+async def run_db(func, *args, **kwargs):
+    """
+    Ejecuta una función bloqueante de acceso a datos en el executor de base de datos
+    para no detener el event loop. Conserva las context vars de la petición.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_get_executor(), functools.partial(ctx.run, func, *args, **kwargs))
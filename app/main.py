@@ -1,6 +1,22 @@
-from fastapi import FastAPI
+import logging
+import time
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import auth, usuarios, notas, estudiantes, auditoria
+from fastapi.responses import PlainTextResponse
+from app.database import get_pool_stats, close_pool, contar_consultas, sesion_lectura
+from app.security import close_password_executor
+from app.utils.auditoria_logger import iniciar_auditoria, detener_auditoria, get_auditoria_stats
+from app.utils.busqueda import get_busqueda_stats, iniciar_indices
+from app.utils.periodos import iniciar_periodos
+from app.utils.ranking import get_ranking_stats, iniciar_ranking
+from app.utils.trabajos import detener_trabajos, get_trabajos_stats, iniciar_trabajos
+from app.utils.cache import cache
+from app.utils.eventos import difusor
+from app.utils.compresion import CompresionMiddleware
+from app.utils import metricas
+from app.utils.logs import configurar_logging, detener_logging
+from app.routers import auth, usuarios, notas, estudiantes, auditoria, trabajos
 
 app = FastAPI(
     title="Sistema de Notas Seguro",
@@ -15,8 +31,38 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+# Compresión brotli/gzip según Accept-Encoding para respuestas grandes
+app.add_middleware(CompresionMiddleware)
+
+logger = logging.getLogger("app.http")
+
+# Middleware de métricas: latencia por ruta y estado, y sentencias SQL por petición.
+# También abre la sesión de lectura que decide si las consultas pueden ir a una réplica.
+@app.middleware("http")
+async def medir_peticiones(request: Request, call_next):
+    inicio = time.perf_counter()
+    status = 500
+    with contar_consultas() as contador, sesion_lectura():
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            duracion = time.perf_counter() - inicio
+            # Plantilla de la ruta (/notas/{nota_id}) para no crear una serie por id
+            ruta = request.scope.get("route")
+            ruta = ruta.path if ruta is not None else "sin_ruta"
+            metricas.duracion_peticiones.observar((request.method, ruta, str(status)), duracion)
+            metricas.consultas_por_peticion.observar((request.method, ruta), contador.total)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Petición atendida", extra={
+                    "metodo": request.method, "ruta": ruta, "status": status,
+                    "duracion_ms": round(duracion * 1000, 2), "consultas": contador.total,
+                })
+
 # Middleware COMPLETO para headers de seguridad
 @app.middleware("http")
 async def add_security_headers(request, call_next):
@@ -26,9 +72,15 @@ async def add_security_headers(request, call_next):
     response.headers["X-Frame-Options"] = "DENY"
     response.headers["X-XSS-Protection"] = "1; mode=block"
     response.headers["Cross-Origin-Resource-Policy"] = "same-origin"
-    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-    response.headers["Pragma"] = "no-cache"
-    response.headers["Expires"] = "0"
+    if "ETag" in response.headers:
+        # Listados versionados: solo la caché del navegador puede guardarlos y debe revalidar siempre
+        response.headers["Cache-Control"] = "private, no-cache"
+        vary = response.headers.get("Vary")
+        response.headers["Vary"] = f"{vary}, Authorization" if vary else "Authorization"
+    else:
+        response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
+        response.headers["Pragma"] = "no-cache"
+        response.headers["Expires"] = "0"
     return response
 
 # Incluir routers
@@ -37,6 +89,7 @@ app.include_router(usuarios.router)
 app.include_router(notas.router)
 app.include_router(estudiantes.router) 
 app.include_router(auditoria.router)
+app.include_router(trabajos.router)
 
 @app.get("/")
 async def root():
@@ -44,4 +97,92 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "sistema-notas"}
\ No newline at end of file
+    return {"status": "healthy", "service": "sistema-notas"}
+
+@app.get("/health/db")
+async def health_db():
+    """Estadísticas del pool de conexiones a la base de datos (y de las réplicas de lectura)"""
+    return get_pool_stats()
+
+@app.get("/health/auditoria")
+async def health_auditoria():
+    """Estado de la cola de auditoría en segundo plano"""
+    return get_auditoria_stats()
+
+@app.get("/health/cache")
+async def health_cache():
+    """Contadores de la caché de listados (hits, misses, evictions)"""
+    return cache.stats()
+
+@app.get("/health/eventos")
+async def health_eventos():
+    """Clientes suscritos a /notas/stream y eventos descartados por buffers llenos"""
+    return difusor.stats()
+
+@app.get("/health/busqueda")
+async def health_busqueda():
+    """Estado de los índices de búsqueda por prefijo (listos, documentos, tokens)"""
+    return get_busqueda_stats()
+
+@app.get("/health/ranking")
+async def health_ranking():
+    """Estado del índice de ranking (listo, grupos, estudiantes)"""
+    return get_ranking_stats()
+
+@app.get("/health/trabajos")
+async def health_trabajos():
+    """Cola de trabajos en segundo plano de este worker (pendientes, en curso, terminados)"""
+    return get_trabajos_stats()
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Histogramas de latencia y gauges del pool, la caché y la auditoría en formato Prometheus"""
+    pool = get_pool_stats()
+    cache_stats = cache.stats()
+    auditoria_stats = get_auditoria_stats()
+    trabajos_stats = get_trabajos_stats()
+    gauges = [
+        ("db_pool_connections_in_use", "Conexiones prestadas", pool["en_uso"]),
+        ("db_pool_connections_idle", "Conexiones libres", pool["libres"]),
+        ("db_pool_waiting", "Hilos esperando una conexión", pool["esperando"]),
+        ("db_pool_timeouts_total", "Préstamos que agotaron el tiempo de espera", pool["timeouts"]),
+    ]
+    if "replicas" in pool:
+        replicas = pool["replicas"]
+        gauges += [
+            ("db_replicas_available", "Réplicas de lectura disponibles", sum(r["disponible"] for r in replicas)),
+            ("db_replica_connections_in_use", "Conexiones prestadas de réplicas", sum(r["en_uso"] for r in replicas)),
+            ("db_replica_failures_total", "Veces que una réplica se marcó caída", sum(r["fallos"] for r in replicas)),
+        ]
+    gauges += [
+        (f"cache_{clave}", f"Caché de listados: {clave}", valor)
+        for clave, valor in cache_stats.items() if isinstance(valor, (int, float)) and not isinstance(valor, bool)
+    ]
+    gauges += [
+        (f"auditoria_{clave}", f"Cola de auditoría: {clave}", valor)
+        for clave, valor in auditoria_stats.items() if isinstance(valor, (int, float)) and not isinstance(valor, bool)
+    ]
+    gauges += [
+        (f"trabajos_{clave}", f"Trabajos en segundo plano: {clave}", valor)
+        for clave, valor in trabajos_stats.items() if isinstance(valor, (int, float)) and not isinstance(valor, bool)
+    ]
+    return PlainTextResponse(metricas.exponer(gauges), media_type="text/plain; version=0.0.4")
+
+@app.on_event("startup")
+def iniciar_servicios():
+    configurar_logging()
+    iniciar_auditoria()
+    iniciar_indices()
+    iniciar_ranking()
+    iniciar_periodos()
+    iniciar_trabajos()
+
+@app.on_event("shutdown")
+def cerrar_conexiones():
+    # Cerrar los streams SSE, vaciar la auditoría pendiente y luego cerrar el pool
+    difusor.cerrar()
+    detener_trabajos()
+    detener_auditoria()
+    close_pool()
+    close_password_executor()
+    detener_logging()
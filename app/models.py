@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import Literal, Optional
 from datetime import datetime
 
 # Models para requests/responses
@@ -41,4 +41,8 @@ class NotaResponse(BaseModel):
     creado_por: int
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class TrabajoCreate(BaseModel):
+    tipo: Literal["boletines", "historiales"]
+    periodo: str
@@ -1,22 +1,91 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.database import get_db_connection
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from app.database import get_read_connection, run_db
 from app.security import get_current_user
+from app.utils.etag import calcular_etag, coincide, no_modificado
+from app.utils.exportacion import exportar
+from app.utils.paginacion import (
+    PAGINA_LIMITE_DEFECTO, PAGINA_LIMITE_MAXIMO, codificar_cursor, condicion_keyset
+)
+from app.utils.respuestas import respuesta_lista
 import mysql.connector
 
 router = APIRouter(prefix="/auditoria", tags=["auditoria"])
 
 @router.get("/")
-async def obtener_auditoria(current_user: dict = Depends(get_current_user)):
+async def obtener_auditoria(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGINA_LIMITE_DEFECTO, ge=1, le=PAGINA_LIMITE_MAXIMO),
+    usuario_id: Optional[int] = None,
+    accion: Optional[str] = Query(None, max_length=255),
+    ip: Optional[str] = Query(None, max_length=45),
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Devuelve una página del historial (más recientes primero), filtrada en el servidor.
+    `accion` filtra por prefijo; `desde`/`hasta` acotan la fecha (hasta es exclusivo).
+    Si hay más resultados, el header X-Next-Cursor trae el cursor de la página siguiente.
+    """
     if current_user.get("rol") != "admin":
         raise HTTPException(status_code=403, detail="Acceso denegado: solo administradores")
 
-    conn = get_db_connection()
+    # La versión de "auditoria" sube con cada lote que guarda el escritor de auditoría
+    etag = calcular_etag(request, "auditoria")
+    if coincide(request, etag):
+        return no_modificado(etag)
+
+    filtros = {"usuario_id": usuario_id, "accion": accion, "ip": ip, "desde": desde, "hasta": hasta}
+    registros, siguiente = await run_db(_consultar_auditoria, filtros, cursor, limit)
+    if siguiente:
+        response.headers["X-Next-Cursor"] = siguiente
+    response.headers["ETag"] = etag
+    return respuesta_lista(registros, headers=response.headers)
+
+def _condiciones_auditoria(filtros: dict):
+    condiciones = []
+    params = []
+    if filtros.get("usuario_id") is not None:
+        condiciones.append("a.usuario_id = %s")
+        params.append(filtros["usuario_id"])
+    if filtros.get("accion"):
+        # Prefijo: LIKE 'texto%' usa índices; se escapan los comodines del usuario
+        prefijo = filtros["accion"].replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        condiciones.append("a.accion LIKE %s")
+        params.append(prefijo + "%")
+    if filtros.get("ip"):
+        condiciones.append("a.ip = %s")
+        params.append(filtros["ip"])
+    if filtros.get("desde") is not None:
+        condiciones.append("a.fecha >= %s")
+        params.append(filtros["desde"])
+    if filtros.get("hasta") is not None:
+        condiciones.append("a.fecha < %s")
+        params.append(filtros["hasta"])
+    return condiciones, params
+
+def _consultar_auditoria(filtros: dict, cursor_pagina: Optional[str], limit: int):
+    condiciones, params = _condiciones_auditoria(filtros)
+    if cursor_pagina:
+        sql_cursor, params_cursor = condicion_keyset("a.fecha", "a.id", cursor_pagina)
+        condiciones.append(sql_cursor)
+        params.extend(params_cursor)
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+
+    conn = get_read_connection()
     if not conn:
         raise HTTPException(status_code=500, detail="Error al conectar con la base de datos")
     
     cursor = conn.cursor(dictionary=True)
     try:
-        cursor.execute("""
+        # Se pide una fila de más para saber si existe una página siguiente;
+        # el orden (fecha, id) lo resuelven los índices de las migraciones
+        cursor.execute(f"""
             SELECT 
                 a.id,
                 u.nombre AS usuario,
@@ -25,12 +94,51 @@ async def obtener_auditoria(current_user: dict = Depends(get_current_user)):
                 a.ip
             FROM auditoria a
             JOIN usuarios u ON a.usuario_id = u.id
-            ORDER BY a.fecha DESC
-        """)
+            {where}
+            ORDER BY a.fecha DESC, a.id DESC
+            LIMIT %s
+        """, (*params, limit + 1))
         registros = cursor.fetchall()
-        return registros
     except mysql.connector.Error as err:
         raise HTTPException(status_code=500, detail=f"Error SQL: {err}")
     finally:
         cursor.close()
         conn.close()
+
+    siguiente = None
+    if len(registros) > limit:
+        registros = registros[:limit]
+        ultimo = registros[-1]
+        siguiente = codificar_cursor(ultimo["fecha"], ultimo["id"])
+    return registros, siguiente
+
+@router.get("/export")
+async def exportar_auditoria(
+    formato: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    usuario_id: Optional[int] = None,
+    accion: Optional[str] = Query(None, max_length=255),
+    ip: Optional[str] = Query(None, max_length=45),
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Descarga el historial de auditoría como CSV o NDJSON (opcionalmente gzip),
+    con los mismos filtros que el listado.
+    """
+    if current_user.get("rol") != "admin":
+        raise HTTPException(status_code=403, detail="Acceso denegado: solo administradores")
+
+    condiciones, params = _condiciones_auditoria(
+        {"usuario_id": usuario_id, "accion": accion, "ip": ip, "desde": desde, "hasta": hasta}
+    )
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    sql = f"""
+        SELECT a.id, a.usuario_id, u.nombre AS usuario, a.accion, a.fecha, a.ip
+        FROM auditoria a
+        JOIN usuarios u ON a.usuario_id = u.id
+        {where}
+        ORDER BY a.id
+    """
+    return await run_db(exportar, sql, tuple(params), formato, "auditoria", gzip)
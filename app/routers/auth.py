@@ -1,13 +1,47 @@
+import logging
+
 from fastapi import APIRouter, HTTPException, Depends
-from app.database import get_db_connection
+import mysql.connector
+from mysql.connector import errorcode
+from app.database import get_db_connection, run_db
 from app.models import LoginRequest, Token, UserCreate, UserResponse
-from app.security import verify_password, get_password_hash, create_access_token, get_current_user
+from app.utils.busqueda import indexar_usuario
+from app.utils.cache import cache
+from app.security import (
+    verify_password_async, get_password_hash_async, needs_rehash,
+    create_access_token, get_current_user, revocar_token, security_scheme,
+)
+from fastapi.security import HTTPAuthorizationCredentials
 
 router = APIRouter(prefix="/api/auth", tags=["authentication"])
+logger = logging.getLogger(__name__)
 
 # ---------------------- LOGIN ----------------------
 @router.post("/login", response_model=Token)
 async def login(login_data: LoginRequest):
+    user = await run_db(_buscar_usuario, login_data.email)
+
+    # La verificación del hash corre en el pool de contraseñas, no en el event loop
+    if not user or not await verify_password_async(login_data.password, user['password_hash']):
+        raise HTTPException(
+            status_code=401,
+            detail="Credenciales incorrectas",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    # Migrar hashes antiguos (SHA256 + salt) o con otros costos al KDF configurado
+    if needs_rehash(user['password_hash']):
+        nuevo_hash = await get_password_hash_async(login_data.password)
+        await run_db(_actualizar_hash, user['id'], nuevo_hash)
+
+    # Crear token JWT
+    access_token = create_access_token(
+        data={"sub": user['email'], "rol": user['rol'], "user_id": user['id']}
+    )
+
+    return {"access_token": access_token, "token_type": "bearer"}
+
+def _buscar_usuario(email: str):
     conn = get_db_connection()
     if not conn:
         raise HTTPException(status_code=500, detail="Database connection failed")
@@ -15,23 +49,24 @@ async def login(login_data: LoginRequest):
     cursor = conn.cursor(dictionary=True)
     try:
         # Buscar usuario por email
-        cursor.execute("SELECT * FROM usuarios WHERE email = %s", (login_data.email,))
-        user = cursor.fetchone()
-        
-        if not user or not verify_password(login_data.password, user['password_hash']):
-            raise HTTPException(
-                status_code=401,
-                detail="Credenciales incorrectas",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        
-        # Crear token JWT
-        access_token = create_access_token(
-            data={"sub": user['email'], "rol": user['rol'], "user_id": user['id']}
-        )
-        
-        return {"access_token": access_token, "token_type": "bearer"}
-    
+        cursor.execute("SELECT id, email, rol, password_hash FROM usuarios WHERE email = %s", (email,))
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+
+def _actualizar_hash(user_id: int, password_hash: str):
+    conn = get_db_connection()
+    if not conn:
+        return
+    cursor = conn.cursor()
+    try:
+        cursor.execute("UPDATE usuarios SET password_hash = %s WHERE id = %s", (password_hash, user_id))
+        conn.commit()
+    except Exception as e:
+        # El login ya fue válido; se reintentará en el próximo
+        conn.rollback()
+        logger.warning("⚠️ No se pudo actualizar el hash del usuario %s: %s", user_id, e)
     finally:
         cursor.close()
         conn.close()
@@ -47,7 +82,36 @@ async def register(user_data: UserCreate):
     # Validar el rol
     if user_data.rol not in ['admin', 'profesor', 'estudiante']:
         raise HTTPException(status_code=400, detail="Rol no válido")
-    
+
+    # Rechazar el email repetido antes de pagar el hash (el KDF es lo más caro del registro)
+    if await run_db(_email_registrado, user_data.email):
+        raise HTTPException(status_code=400, detail="El email ya está registrado")
+
+    # Hashear contraseña fuera del event loop
+    try:
+        hashed_password = await get_password_hash_async(user_data.password)
+    except Exception as hash_error:
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Error procesando contraseña: {str(hash_error)}"
+        )
+
+    return await run_db(_registrar_usuario, user_data, hashed_password)
+
+def _email_registrado(email: str) -> bool:
+    # Del primario: en una réplica atrasada un registro recién hecho no aparecería
+    conn = get_db_connection()
+    if not conn:
+        raise HTTPException(status_code=500, detail="Database connection failed")
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT 1 FROM usuarios WHERE email = %s", (email,))
+        return cursor.fetchone() is not None
+    finally:
+        cursor.close()
+        conn.close()
+
+def _registrar_usuario(user_data: UserCreate, hashed_password: str):
     conn = get_db_connection()
     if not conn:
         raise HTTPException(status_code=500, detail="Database connection failed")
@@ -55,34 +119,22 @@ async def register(user_data: UserCreate):
     cursor = conn.cursor()
 
     try:
-        # Verificar si el email ya está registrado
-        cursor.execute("SELECT id FROM usuarios WHERE email = %s", (user_data.email,))
-        if cursor.fetchone():
-            raise HTTPException(status_code=400, detail="El email ya está registrado")
-        
-        # Hashear contraseña
+        # Insertar usuario en la tabla usuarios; el índice único de email detecta duplicados concurrentes
         try:
-            hashed_password = get_password_hash(user_data.password)
-        except Exception as hash_error:
-            raise HTTPException(
-                status_code=500, 
-                detail=f"Error procesando contraseña: {str(hash_error)}"
+            cursor.execute(
+                """
+                INSERT INTO usuarios (email, password_hash, rol, nombre)
+                VALUES (%s, %s, %s, %s)
+                """,
+                (user_data.email, hashed_password, user_data.rol, user_data.nombre)
             )
-        
-        # Insertar usuario en la tabla usuarios
-        cursor.execute(
-            """
-            INSERT INTO usuarios (email, password_hash, rol, nombre)
-            VALUES (%s, %s, %s, %s)
-            """,
-            (user_data.email, hashed_password, user_data.rol, user_data.nombre)
-        )
-        conn.commit()
+        except mysql.connector.IntegrityError as err:
+            if err.errno == errorcode.ER_DUP_ENTRY:
+                raise HTTPException(status_code=400, detail="El email ya está registrado")
+            raise
 
-        # Obtener el ID del usuario recién creado
-        cursor.execute("SELECT id FROM usuarios WHERE email = %s", (user_data.email,))
-        new_user = cursor.fetchone()
-        user_id = new_user[0]
+        # ID del usuario recién creado, sin volver a consultarlo
+        user_id = cursor.lastrowid
 
         # ✅ Si el rol es estudiante, también insertarlo en la tabla `estudiantes`
         if user_data.rol == "estudiante":
@@ -94,18 +146,30 @@ async def register(user_data: UserCreate):
                 """,
                 (user_id, codigo_estudiante, user_data.nombre)
             )
-            conn.commit()
-            print(f"✅ Estudiante creado con código {codigo_estudiante}")
+            estudiante_id = cursor.lastrowid
 
-        # Retornar el nuevo usuario
-        return {
+        # Usuario y estudiante en una sola transacción
+        conn.commit()
+        if user_data.rol == "estudiante":
+            logger.info("✅ Estudiante creado con código %s", codigo_estudiante)
+            cache.invalidar("estudiantes")
+        cache.invalidar("usuarios")
+
+        usuario = {
             "id": user_id,
             "email": user_data.email,
             "rol": user_data.rol,
             "nombre": user_data.nombre
         }
+        indexar_usuario(usuario, {
+            "id": estudiante_id, "usuario_id": user_id, "codigo_estudiante": codigo_estudiante,
+        } if user_data.rol == "estudiante" else None)
+
+        # Retornar el nuevo usuario
+        return usuario
     
     except HTTPException:
+        conn.rollback()
         raise
     except Exception as e:
         conn.rollback()
@@ -129,3 +193,17 @@ async def refresh_token(current_user: dict = Depends(get_current_user)):
         }
     )
     return {"access_token": new_token, "token_type": "bearer"}
+
+
+# ---------------------- LOGOUT ----------------------
+@router.post("/logout")
+async def logout(
+    credentials: HTTPAuthorizationCredentials = Depends(security_scheme),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Revoca el token actual: deja de aceptarse aunque todavía no haya expirado
+    (en todos los workers con CACHE_BACKEND=redis; si no, solo en este).
+    """
+    await run_db(revocar_token, credentials.credentials)
+    return {"message": "Sesión cerrada correctamente"}
@@ -1,34 +1,58 @@
-from fastapi import APIRouter, HTTPException
-from app.database import get_db_connection
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from app.database import get_read_connection, run_db
+from app.security import get_current_user
+from app.utils.busqueda import (
+    BUSQUEDA_LIMITE_DEFECTO, BUSQUEDA_LIMITE_MAXIMO, cargar_estudiantes, indice_estudiantes,
+    indice_vigente, prefijo_like
+)
+from app.utils.promedios import calcular_estado, obtener_promedios
+from app.utils.cache import cache
+from app.utils.etag import calcular_etag, coincide, no_modificado
+from app.utils.respuestas import respuesta_lista
 
 router = APIRouter(
     prefix="/api/estudiantes",
     tags=["Estudiantes"]
 )
 
+def require_admin(current_user: dict = Depends(get_current_user)):
+    if current_user.get("rol") != "admin":
+        raise HTTPException(status_code=403, detail="Acceso solo para administradores")
+    return current_user
+
 @router.get("/")
-def listar_estudiantes():
+async def listar_estudiantes(request: Request, response: Response):
     """
     Retorna todos los estudiantes con su código, nombre, correo y promedio de notas.
     """
-    conn = get_db_connection()
+    etag = calcular_etag(request, "estudiantes")
+    if coincide(request, etag):
+        return no_modificado(etag)
+    response.headers["ETag"] = etag
+    estudiantes = await run_db(cache.obtener_o_calcular, "estudiantes", {}, _consultar_estudiantes)
+    return respuesta_lista(estudiantes, headers=response.headers)
+
+def _consultar_estudiantes():
+    conn = get_read_connection("estudiantes")
     if not conn:
         raise HTTPException(status_code=500, detail="Error de conexión con la base de datos")
 
     cursor = conn.cursor()
     try:
+        # El promedio sale de la tabla de agregados (nivel estudiante), no de las notas
         cursor.execute("""
             SELECT 
                 e.id,
                 e.codigo_estudiante,
                 u.nombre,
                 u.email,
-                COALESCE(ROUND(AVG(n.calificacion), 2), 0) AS promedio
+                COALESCE(ROUND(p.suma / NULLIF(p.conteo, 0), 2), 0) AS promedio
             FROM estudiantes e
             JOIN usuarios u ON e.usuario_id = u.id
-            LEFT JOIN notas n ON e.id = n.estudiante_id
+            LEFT JOIN promedios_estudiante p
+                ON p.estudiante_id = e.id AND p.asignatura = '' AND p.periodo = ''
             WHERE u.rol = 'estudiante'
-            GROUP BY e.id, e.codigo_estudiante, u.nombre, u.email
             ORDER BY u.nombre ASC
         """)
         estudiantes = cursor.fetchall()
@@ -42,7 +66,7 @@ def listar_estudiantes():
                 "email": e[3],
                 "curso": "N/A",
                 "promedio": float(e[4]),
-                "estado": "activo" if e[4] >= 3 else "bajo rendimiento"
+                "estado": calcular_estado(e[4])
             })
 
         return resultado
@@ -52,3 +76,84 @@ def listar_estudiantes():
     finally:
         cursor.close()
         conn.close()
+
+
+@router.get("/buscar")
+async def buscar_estudiantes(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(BUSQUEDA_LIMITE_DEFECTO, ge=1, le=BUSQUEDA_LIMITE_MAXIMO),
+    current_user: dict = Depends(require_admin),
+):
+    """
+    Búsqueda por prefijo en nombre, email y código de estudiante para autocompletar.
+    Devuelve id, usuario_id, codigo_estudiante, nombre y email de los mejores `limit`.
+    """
+    if indice_vigente(indice_estudiantes, cargar_estudiantes):
+        return respuesta_lista(indice_estudiantes.buscar(q, limit))
+    return respuesta_lista(await run_db(_buscar_estudiantes_sql, q, limit))
+
+def _buscar_estudiantes_sql(q: str, limit: int):
+    patron = prefijo_like(q.strip())
+    conn = get_read_connection("estudiantes")
+    if not conn:
+        raise HTTPException(status_code=500, detail="Error de conexión con la base de datos")
+
+    cursor = conn.cursor(dictionary=True)
+    try:
+        # Una rama por índice: (rol, nombre), email único y codigo_estudiante
+        cursor.execute("""
+            (SELECT e.id, e.usuario_id, e.codigo_estudiante, u.nombre, u.email
+             FROM usuarios u JOIN estudiantes e ON e.usuario_id = u.id
+             WHERE u.rol = 'estudiante' AND u.nombre LIKE %s ORDER BY u.nombre LIMIT %s)
+            UNION
+            (SELECT e.id, e.usuario_id, e.codigo_estudiante, u.nombre, u.email
+             FROM usuarios u JOIN estudiantes e ON e.usuario_id = u.id
+             WHERE u.email LIKE %s AND u.rol = 'estudiante' ORDER BY u.email LIMIT %s)
+            UNION
+            (SELECT e.id, e.usuario_id, e.codigo_estudiante, u.nombre, u.email
+             FROM estudiantes e JOIN usuarios u ON e.usuario_id = u.id
+             WHERE e.codigo_estudiante LIKE %s ORDER BY e.codigo_estudiante LIMIT %s)
+            ORDER BY nombre
+            LIMIT %s
+        """, (patron, limit, patron, limit, patron, limit, limit))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+@router.get("/{estudiante_id}/promedios")
+async def promedios_estudiante(
+    estudiante_id: int,
+    asignatura: Optional[str] = None,
+    periodo: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Desglose de promedios de un estudiante por asignatura y periodo (suma, conteo, mínimo, máximo).
+    Solo para admin/profesor o el propio estudiante.
+    """
+    rol = current_user.get("rol")
+    if rol not in ["admin", "profesor", "estudiante"]:
+        raise HTTPException(status_code=403, detail="No tiene permiso para ver estos promedios")
+    # Un estudiante solo ve lo suyo: se comprueba en la misma conexión que la consulta
+    propietario = current_user["user_id"] if rol == "estudiante" else None
+    return await run_db(_consultar_promedios, estudiante_id, asignatura, periodo, propietario)
+
+def _consultar_promedios(estudiante_id: int, asignatura: Optional[str], periodo: Optional[str], propietario: Optional[int]):
+    conn = get_read_connection("notas")
+    if not conn:
+        raise HTTPException(status_code=500, detail="Error de conexión con la base de datos")
+
+    cursor = conn.cursor()
+    try:
+        if propietario is not None:
+            cursor.execute("SELECT 1 FROM estudiantes WHERE id = %s AND usuario_id = %s", (estudiante_id, propietario))
+            if not cursor.fetchone():
+                raise HTTPException(status_code=403, detail="No tiene permiso para ver estos promedios")
+        promedios = obtener_promedios(cursor, estudiante_id, asignatura, periodo)
+        if not promedios:
+            raise HTTPException(status_code=404, detail="Estudiante sin notas registradas")
+        return promedios
+    finally:
+        cursor.close()
+        conn.close()
@@ -1,11 +1,38 @@
-from fastapi import APIRouter, HTTPException, Depends, Request
-from app.database import get_db_connection
+import heapq
+import os
+import time
+from itertools import islice
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, Response, Query
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+import mysql.connector
+from mysql.connector import errorcode
+from app.database import get_db_connection, get_read_connection, run_db
 from app.models import NotaCreate, NotaResponse
 from app.security import get_current_user
 from app.utils.auditoria_logger import registrar_accion
+from app.utils.promedios import sumar_nota, sumar_notas, restar_nota
+from app.utils.importacion import leer_filas
+from app.utils.exportacion import exportar
+from app.utils.estadisticas import leer_columnas, calcular_estadisticas, unir_columnas
+from app.utils.periodos import (
+    PeriodoInvalidoError, archivos_de, cerrar_periodo, get_periodos_stats, periodo_cerrado, periodos_cerrados_en
+)
+from app.utils.ranking import RANKING_LIMITE_DEFECTO, RANKING_LIMITE_MAXIMO, consultar_ranking, registrar_cambios
+from app.utils.cache import cache
+from app.utils.etag import calcular_etag, coincide, no_modificado
+from app.utils.respuestas import respuesta_lista, serializar
+from app.utils.eventos import EVENTOS_DURACION_MAXIMA, EVENTOS_KEEPALIVE, difusor, es_fin
+from app.utils.paginacion import (
+    PAGINA_LIMITE_DEFECTO, PAGINA_LIMITE_MAXIMO, codificar_cursor, condicion_keyset, decodificar_cursor
+)
 
 router = APIRouter(prefix="/notas", tags=["notas"])
 
+# Filas por transacción en la carga masiva
+BULK_CHUNK_SIZE = int(os.getenv("NOTAS_BULK_CHUNK_SIZE", "1000"))
+
 def require_profesor_or_admin(current_user: dict = Depends(get_current_user)):
     if current_user.get("rol") not in ["admin", "profesor"]:
         raise HTTPException(status_code=403, detail="Profesor o admin requerido")
@@ -19,13 +46,85 @@ def require_admin(current_user: dict = Depends(get_current_user)):
 def require_authenticated(current_user: dict = Depends(get_current_user)):
     return current_user
 
-# ✅ Listar todas las notas
+# ✅ Listar notas (paginación keyset y filtros en el servidor)
 @router.get("/", response_model=list[NotaResponse])
-async def get_notas(current_user: dict = Depends(require_profesor_or_admin)):
-    conn = get_db_connection()
+async def get_notas(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGINA_LIMITE_DEFECTO, ge=1, le=PAGINA_LIMITE_MAXIMO),
+    estudiante_id: Optional[int] = None,
+    asignatura: Optional[str] = None,
+    periodo: Optional[str] = None,
+    calificacion_min: Optional[float] = Query(None, ge=0, le=5.0),
+    calificacion_max: Optional[float] = Query(None, ge=0, le=5.0),
+    current_user: dict = Depends(require_profesor_or_admin),
+):
+    """
+    Devuelve una página de notas ordenada por fecha de creación (más recientes primero).
+    Si hay más resultados, el header X-Next-Cursor trae el cursor de la página siguiente.
+    Con If-None-Match igual al ETag vigente responde 304 sin consultar.
+    """
+    etag = calcular_etag(request, "notas")
+    if coincide(request, etag):
+        await run_db(registrar_accion, current_user["user_id"], "Consultó notas")
+        return no_modificado(etag)
+
+    filtros = {
+        "estudiante_id": estudiante_id,
+        "asignatura": asignatura,
+        "periodo": periodo,
+        "calificacion_min": calificacion_min,
+        "calificacion_max": calificacion_max,
+    }
+    notas, siguiente = await run_db(_listar_notas, filtros, cursor, limit, current_user)
+    if siguiente:
+        response.headers["X-Next-Cursor"] = siguiente
+    response.headers["ETag"] = etag
+    return respuesta_lista(notas, NotaResponse, response.headers)
+
+def _listar_notas(filtros: dict, cursor_pagina: Optional[str], limit: int, current_user: dict):
+    resultado = cache.obtener_o_calcular(
+        "notas",
+        {**filtros, "cursor": cursor_pagina, "limit": limit},
+        lambda: _consultar_notas(filtros, cursor_pagina, limit),
+    )
+    registrar_accion(current_user["user_id"], "Consultó notas")
+    return resultado
+
+def _condiciones_notas(filtros: dict):
+    condiciones = []
+    params = []
+    if filtros.get("estudiante_id") is not None:
+        condiciones.append("n.estudiante_id = %s")
+        params.append(filtros["estudiante_id"])
+    if filtros.get("asignatura"):
+        condiciones.append("n.asignatura = %s")
+        params.append(filtros["asignatura"])
+    if filtros.get("periodo"):
+        condiciones.append("n.periodo = %s")
+        params.append(filtros["periodo"])
+    if filtros.get("calificacion_min") is not None:
+        condiciones.append("n.calificacion >= %s")
+        params.append(filtros["calificacion_min"])
+    if filtros.get("calificacion_max") is not None:
+        condiciones.append("n.calificacion <= %s")
+        params.append(filtros["calificacion_max"])
+    return condiciones, params
+
+def _consultar_notas(filtros: dict, cursor_pagina: Optional[str], limit: int):
+    condiciones, params = _condiciones_notas(filtros)
+    if cursor_pagina:
+        sql_cursor, params_cursor = condicion_keyset("n.creado_en", "n.id", cursor_pagina)
+        condiciones.append(sql_cursor)
+        params.extend(params_cursor)
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+
+    conn = get_read_connection("notas")
     cursor = conn.cursor(dictionary=True)
     try:
-        cursor.execute("""
+        # Se pide una fila de más para saber si existe una página siguiente
+        cursor.execute(f"""
             SELECT n.id, n.estudiante_id, n.asignatura, n.calificacion,
                    n.periodo, n.creado_por, n.creado_en,
                    u.nombre AS estudiante_nombre, up.nombre AS creado_por_nombre
@@ -33,13 +132,283 @@ async def get_notas(current_user: dict = Depends(require_profesor_or_admin)):
             JOIN estudiantes e ON n.estudiante_id = e.id
             JOIN usuarios u ON e.usuario_id = u.id
             LEFT JOIN usuarios up ON n.creado_por = up.id
-            ORDER BY n.creado_en DESC
-        """)
-        registrar_accion(current_user["user_id"], "Consultó todas las notas")
-        return cursor.fetchall()
+            {where}
+            ORDER BY n.creado_en DESC, n.id DESC
+            LIMIT %s
+        """, (*params, limit + 1))
+        notas = cursor.fetchall()
+
+        archivos = archivos_de(filtros)
+        if archivos:
+            # Periodos cerrados: cada archivo da su página en el mismo orden y se mezclan
+            despues_de = decodificar_cursor(cursor_pagina) if cursor_pagina else None
+            paginas = [archivo.pagina(filtros, despues_de, limit + 1) for archivo in archivos]
+            notas = list(islice(
+                heapq.merge(notas, *paginas, key=lambda n: (n["creado_en"], n["id"]), reverse=True),
+                limit + 1,
+            ))
+
+        siguiente = None
+        if len(notas) > limit:
+            notas = notas[:limit]
+            ultima = notas[-1]
+            siguiente = codificar_cursor(ultima["creado_en"], ultima["id"])
+        if archivos:
+            notas = _completar_archivadas(cursor, notas)
+    finally:
+        cursor.close()
+        conn.close()
+    return notas, siguiente
+
+def _completar_archivadas(cursor, notas: list):
+    """
+    Agrega los nombres a las notas que vienen de archivos de periodos cerrados y
+    descarta las de estudiantes borrados, como hace el JOIN de la consulta SQL.
+    """
+    archivadas = [n for n in notas if "estudiante_nombre" not in n]
+    if not archivadas:
+        return notas
+    estudiantes = sorted({n["estudiante_id"] for n in archivadas})
+    creadores = sorted({n["creado_por"] for n in archivadas})
+    cursor.execute(f"""
+        SELECT 'e' AS tipo, e.id, u.nombre
+        FROM estudiantes e JOIN usuarios u ON e.usuario_id = u.id
+        WHERE e.id IN ({', '.join(['%s'] * len(estudiantes))})
+        UNION ALL
+        SELECT 'u', id, nombre FROM usuarios WHERE id IN ({', '.join(['%s'] * len(creadores))})
+    """, (*estudiantes, *creadores))
+    nombres = {(fila["tipo"], fila["id"]): fila["nombre"] for fila in cursor.fetchall()}
+
+    completas = []
+    for nota in notas:
+        if "estudiante_nombre" not in nota:
+            nombre = nombres.get(("e", nota["estudiante_id"]))
+            if nombre is None:
+                continue
+            nota["estudiante_nombre"] = nombre
+            nota["creado_por_nombre"] = nombres.get(("u", nota["creado_por"]))
+        completas.append(nota)
+    return completas
+
+# ✅ Exportar notas en streaming
+@router.get("/export")
+async def exportar_notas(
+    request: Request,
+    formato: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    estudiante_id: Optional[int] = None,
+    asignatura: Optional[str] = None,
+    periodo: Optional[str] = None,
+    current_user: dict = Depends(require_profesor_or_admin),
+):
+    """
+    Descarga todas las notas que cumplen los filtros como CSV o NDJSON (opcionalmente gzip).
+    Primero van las de periodos cerrados (desde sus archivos) y luego las de la tabla.
+    """
+    filtros = {"estudiante_id": estudiante_id, "asignatura": asignatura, "periodo": periodo}
+    condiciones, params = _condiciones_notas(filtros)
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    sql = f"""
+        SELECT n.id, n.estudiante_id, u.nombre AS estudiante_nombre, n.asignatura,
+               n.calificacion, n.periodo, n.creado_por, n.creado_en
+        FROM notas n
+        JOIN estudiantes e ON n.estudiante_id = e.id
+        JOIN usuarios u ON e.usuario_id = u.id
+        {where}
+        ORDER BY n.id
+    """
+    previas = await run_db(_archivadas_para_exportar, filtros)
+    respuesta = await run_db(exportar, sql, params, formato, "notas", gzip, previas)
+    await run_db(registrar_accion, current_user["user_id"], f"Exportó notas ({formato})", request.client.host)
+    return respuesta
+
+def _archivadas_para_exportar(filtros: dict):
+    """Filas de los archivos de periodos cerrados en el orden de columnas de la exportación."""
+    archivos = archivos_de(filtros)
+    if not archivos:
+        return None
+
+    # Los nombres se leen antes de empezar a enviar: un error aquí todavía es un 500
+    conn = get_read_connection("estudiantes")
+    if not conn:
+        raise HTTPException(status_code=500, detail="Error de conexión con la base de datos")
+    cursor = conn.cursor()
+    try:
+        sql = "SELECT e.id, u.nombre FROM estudiantes e JOIN usuarios u ON e.usuario_id = u.id"
+        if filtros.get("estudiante_id") is not None:
+            cursor.execute(f"{sql} WHERE e.id = %s", (filtros["estudiante_id"],))
+        else:
+            cursor.execute(sql)
+        nombres = dict(cursor.fetchall())
+    finally:
+        cursor.close()
+        conn.close()
+
+    def filas():
+        for archivo in archivos:
+            for nota in archivo.filas_filtradas(filtros):
+                nombre = nombres.get(nota["estudiante_id"])
+                if nombre is not None:
+                    yield (nota["id"], nota["estudiante_id"], nombre, nota["asignatura"], nota["calificacion"],
+                           nota["periodo"], nota["creado_por"], nota["creado_en"])
+    return filas()
+
+# ✅ Estadísticas por asignatura y periodo
+@router.get("/estadisticas")
+async def estadisticas_notas(
+    asignatura: Optional[str] = None,
+    periodo: Optional[str] = None,
+    current_user: dict = Depends(require_profesor_or_admin),
+):
+    """
+    Promedio, mediana, desviación, percentiles, tasa de aprobación (>= 3.0) e histograma
+    de cada (asignatura, periodo). El resultado queda en caché hasta que cambie una nota del grupo.
+    """
+    filtros = {"asignatura": asignatura, "periodo": periodo}
+    return await run_db(cache.obtener_o_calcular, "estadisticas", filtros, lambda: _calcular_estadisticas(filtros))
+
+def _calcular_estadisticas(filtros: dict):
+    condiciones, params = _condiciones_notas(filtros)
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+
+    conn = get_read_connection("estadisticas")
+    if not conn:
+        raise HTTPException(status_code=500, detail="Error de conexión con la base de datos")
+    cursor = conn.cursor()
+    try:
+        columnas = leer_columnas(
+            cursor, f"SELECT n.asignatura, n.periodo, n.calificacion FROM notas n {where}", params
+        )
     finally:
         cursor.close()
         conn.close()
+    # Las notas de periodos cerrados salen de sus archivos, ya en columnas
+    columnas = unir_columnas(columnas, *(archivo.columnas(filtros) for archivo in archivos_de(filtros)))
+    return calcular_estadisticas(*columnas)
+
+# ✅ Ranking de estudiantes por asignatura y periodo
+@router.get("/ranking")
+async def ranking_notas(
+    asignatura: str = Query(..., max_length=100),
+    periodo: str = Query(..., max_length=20),
+    estudiante_id: Optional[int] = None,
+    limit: int = Query(RANKING_LIMITE_DEFECTO, ge=0, le=RANKING_LIMITE_MAXIMO),
+    current_user: dict = Depends(require_profesor_or_admin),
+):
+    """
+    Estudiantes ordenados por su promedio en la asignatura y el periodo: los `limit`
+    primeros y, con `estudiante_id`, la posición y el percentil de ese estudiante.
+    Los empates comparten posición; el percentil es el porcentaje con promedio menor o igual.
+    """
+    return await run_db(_ranking, asignatura, periodo, estudiante_id, limit)
+
+def _ranking(asignatura: str, periodo: str, estudiante_id: Optional[int], limit: int):
+    ranking = consultar_ranking(asignatura, periodo, estudiante_id, limit)
+    filas = ranking["mejores"] + ([ranking["estudiante"]] if ranking["estudiante"] else [])
+    if filas:
+        ids = sorted({fila["estudiante_id"] for fila in filas})
+        marcadores = ", ".join(["%s"] * len(ids))
+        conn = get_read_connection("estudiantes")
+        if not conn:
+            raise HTTPException(status_code=500, detail="Error de conexión con la base de datos")
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"""
+                SELECT e.id, u.nombre FROM estudiantes e JOIN usuarios u ON e.usuario_id = u.id
+                WHERE e.id IN ({marcadores})
+            """, ids)
+            nombres = dict(cursor.fetchall())
+        finally:
+            cursor.close()
+            conn.close()
+        for fila in filas:
+            fila["nombre"] = nombres.get(fila["estudiante_id"])
+    return {"asignatura": asignatura, "periodo": periodo, **ranking}
+
+def _rechazar_periodo_cerrado(periodo: str, cursor=None, *otros: str):
+    """
+    Sin cursor: camino rápido con el registro del worker, antes de abrir la transacción.
+    Con cursor: la verificación que cuenta, dentro de la transacción y antes del commit.
+    """
+    if cursor is None:
+        cerrados = {periodo} if periodo_cerrado(periodo) else set()
+    else:
+        cerrados = periodos_cerrados_en(cursor, (periodo, *otros))
+    if cerrados:
+        raise HTTPException(status_code=409, detail=f"El periodo {min(cerrados)} está cerrado")
+
+def _invalidar_cache(estudiante_id: int, asignatura: str, periodo: str):
+    """Invalida los listados que pueden contener una nota con estos valores."""
+    cache.invalidar("notas", estudiante_id=estudiante_id, asignatura=asignatura, periodo=periodo)
+    cache.invalidar("estadisticas", asignatura=asignatura, periodo=periodo)
+    cache.invalidar("estudiantes")
+
+# ✅ Cambios en vivo (Server-Sent Events)
+@router.get("/stream")
+async def stream_notas(
+    asignatura: Optional[str] = None,
+    periodo: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None, max_length=64),
+    current_user: dict = Depends(require_profesor_or_admin),
+):
+    """
+    Emite un evento por cada nota creada, actualizada o eliminada que pase los filtros:
+    `event: created|updated|deleted` con la nota en `data`. Un `event: resync` indica
+    que el cliente debe recargar el listado (carga masiva o se perdieron eventos).
+    El stream se cierra tras EVENTOS_DURACION_MAXIMA segundos y el cliente se reconecta
+    con Last-Event-ID para recibir lo que pasó mientras tanto.
+    """
+    suscripcion = difusor.suscribir(asignatura, periodo, last_event_id)
+
+    async def eventos():
+        limite = time.monotonic() + EVENTOS_DURACION_MAXIMA
+        try:
+            # Primer mensaje: confirma la suscripción y fija el reintento del navegador
+            yield b"retry: 5000\n: conectado\n\n"
+            if suscripcion.id_inicial:
+                yield b"id: %s\n\n" % suscripcion.id_inicial.encode()
+            while True:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                evento = await suscripcion.siguiente(min(EVENTOS_KEEPALIVE, restante))
+                if evento is None:
+                    yield b": ping\n\n"
+                    continue
+                if es_fin(evento):
+                    break
+                datos = serializar(evento.get("nota", {}))
+                yield b"id: %s\nevent: %s\ndata: %s\n\n" % (
+                    difusor.id_evento(evento).encode(), evento["tipo"].encode(), datos)
+        finally:
+            difusor.cancelar(suscripcion)
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"X-Accel-Buffering": "no"},  # que un proxy nginx no acumule los eventos
+    )
+
+# ✅ Periodos cerrados
+@router.get("/periodos")
+async def listar_periodos_cerrados(current_user: dict = Depends(require_profesor_or_admin)):
+    """Periodos cerrados con la cantidad de notas y el tamaño de su archivo."""
+    return await run_db(get_periodos_stats)
+
+@router.post("/periodos/{periodo}/cerrar")
+async def cerrar_periodo_notas(periodo: str, request: Request, current_user: dict = Depends(require_admin)):
+    """
+    Mueve las notas del periodo a su archivo columnar de solo lectura. Desde ese
+    momento no se pueden crear, modificar ni eliminar notas del periodo (409).
+    """
+    try:
+        resumen = await run_db(cerrar_periodo, periodo, current_user["user_id"])
+    except PeriodoInvalidoError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    await run_db(registrar_accion, current_user["user_id"], f"Cerró el periodo {periodo}", request.client.host)
+    return resumen
 
 # ✅ Crear nota
 @router.post("/", response_model=NotaResponse)
@@ -47,79 +416,257 @@ async def crear_nota(nota_data: NotaCreate, request: Request, current_user: dict
     if nota_data.calificacion < 0 or nota_data.calificacion > 5.0:
         raise HTTPException(status_code=400, detail="La calificación debe estar entre 0 y 5.0")
 
+    return await run_db(_crear_nota, nota_data, request.client.host, current_user)
+
+def _crear_nota(nota_data: NotaCreate, ip: str, current_user: dict):
+    _rechazar_periodo_cerrado(nota_data.periodo)
     conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
+    cursor = conn.cursor()
     try:
-        cursor.execute("SELECT id FROM estudiantes WHERE id = %s", (nota_data.estudiante_id,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Estudiante no encontrado")
-
-        cursor.execute("""
-            INSERT INTO notas (estudiante_id, asignatura, calificacion, periodo, creado_por)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (nota_data.estudiante_id, nota_data.asignatura, nota_data.calificacion, nota_data.periodo, current_user["user_id"]))
+        # La llave foránea valida al estudiante: sin SELECT previo
+        try:
+            cursor.execute("""
+                INSERT INTO notas (estudiante_id, asignatura, calificacion, periodo, creado_por)
+                VALUES (%s, %s, %s, %s, %s)
+            """, (nota_data.estudiante_id, nota_data.asignatura, nota_data.calificacion, nota_data.periodo, current_user["user_id"]))
+        except mysql.connector.IntegrityError as err:
+            if err.errno == errorcode.ER_NO_REFERENCED_ROW_2:
+                raise HTTPException(status_code=404, detail="Estudiante no encontrado")
+            raise
+        nota_id = cursor.lastrowid
+        _rechazar_periodo_cerrado(nota_data.periodo, cursor)
+        sumar_nota(cursor, nota_data.estudiante_id, nota_data.asignatura, nota_data.periodo, nota_data.calificacion)
         conn.commit()
-        registrar_accion(current_user["user_id"], f"Creó nota para estudiante {nota_data.estudiante_id}", request.client.host)
+    finally:
+        cursor.close()
+        conn.close()
 
-        cursor.execute("""
-            SELECT n.*, u.nombre AS estudiante_nombre
-            FROM notas n
-            JOIN estudiantes e ON n.estudiante_id = e.id
-            JOIN usuarios u ON e.usuario_id = u.id
-            WHERE n.id = LAST_INSERT_ID()
-        """)
-        return cursor.fetchone()
+    registrar_accion(current_user["user_id"], f"Creó nota para estudiante {nota_data.estudiante_id}", ip)
+    _invalidar_cache(nota_data.estudiante_id, nota_data.asignatura, nota_data.periodo)
+    registrar_cambios([(nota_data.estudiante_id, nota_data.asignatura, nota_data.periodo, nota_data.calificacion, 1)])
+
+    # La respuesta se arma con lo que ya sabemos, sin volver a consultar
+    nota = {
+        "id": nota_id,
+        "estudiante_id": nota_data.estudiante_id,
+        "asignatura": nota_data.asignatura,
+        "calificacion": nota_data.calificacion,
+        "periodo": nota_data.periodo,
+        "creado_por": current_user["user_id"],
+    }
+    difusor.publicar("created", nota)
+    return nota
+
+# ✅ Carga masiva de notas (JSON, CSV o NDJSON)
+@router.post("/bulk")
+async def crear_notas_bulk(request: Request, current_user: dict = Depends(require_profesor_or_admin)):
+    """
+    Inserta muchas notas en lotes. Acepta un arreglo JSON, CSV con encabezado
+    (estudiante_id,asignatura,calificacion,periodo) o NDJSON, leídos en streaming.
+    Cada lote se valida con una sola consulta de estudiantes, se inserta con
+    executemany en su propia transacción y deja un único registro de auditoría.
+    Devuelve el reporte de errores por fila.
+    """
+    inicio = time.perf_counter()
+    ip = request.client.host
+    reporte = {"recibidas": 0, "insertadas": 0, "rechazadas": 0, "errores": []}
+
+    lote = []
+    async for numero, datos in leer_filas(request):
+        reporte["recibidas"] += 1
+        nota = _validar_fila(numero, datos, reporte)
+        if nota is not None:
+            lote.append((numero, nota))
+        if len(lote) >= BULK_CHUNK_SIZE:
+            await run_db(_insertar_lote, lote, reporte, ip, current_user)
+            lote = []
+    if lote:
+        await run_db(_insertar_lote, lote, reporte, ip, current_user)
+
+    duracion = time.perf_counter() - inicio
+    reporte["duracion_s"] = round(duracion, 3)
+    reporte["filas_por_segundo"] = round(reporte["insertadas"] / duracion, 1) if duracion > 0 else 0.0
+    return reporte
+
+def _validar_fila(numero: int, datos, reporte: dict) -> Optional[NotaCreate]:
+    error = None
+    nota = None
+    if isinstance(datos, Exception):
+        error = f"Fila ilegible: {datos}"
+    else:
+        try:
+            nota = NotaCreate.model_validate(datos)
+        except ValidationError as e:
+            error = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+        else:
+            if nota.calificacion < 0 or nota.calificacion > 5.0:
+                error = "La calificación debe estar entre 0 y 5.0"
+    if error:
+        reporte["rechazadas"] += 1
+        reporte["errores"].append({"fila": numero, "error": error})
+        return None
+    return nota
+
+def _insertar_lote(lote: list, reporte: dict, ip: str, current_user: dict):
+    conn = get_db_connection()
+    if not conn:
+        raise HTTPException(status_code=500, detail="Error de conexión con la base de datos")
+
+    cursor = conn.cursor()
+    validas = []
+    rechazadas = set()  # filas ya reportadas: un error SQL marca solo el resto del lote
+    try:
+        # Validar todos los estudiantes del lote con una sola consulta
+        ids = sorted({nota.estudiante_id for _, nota in lote})
+        marcadores = ", ".join(["%s"] * len(ids))
+        cursor.execute(f"SELECT id FROM estudiantes WHERE id IN ({marcadores})", ids)
+        existentes = {fila[0] for fila in cursor.fetchall()}
+
+        for numero, nota in lote:
+            if nota.estudiante_id not in existentes:
+                error = "Estudiante no encontrado"
+            elif periodo_cerrado(nota.periodo):
+                error = f"El periodo {nota.periodo} está cerrado"
+            else:
+                validas.append((numero, nota))
+                continue
+            rechazadas.add(numero)
+            reporte["rechazadas"] += 1
+            reporte["errores"].append({"fila": numero, "error": error})
+        if not validas:
+            return
+
+        while True:
+            cursor.executemany("""
+                INSERT INTO notas (estudiante_id, asignatura, calificacion, periodo, creado_por)
+                VALUES (%s, %s, %s, %s, %s)
+            """, [(n.estudiante_id, n.asignatura, n.calificacion, n.periodo, current_user["user_id"]) for _, n in validas])
+            # Dentro de la transacción: el registro del worker puede no saber de un cierre reciente.
+            # Si hay periodos cerrados se revierte y se reintenta sin esas filas.
+            cerrados = periodos_cerrados_en(cursor, {n.periodo for _, n in validas})
+            if not cerrados:
+                break
+            conn.rollback()
+            for numero, nota in validas:
+                if nota.periodo in cerrados:
+                    rechazadas.add(numero)
+                    reporte["rechazadas"] += 1
+                    reporte["errores"].append({"fila": numero, "error": f"El periodo {nota.periodo} está cerrado"})
+            validas = [(numero, nota) for numero, nota in validas if nota.periodo not in cerrados]
+            if not validas:
+                return
+        sumar_notas(cursor, [(n.estudiante_id, n.asignatura, n.periodo, n.calificacion) for _, n in validas])
+        conn.commit()
+    except mysql.connector.Error as err:
+        # El lote completo se revierte; los lotes anteriores ya quedaron guardados
+        conn.rollback()
+        fallidas = [numero for numero, _ in lote if numero not in rechazadas]
+        reporte["rechazadas"] += len(fallidas)
+        reporte["errores"].extend({"fila": numero, "error": f"Error SQL: {err}"} for numero in fallidas)
+        return
     finally:
         cursor.close()
         conn.close()
 
+    reporte["insertadas"] += len(validas)
+    registrar_accion(current_user["user_id"], f"Cargó {len(validas)} notas en lote", ip)
+    grupos = {(n.asignatura, n.periodo) for _, n in validas}
+    for asignatura, periodo in grupos:
+        cache.invalidar("notas", asignatura=asignatura, periodo=periodo)
+        cache.invalidar("estadisticas", asignatura=asignatura, periodo=periodo)
+    cache.invalidar("estudiantes")
+    registrar_cambios([(n.estudiante_id, n.asignatura, n.periodo, n.calificacion, 1) for _, n in validas])
+    difusor.pedir_resync([{"asignatura": a, "periodo": p} for a, p in grupos])
+
 # ✅ Actualizar nota
 @router.put("/{nota_id}", response_model=NotaResponse)
 async def actualizar_nota(nota_id: int, nota_data: NotaCreate, request: Request, current_user: dict = Depends(require_profesor_or_admin)):
     if nota_data.calificacion < 0 or nota_data.calificacion > 5.0:
         raise HTTPException(status_code=400, detail="La calificación debe estar entre 0 y 5.0")
 
+    return await run_db(_actualizar_nota, nota_id, nota_data, request.client.host, current_user)
+
+def _actualizar_nota(nota_id: int, nota_data: NotaCreate, ip: str, current_user: dict):
+    _rechazar_periodo_cerrado(nota_data.periodo)
     conn = get_db_connection()
     cursor = conn.cursor(dictionary=True)
     try:
-        cursor.execute("SELECT * FROM notas WHERE id = %s", (nota_id,))
-        if not cursor.fetchone():
+        # Una sola lectura con bloqueo: sirve de 404, de valores anteriores para
+        # los agregados y de datos para la respuesta
+        cursor.execute(
+            "SELECT estudiante_id, asignatura, periodo, calificacion, creado_por FROM notas WHERE id = %s FOR UPDATE",
+            (nota_id,)
+        )
+        anterior = cursor.fetchone()
+        if not anterior:
             raise HTTPException(status_code=404, detail="Nota no encontrada")
+        _rechazar_periodo_cerrado(anterior["periodo"])
 
         cursor.execute("""
             UPDATE notas
             SET calificacion=%s, asignatura=%s, periodo=%s
             WHERE id=%s
         """, (nota_data.calificacion, nota_data.asignatura, nota_data.periodo, nota_id))
+        _rechazar_periodo_cerrado(nota_data.periodo, cursor, anterior["periodo"])
+        restar_nota(cursor, anterior["estudiante_id"], anterior["asignatura"], anterior["periodo"], anterior["calificacion"])
+        sumar_nota(cursor, anterior["estudiante_id"], nota_data.asignatura, nota_data.periodo, nota_data.calificacion)
         conn.commit()
-        registrar_accion(current_user["user_id"], f"Actualizó nota ID {nota_id}", request.client.host)
-
-        cursor.execute("""
-            SELECT n.*, u.nombre AS estudiante_nombre
-            FROM notas n
-            JOIN estudiantes e ON n.estudiante_id = e.id
-            JOIN usuarios u ON e.usuario_id = u.id
-            WHERE n.id = %s
-        """, (nota_id,))
-        return cursor.fetchone()
     finally:
         cursor.close()
         conn.close()
 
+    registrar_accion(current_user["user_id"], f"Actualizó nota ID {nota_id}", ip)
+    _invalidar_cache(anterior["estudiante_id"], anterior["asignatura"], anterior["periodo"])
+    _invalidar_cache(anterior["estudiante_id"], nota_data.asignatura, nota_data.periodo)
+    registrar_cambios([
+        (anterior["estudiante_id"], anterior["asignatura"], anterior["periodo"], anterior["calificacion"], -1),
+        (anterior["estudiante_id"], nota_data.asignatura, nota_data.periodo, nota_data.calificacion, 1),
+    ])
+
+    nota = {
+        "id": nota_id,
+        "estudiante_id": anterior["estudiante_id"],
+        "asignatura": nota_data.asignatura,
+        "calificacion": nota_data.calificacion,
+        "periodo": nota_data.periodo,
+        "creado_por": anterior["creado_por"],
+    }
+    difusor.publicar("updated", nota, anterior={"id": nota_id, **anterior})
+    return nota
+
 # ✅ Eliminar nota
 @router.delete("/{nota_id}")
 async def eliminar_nota(nota_id: int, request: Request, current_user: dict = Depends(require_admin)):
+    return await run_db(_eliminar_nota, nota_id, request.client.host, current_user)
+
+def _eliminar_nota(nota_id: int, ip: str, current_user: dict):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT id FROM notas WHERE id = %s", (nota_id,))
-        if not cursor.fetchone():
+        # Lectura con bloqueo: los agregados necesitan los valores de la nota borrada
+        cursor.execute(
+            "SELECT estudiante_id, asignatura, periodo, calificacion FROM notas WHERE id = %s FOR UPDATE",
+            (nota_id,)
+        )
+        anterior = cursor.fetchone()
+        if not anterior:
             raise HTTPException(status_code=404, detail="Nota no encontrada")
+        _rechazar_periodo_cerrado(anterior[2])
 
         cursor.execute("DELETE FROM notas WHERE id = %s", (nota_id,))
+        _rechazar_periodo_cerrado(anterior[2], cursor)
+        restar_nota(cursor, *anterior)
         conn.commit()
-        registrar_accion(current_user["user_id"], f"Eliminó nota ID {nota_id}", request.client.host)
-        return {"message": "Nota eliminada correctamente"}
     finally:
         cursor.close()
         conn.close()
+
+    registrar_accion(current_user["user_id"], f"Eliminó nota ID {nota_id}", ip)
+    _invalidar_cache(*anterior[:3])
+    estudiante_id, asignatura, periodo, calificacion = anterior
+    registrar_cambios([(estudiante_id, asignatura, periodo, calificacion, -1)])
+    difusor.publicar("deleted", {
+        "id": nota_id, "estudiante_id": estudiante_id, "asignatura": asignatura,
+        "periodo": periodo, "calificacion": calificacion,
+    })
+    return {"message": "Nota eliminada correctamente"}
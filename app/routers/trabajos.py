@@ -0,0 +1,75 @@
+from fastapi import APIRouter, Depends, HTTPException, Path, Request
+from fastapi.responses import FileResponse
+from app.database import run_db
+from app.models import TrabajoCreate
+from app.security import get_current_user
+from app.utils.auditoria_logger import registrar_accion
+from app.utils.trabajos import (
+    TrabajosOcupadosError, cancelar_trabajo, crear_trabajo, listar_trabajos, obtener_trabajo, ruta_resultado
+)
+
+router = APIRouter(prefix="/trabajos", tags=["trabajos"])
+
+ID_TRABAJO = Path(..., pattern=r"^[0-9a-f]{32}$")
+
+def require_profesor_or_admin(current_user: dict = Depends(get_current_user)):
+    if current_user.get("rol") not in ["admin", "profesor"]:
+        raise HTTPException(status_code=403, detail="Profesor o admin requerido")
+    return current_user
+
+async def _trabajo_visible(trabajo_id: str, current_user: dict) -> dict:
+    """El trabajo si existe y es del usuario (el admin ve todos); si no, 404."""
+    trabajo = await run_db(obtener_trabajo, trabajo_id)
+    if trabajo is None or (current_user.get("rol") != "admin" and trabajo["creado_por"] != current_user["user_id"]):
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return trabajo
+
+# ✅ Encolar boletines o historiales de un periodo
+@router.post("/", status_code=202)
+async def crear(datos: TrabajoCreate, request: Request, current_user: dict = Depends(require_profesor_or_admin)):
+    """
+    Genera en segundo plano un archivo por estudiante con notas en el periodo
+    (boletines: notas del periodo; historiales: todas sus notas) y los empaqueta
+    en un ZIP. Responde enseguida con el id para consultar el avance.
+    """
+    try:
+        trabajo = await run_db(crear_trabajo, datos.tipo, datos.periodo, current_user["user_id"])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except TrabajosOcupadosError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "60"})
+    await run_db(registrar_accion, current_user["user_id"], f"Pidió {datos.tipo} del periodo {datos.periodo}", request.client.host)
+    return trabajo
+
+# ✅ Trabajos recientes
+@router.get("/")
+async def listar(current_user: dict = Depends(require_profesor_or_admin)):
+    usuario_id = None if current_user.get("rol") == "admin" else current_user["user_id"]
+    return await run_db(listar_trabajos, usuario_id)
+
+# ✅ Estado y avance
+@router.get("/{trabajo_id}")
+async def estado(trabajo_id: str = ID_TRABAJO, current_user: dict = Depends(require_profesor_or_admin)):
+    return await _trabajo_visible(trabajo_id, current_user)
+
+# ✅ Descargar el ZIP
+@router.get("/{trabajo_id}/resultado")
+async def resultado(trabajo_id: str = ID_TRABAJO, current_user: dict = Depends(require_profesor_or_admin)):
+    trabajo = await _trabajo_visible(trabajo_id, current_user)
+    if trabajo["estado"] == "vencido":
+        raise HTTPException(status_code=410, detail="El resultado ya no está disponible")
+    if trabajo["estado"] != "terminado":
+        raise HTTPException(status_code=409, detail=f"El trabajo está {trabajo['estado']}")
+    ruta = await run_db(ruta_resultado, trabajo_id)
+    if ruta is None:
+        raise HTTPException(status_code=410, detail="El resultado ya no está disponible")
+    return FileResponse(ruta, media_type="application/zip",
+                        filename=f"{trabajo['tipo']}_{trabajo['periodo']}.zip")
+
+# ✅ Cancelar
+@router.delete("/{trabajo_id}", status_code=202)
+async def cancelar(trabajo_id: str = ID_TRABAJO, current_user: dict = Depends(require_profesor_or_admin)):
+    await _trabajo_visible(trabajo_id, current_user)
+    if not await run_db(cancelar_trabajo, trabajo_id):
+        raise HTTPException(status_code=409, detail="El trabajo ya terminó")
+    return await run_db(obtener_trabajo, trabajo_id)
@@ -1,8 +1,18 @@
-from fastapi import APIRouter, HTTPException, Depends, Request
-from app.database import get_db_connection
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from app.database import get_db_connection, get_read_connection, run_db
 from app.models import UserResponse
 from app.security import get_current_user
 from app.utils.auditoria_logger import registrar_accion
+from app.utils.busqueda import (
+    BUSQUEDA_LIMITE_DEFECTO, BUSQUEDA_LIMITE_MAXIMO, cargar_usuarios, desindexar_usuario,
+    indice_usuarios, indice_vigente, prefijo_like
+)
+from app.utils.cache import cache
+from app.utils.ranking import descartar_ranking
+from app.utils.etag import calcular_etag, coincide, no_modificado
+from app.utils.respuestas import respuesta_lista
+from app.utils.eventos import difusor
 
 router = APIRouter(prefix="/usuarios", tags=["usuarios"])
 
@@ -12,24 +22,81 @@ def require_admin(current_user: dict = Depends(get_current_user)):
     return current_user
 
 @router.get("/", response_model=list[UserResponse])
-async def get_usuarios(current_user: dict = Depends(require_admin)):
-    conn = get_db_connection()
+async def get_usuarios(request: Request, response: Response, current_user: dict = Depends(require_admin)):
+    etag = calcular_etag(request, "usuarios")
+    if coincide(request, etag):
+        await run_db(registrar_accion, current_user["user_id"], "Consultó la lista de usuarios")
+        return no_modificado(etag)
+    response.headers["ETag"] = etag
+    usuarios = await run_db(_listar_usuarios, current_user)
+    return respuesta_lista(usuarios, UserResponse, response.headers)
+
+def _listar_usuarios(current_user: dict):
+    usuarios = cache.obtener_o_calcular("usuarios", {}, _consultar_usuarios)
+    registrar_accion(current_user["user_id"], "Consultó la lista de usuarios")
+    return usuarios
+
+def _consultar_usuarios():
+    conn = get_read_connection("usuarios")
     if not conn:
         raise HTTPException(status_code=500, detail="Error de conexión a la base de datos")
 
     cursor = conn.cursor(dictionary=True)
     try:
         cursor.execute("SELECT id, email, rol, nombre FROM usuarios")
-        usuarios = cursor.fetchall()
-        registrar_accion(current_user["user_id"], "Consultó la lista de usuarios")
-        return usuarios
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+@router.get("/buscar", response_model=list[UserResponse])
+async def buscar_usuarios(
+    q: str = Query(..., min_length=1, max_length=100),
+    rol: Optional[str] = None,
+    limit: int = Query(BUSQUEDA_LIMITE_DEFECTO, ge=1, le=BUSQUEDA_LIMITE_MAXIMO),
+    current_user: dict = Depends(require_admin),
+):
+    """
+    Búsqueda por prefijo en nombre y email para autocompletar (mejores `limit` resultados).
+    Responde desde el índice en memoria sin ir a la base; si el índice aún no está
+    listo o quedó desactualizado, con una consulta SQL indexada por prefijo.
+    """
+    if indice_vigente(indice_usuarios, cargar_usuarios):
+        filtro = (lambda usuario: usuario["rol"] == rol) if rol else None
+        return respuesta_lista(indice_usuarios.buscar(q, limit, filtro), UserResponse)
+    return respuesta_lista(await run_db(_buscar_usuarios_sql, q, rol, limit), UserResponse)
+
+def _buscar_usuarios_sql(q: str, rol: Optional[str], limit: int):
+    # El texto completo como prefijo del nombre o del email: cada rama usa su índice
+    patron = prefijo_like(q.strip())
+    filtro_rol = "AND rol = %s" if rol else ""
+    params_rol = [rol] if rol else []
+    conn = get_read_connection("usuarios")
+    if not conn:
+        raise HTTPException(status_code=500, detail="Error de conexión a la base de datos")
+
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(f"""
+            (SELECT id, email, rol, nombre FROM usuarios
+             WHERE nombre LIKE %s {filtro_rol} ORDER BY nombre LIMIT %s)
+            UNION
+            (SELECT id, email, rol, nombre FROM usuarios
+             WHERE email LIKE %s {filtro_rol} ORDER BY email LIMIT %s)
+            ORDER BY nombre
+            LIMIT %s
+        """, (patron, *params_rol, limit, patron, *params_rol, limit, limit))
+        return cursor.fetchall()
     finally:
         cursor.close()
         conn.close()
 
 @router.get("/{usuario_id}", response_model=UserResponse)
 async def get_usuario(usuario_id: int, current_user: dict = Depends(require_admin)):
-    conn = get_db_connection()
+    return await run_db(_obtener_usuario, usuario_id, current_user)
+
+def _obtener_usuario(usuario_id: int, current_user: dict):
+    conn = get_read_connection("usuarios")
     if not conn:
         raise HTTPException(status_code=500, detail="Error de conexión a la base de datos")
 
@@ -47,22 +114,41 @@ async def get_usuario(usuario_id: int, current_user: dict = Depends(require_admi
 
 @router.delete("/{usuario_id}")
 async def delete_usuario(usuario_id: int, request: Request, current_user: dict = Depends(require_admin)):
+    return await run_db(_eliminar_usuario, usuario_id, request.client.host, current_user)
+
+def _eliminar_usuario(usuario_id: int, ip: str, current_user: dict):
     conn = get_db_connection()
     if not conn:
         raise HTTPException(status_code=500, detail="Error de conexión a la base de datos")
 
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT id FROM usuarios WHERE id = %s", (usuario_id,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Usuario no encontrado")
-
         if current_user.get("user_id") == usuario_id:
             raise HTTPException(status_code=400, detail="No puedes eliminarte a ti mismo")
 
+        # Si es estudiante, sus notas caen en cascada pero los agregados no: se borran aquí.
+        # El FOR UPDATE toma primero la fila del estudiante, como la verificación de la
+        # clave foránea al insertar una nota, así que no se cruza con esas escrituras.
+        cursor.execute("SELECT id FROM estudiantes WHERE usuario_id = %s FOR UPDATE", (usuario_id,))
+        for (estudiante_id,) in cursor.fetchall():
+            cursor.execute("DELETE FROM promedios_estudiante WHERE estudiante_id = %s", (estudiante_id,))
+            cursor.execute("DELETE FROM extremos_cerrados WHERE estudiante_id = %s", (estudiante_id,))
+
+        # rowcount indica si existía
         cursor.execute("DELETE FROM usuarios WHERE id = %s", (usuario_id,))
+        if cursor.rowcount == 0:
+            raise HTTPException(status_code=404, detail="Usuario no encontrado")
         conn.commit()
-        registrar_accion(current_user["user_id"], f"Eliminó usuario con ID {usuario_id}", request.client.host)
+        registrar_accion(current_user["user_id"], f"Eliminó usuario con ID {usuario_id}", ip)
+        # Si era estudiante, sus notas desaparecen con él
+        cache.invalidar("usuarios")
+        cache.invalidar("estudiantes")
+        cache.invalidar("notas")
+        cache.invalidar("estadisticas")
+        cache.invalidar("auditoria")
+        desindexar_usuario(usuario_id)
+        descartar_ranking()
+        difusor.pedir_resync()
         return {"message": "Usuario eliminado correctamente"}
 
     except HTTPException:
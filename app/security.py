@@ -1,37 +1,111 @@
 from datetime import datetime, timedelta
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from jose import JWTError, jwt
+import asyncio
 import hashlib
+import hmac
+import os
 import secrets
+import threading
+import time
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
+from app.database import identificar_sesion, run_db
+from app.utils.cache import cache
+
 # Configuración
 SECRET_KEY = "tu_clave_secreta_super_segura_cambiar_en_produccion"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
 
 security_scheme = HTTPBearer()
 
-# 🔥 SOLUCIÓN DEFINITIVA: SHA256 + Salt
+# Hash de contraseñas: KDF con costo configurable (scrypt por defecto, o PBKDF2-SHA256)
+PASSWORD_KDF = os.getenv("PASSWORD_KDF", "scrypt")          # scrypt | pbkdf2
+SCRYPT_N = int(os.getenv("SCRYPT_N", "16384"))
+SCRYPT_R = int(os.getenv("SCRYPT_R", "8"))
+SCRYPT_P = int(os.getenv("SCRYPT_P", "1"))
+PBKDF2_ITERATIONS = int(os.getenv("PBKDF2_ITERATIONS", "600000"))
+# El hashing corre fuera del event loop: en hilos (hashlib libera el GIL) o en procesos
+PASSWORD_EXECUTOR = os.getenv("PASSWORD_EXECUTOR", "thread")  # thread | process
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", "4"))
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r * p, dklen=32)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verificar contraseña usando SHA256"""
+    """
+    Verificar contraseña. Soporta:
+    - scrypt$n$r$p$salt$hash
+    - pbkdf2_sha256$iteraciones$salt$hash
+    - salt$hash (SHA256 + salt, formato anterior)
+    """
     try:
-        # Separar el salt y el hash
-        salt, stored_hash = hashed_password.split('$')
-        # Calcular hash de la contraseña + salt
+        partes = hashed_password.split('$')
+        if partes[0] == "scrypt":
+            n, r, p, salt, stored_hash = partes[1:]
+            computed = _scrypt(plain_password, bytes.fromhex(salt), int(n), int(r), int(p))
+            return hmac.compare_digest(computed.hex(), stored_hash)
+        if partes[0] == "pbkdf2_sha256":
+            iteraciones, salt, stored_hash = partes[1:]
+            computed = hashlib.pbkdf2_hmac("sha256", plain_password.encode(), bytes.fromhex(salt), int(iteraciones))
+            return hmac.compare_digest(computed.hex(), stored_hash)
+        # Formato anterior: separar el salt y el hash
+        salt, stored_hash = partes
         computed_hash = hashlib.sha256((plain_password + salt).encode()).hexdigest()
-        return computed_hash == stored_hash
+        return hmac.compare_digest(computed_hash, stored_hash)
     except Exception:
         return False
 
 def get_password_hash(password: str) -> str:
-    """Hashear contraseña usando SHA256 con salt"""
-    # Generar salt aleatorio
-    salt = secrets.token_hex(16)
-    # Calcular hash (password + salt)
-    password_hash = hashlib.sha256((password + salt).encode()).hexdigest()
-    # Devolver salt y hash separados por $
-    return f"{salt}${password_hash}"
+    """Hashear contraseña con el KDF y los costos configurados"""
+    salt = secrets.token_bytes(16)
+    if PASSWORD_KDF == "pbkdf2":
+        password_hash = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, PBKDF2_ITERATIONS)
+        return f"pbkdf2_sha256${PBKDF2_ITERATIONS}${salt.hex()}${password_hash.hex()}"
+    password_hash = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${salt.hex()}${password_hash.hex()}"
+
+def needs_rehash(hashed_password: str) -> bool:
+    """True si el hash usa el formato anterior o costos distintos a los configurados"""
+    partes = hashed_password.split('$')
+    if PASSWORD_KDF == "pbkdf2":
+        return partes[0] != "pbkdf2_sha256" or partes[1] != str(PBKDF2_ITERATIONS)
+    return partes[0] != "scrypt" or partes[1:4] != [str(SCRYPT_N), str(SCRYPT_R), str(SCRYPT_P)]
+
+_password_executor = None
+_password_executor_lock = threading.Lock()
+
+def _get_password_executor():
+    global _password_executor
+    if _password_executor is None:
+        with _password_executor_lock:
+            if _password_executor is None:
+                if PASSWORD_EXECUTOR == "process":
+                    _password_executor = ProcessPoolExecutor(max_workers=PASSWORD_WORKERS)
+                else:
+                    _password_executor = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS,
+                                                            thread_name_prefix="password")
+    return _password_executor
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_password_executor(), verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_password_executor(), get_password_hash, password)
+
+def close_password_executor():
+    global _password_executor
+    with _password_executor_lock:
+        if _password_executor is not None:
+            _password_executor.shutdown(wait=True)
+            _password_executor = None
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
@@ -43,17 +117,121 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+class TokenCache:
+    """
+    LRU de payloads de tokens ya verificados, indexado por el hash del token.
+    Cada entrada vence en el `exp` del propio token. Los tokens revocados se
+    recuerdan hasta su `exp` para rechazarlos aunque la firma sea válida.
+
+    La caché y las revocaciones de esta clase son del proceso. Con
+    CACHE_BACKEND=redis las revocaciones se guardan además en Redis (ver
+    revocar_token) para que todos los workers las vean.
+    """
+
+    def __init__(self, max_size=TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()  # hash -> (exp, payload)
+        self._revocados = {}            # hash -> exp
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def clave(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, clave: str):
+        ahora = time.time()
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                self.misses += 1
+                return None
+            exp, payload = entrada
+            if exp <= ahora:
+                del self._entradas[clave]
+                self.misses += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.hits += 1
+            return payload
+
+    def put(self, clave: str, payload: dict):
+        exp = payload.get("exp")
+        if exp is None:
+            return
+        with self._lock:
+            self._entradas[clave] = (exp, payload)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_size:
+                self._entradas.popitem(last=False)
+
+    def revocar(self, clave: str, exp: float):
+        ahora = time.time()
+        with self._lock:
+            self._entradas.pop(clave, None)
+            self._revocados[clave] = exp
+            # Limpiar revocaciones que ya vencieron solas
+            for vencido in [c for c, e in self._revocados.items() if e <= ahora]:
+                del self._revocados[vencido]
+
+    def revocado(self, clave: str) -> bool:
+        return clave in self._revocados
+
+    def clear(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def stats(self):
+        return {"entradas": len(self._entradas), "revocados": len(self._revocados),
+                "hits": self.hits, "misses": self.misses}
+
+
+token_cache = TokenCache()
+
+def _revocado(clave: str) -> bool:
+    if token_cache.revocado(clave):
+        return True
+    # Revocado en otro worker: una consulta a Redis por petición
+    return cache.compartida and cache.backend.alguna_vigente([f"token-revocado:{clave}"])
+
 def verify_token(token: str):
+    clave = TokenCache.clave(token)
+    if _revocado(clave):
+        return None
+    payload = token_cache.get(clave)
+    if payload is not None:
+        return dict(payload)
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except JWTError:
         return None
+    token_cache.put(clave, payload)
+    return dict(payload)
+
+def revocar_token(token: str):
+    """
+    Invalida un token antes de su expiración (p. ej. al cerrar sesión). Con la
+    caché en memoria solo lo rechaza este worker; con Redis, todos.
+    """
+    try:
+        claims = jwt.get_unverified_claims(token)
+        exp = float(claims.get("exp", time.time() + ACCESS_TOKEN_EXPIRE_MINUTES * 60))
+    except JWTError:
+        return
+    clave = TokenCache.clave(token)
+    token_cache.revocar(clave, exp)
+    if cache.compartida and exp > time.time():
+        # Redis olvida la marca cuando el token habría vencido de todos modos
+        cache.backend.marcar(f"token-revocado:{clave}", exp - time.time())
 
 # Dependencia para obtener usuario actual
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security_scheme)):
     token = credentials.credentials
-    payload = verify_token(token)
+    # Con Redis la verificación consulta las revocaciones: fuera del event loop
+    payload = await run_db(verify_token, token) if cache.compartida else verify_token(token)
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
+    # Lecturas propias: tras una escritura de este usuario, sus lecturas van al primario
+    identificar_sesion(payload.get("user_id"))
     return payload
\ No newline at end of file
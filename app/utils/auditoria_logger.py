@@ -1,25 +1,157 @@
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
 from app.database import get_db_connection
+from app.utils.cache import cache
 import mysql.connector
 
+logger = logging.getLogger(__name__)
+
+# Configuración del escritor en segundo plano
+AUDITORIA_BATCH_SIZE = int(os.getenv("AUDITORIA_BATCH_SIZE", "200"))          # filas por INSERT
+AUDITORIA_FLUSH_INTERVAL = float(os.getenv("AUDITORIA_FLUSH_INTERVAL", "1.0"))  # segundos entre vaciados
+AUDITORIA_QUEUE_SIZE = int(os.getenv("AUDITORIA_QUEUE_SIZE", "10000"))
+AUDITORIA_PUT_TIMEOUT = float(os.getenv("AUDITORIA_PUT_TIMEOUT", "2.0"))        # espera máxima con la cola llena
+
+_FIN = object()
+
+
+class AuditoriaWriter:
+    """
+    Acumula acciones de auditoría en una cola en memoria y un hilo en segundo plano
+    las guarda con INSERTs de varias filas.
+    Si la cola está llena, quien registra espera (backpressure) y, si no hay espacio
+    a tiempo, escribe su registro directamente para no perderlo.
+    """
+
+    def __init__(self, batch_size=AUDITORIA_BATCH_SIZE, flush_interval=AUDITORIA_FLUSH_INTERVAL,
+                 queue_size=AUDITORIA_QUEUE_SIZE, put_timeout=AUDITORIA_PUT_TIMEOUT):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self._cola = queue.Queue(maxsize=queue_size)
+        self._hilo = None
+        self._lock = threading.Lock()
+        self.stats = {"encolados": 0, "escritos": 0, "lotes": 0, "escrituras_directas": 0, "perdidos": 0}
+
+    def start(self):
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._run, name="auditoria-writer", daemon=True)
+                self._hilo.start()
+
+    def stop(self, timeout=10.0):
+        """Vacía la cola pendiente y detiene el hilo."""
+        with self._lock:
+            hilo, self._hilo = self._hilo, None
+        if hilo is None:
+            return
+        self._cola.put(_FIN)
+        hilo.join(timeout)
+
+    def registrar(self, usuario_id, accion, ip=None):
+        registro = (usuario_id, accion, ip, datetime.now())
+        try:
+            self._cola.put(registro, timeout=self.put_timeout)
+            self.stats["encolados"] += 1
+        except queue.Full:
+            self.stats["escrituras_directas"] += 1
+            self._escribir_lote([registro])
+
+    def _run(self):
+        terminar = False
+        while not terminar:
+            lote = []
+            try:
+                primero = self._cola.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            if primero is _FIN:
+                terminar = True
+            else:
+                lote.append(primero)
+
+            # Juntar lo que llegue hasta completar el lote o el intervalo
+            limite = time.monotonic() + self.flush_interval
+            while not terminar and len(lote) < self.batch_size:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    registro = self._cola.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if registro is _FIN:
+                    terminar = True
+                else:
+                    lote.append(registro)
+
+            if terminar:
+                # Al apagar, vaciar todo lo pendiente sin esperar más
+                while True:
+                    try:
+                        registro = self._cola.get_nowait()
+                    except queue.Empty:
+                        break
+                    if registro is not _FIN:
+                        lote.append(registro)
+
+            for i in range(0, len(lote), self.batch_size):
+                self._escribir_lote(lote[i:i + self.batch_size])
+
+    def _escribir_lote(self, lote):
+        if not lote:
+            return
+        conn = get_db_connection()
+        if not conn:
+            self.stats["perdidos"] += len(lote)
+            logger.error("❌ Error: No se pudo conectar a la base de datos (%d acciones sin registrar).", len(lote))
+            return
+
+        cursor = conn.cursor()
+        try:
+            valores = ", ".join(["(%s, %s, %s, %s)"] * len(lote))
+            params = [campo for registro in lote for campo in registro]
+            cursor.execute(f"""
+                INSERT INTO auditoria (usuario_id, accion, ip, fecha)
+                VALUES {valores}
+            """, params)
+            conn.commit()
+            cache.invalidar("auditoria")  # nueva versión para el ETag de GET /auditoria/
+            self.stats["escritos"] += len(lote)
+            self.stats["lotes"] += 1
+        except mysql.connector.Error as err:
+            self.stats["perdidos"] += len(lote)
+            logger.warning("⚠️ Error registrando %d acciones en auditoría: %s", len(lote), err)
+        finally:
+            cursor.close()
+            conn.close()
+
+
+_writer = AuditoriaWriter()
+
+
+def iniciar_auditoria():
+    _writer.start()
+
+
+def detener_auditoria():
+    _writer.stop()
+
+
+def get_auditoria_stats():
+    return {**_writer.stats, "pendientes": _writer._cola.qsize()}
+
+
 def registrar_accion(usuario_id: int, accion: str, ip: str = None):
     """
-    Guarda una acción en la tabla de auditoría.
+    Encola una acción para la tabla de auditoría; se guarda en segundo plano por lotes.
     """
-    conn = get_db_connection()
-    if not conn:
-        print("❌ Error: No se pudo conectar a la base de datos.")
-        return
-
-    cursor = conn.cursor()
-    try:
-        cursor.execute("""
-            INSERT INTO auditoria (usuario_id, accion, ip)
-            VALUES (%s, %s, %s)
-        """, (usuario_id, accion, ip))
-        conn.commit()
-        print(f"🧾 Acción registrada: {accion}")
-    except mysql.connector.Error as err:
-        print(f"⚠️ Error registrando acción en auditoría: {err}")
-    finally:
-        cursor.close()
-        conn.close()
+    _writer.start()
+    _writer.registrar(usuario_id, accion, ip)
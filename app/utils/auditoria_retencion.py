@@ -0,0 +1,204 @@
+"""
+Retención, archivo y resúmenes diarios de la tabla `auditoria`.
+
+La tabla caliente solo guarda los últimos AUDITORIA_RETENCION_DIAS días. El
+comando `archivar` mueve lo anterior, por lotes y en transacciones cortas, a:
+- `auditoria_archivo`: misma forma que `auditoria`, particionada por mes
+  (RANGE sobre TO_DAYS(fecha)); borrar un mes viejo es un DROP PARTITION.
+- `auditoria_resumen_diario`: una fila por (día, usuario) con la cantidad de
+  acciones y la primera/última hora, para reportes sin leer el archivo.
+
+Los índices de la tabla caliente y estas dos tablas se crean con las
+migraciones (app/utils/migraciones.py).
+
+Uso como comando (por ejemplo desde cron, una vez al día):
+    python -m app.utils.auditoria_retencion archivar [DIAS]     # mueve lo más viejo que DIAS
+    python -m app.utils.auditoria_retencion purgar MESES        # borra particiones del archivo más viejas que MESES
+"""
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+from app.database import get_db_connection
+from app.utils.cache import cache
+
+AUDITORIA_RETENCION_DIAS = int(os.getenv("AUDITORIA_RETENCION_DIAS", "90"))
+AUDITORIA_ARCHIVO_LOTE = int(os.getenv("AUDITORIA_ARCHIVO_LOTE", "5000"))  # filas por transacción
+
+DDL_ARCHIVO = """
+    CREATE TABLE IF NOT EXISTS auditoria_archivo (
+        id INT NOT NULL,
+        usuario_id INT NOT NULL,
+        accion VARCHAR(255) NOT NULL,
+        ip VARCHAR(45) NULL,
+        fecha DATETIME NOT NULL,
+        PRIMARY KEY (id, fecha),
+        KEY idx_archivo_usuario_fecha (usuario_id, fecha)
+    )
+    PARTITION BY RANGE (TO_DAYS(fecha)) (
+        PARTITION pmax VALUES LESS THAN MAXVALUE
+    )
+"""
+
+DDL_RESUMEN = """
+    CREATE TABLE IF NOT EXISTS auditoria_resumen_diario (
+        dia DATE NOT NULL,
+        usuario_id INT NOT NULL,
+        acciones INT NOT NULL,
+        primera DATETIME NOT NULL,
+        ultima DATETIME NOT NULL,
+        PRIMARY KEY (dia, usuario_id),
+        KEY idx_resumen_usuario_dia (usuario_id, dia)
+    )
+"""
+
+
+def _conectar():
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Error de conexión con la base de datos")
+    return conn
+
+
+# ---------------------- Particiones del archivo ----------------------
+def _nombre_particion(mes: date) -> str:
+    return f"p{mes.year:04d}{mes.month:02d}"
+
+
+def _mes_siguiente(mes: date) -> date:
+    return date(mes.year + (mes.month == 12), mes.month % 12 + 1, 1)
+
+
+def asegurar_particiones(cursor, desde: date, hasta: date):
+    """
+    Agrega una partición por mes entre `desde` y `hasta` partiendo `pmax`.
+    Solo se pueden agregar meses posteriores a la última partición existente;
+    filas más viejas caen en la primera partición cuyo límite las cubre.
+    """
+    cursor.execute("""
+        SELECT partition_name FROM information_schema.partitions
+        WHERE table_schema = DATABASE() AND table_name = 'auditoria_archivo'
+          AND partition_name IS NOT NULL AND partition_name <> 'pmax'
+    """)
+    existentes = sorted(fila[0] for fila in cursor.fetchall())
+    mes = date(desde.year, desde.month, 1)
+    if existentes:
+        ultimo = existentes[-1]
+        mes = max(mes, _mes_siguiente(date(int(ultimo[1:5]), int(ultimo[5:7]), 1)))
+
+    nuevas = []
+    while mes <= hasta:
+        limite = _mes_siguiente(mes)
+        nuevas.append(f"PARTITION {_nombre_particion(mes)} VALUES LESS THAN (TO_DAYS('{limite.isoformat()}'))")
+        mes = limite
+    if nuevas:
+        cursor.execute(f"""
+            ALTER TABLE auditoria_archivo REORGANIZE PARTITION pmax INTO (
+                {', '.join(nuevas)},
+                PARTITION pmax VALUES LESS THAN MAXVALUE
+            )
+        """)
+    return len(nuevas)
+
+
+# ---------------------- Archivo y resúmenes ----------------------
+def archivar(dias: int = AUDITORIA_RETENCION_DIAS, lote: int = AUDITORIA_ARCHIVO_LOTE):
+    """
+    Mueve las filas con fecha anterior a hoy - `dias` al archivo y las suma al
+    resumen diario. Cada lote (copiar, resumir, borrar) es una transacción, así
+    que se puede interrumpir y volver a correr sin duplicar nada.
+    """
+    corte = datetime.combine(date.today() - timedelta(days=dias), datetime.min.time())
+    conn = _conectar()
+    cursor = conn.cursor()
+    movidas = 0
+    try:
+        cursor.execute(DDL_ARCHIVO)
+        cursor.execute(DDL_RESUMEN)
+        cursor.execute("SELECT MIN(fecha) FROM auditoria WHERE fecha < %s", (corte,))
+        mas_vieja = cursor.fetchone()[0]
+        if mas_vieja is None:
+            return 0
+        asegurar_particiones(cursor, mas_vieja.date(), corte.date())
+
+        while True:
+            # Recorre por el índice (fecha, id): cada lote lee solo sus filas
+            cursor.execute("""
+                SELECT id FROM auditoria
+                WHERE fecha < %s
+                ORDER BY fecha, id
+                LIMIT %s
+            """, (corte, lote))
+            ids = [fila[0] for fila in cursor.fetchall()]
+            if not ids:
+                break
+            marcadores = ", ".join(["%s"] * len(ids))
+            try:
+                cursor.execute(f"""
+                    INSERT INTO auditoria_archivo (id, usuario_id, accion, ip, fecha)
+                    SELECT id, usuario_id, accion, ip, fecha FROM auditoria WHERE id IN ({marcadores})
+                """, ids)
+                cursor.execute(f"""
+                    INSERT INTO auditoria_resumen_diario (dia, usuario_id, acciones, primera, ultima)
+                    SELECT DATE(fecha), usuario_id, COUNT(*), MIN(fecha), MAX(fecha)
+                    FROM auditoria WHERE id IN ({marcadores})
+                    GROUP BY DATE(fecha), usuario_id
+                    ON DUPLICATE KEY UPDATE
+                        acciones = acciones + VALUES(acciones),
+                        primera = LEAST(primera, VALUES(primera)),
+                        ultima = GREATEST(ultima, VALUES(ultima))
+                """, ids)
+                cursor.execute(f"DELETE FROM auditoria WHERE id IN ({marcadores})", ids)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            movidas += len(ids)
+        if movidas:
+            # Con backend Redis invalida también los ETag del listado en los workers
+            cache.invalidar("auditoria")
+        return movidas
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def purgar(meses: int):
+    """Borra del archivo las particiones completas anteriores a hace `meses` meses."""
+    hoy = date.today()
+    total = hoy.year * 12 + hoy.month - 1 - meses
+    limite = _nombre_particion(date(total // 12, total % 12 + 1, 1))
+    conn = _conectar()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT partition_name FROM information_schema.partitions
+            WHERE table_schema = DATABASE() AND table_name = 'auditoria_archivo'
+              AND partition_name IS NOT NULL AND partition_name <> 'pmax'
+        """)
+        viejas = sorted(fila[0] for fila in cursor.fetchall() if fila[0] < limite)
+        if viejas:
+            cursor.execute(f"ALTER TABLE auditoria_archivo DROP PARTITION {', '.join(viejas)}")
+        return viejas
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def main(argv):
+    comando = argv[1] if len(argv) > 1 else ""
+    if comando == "archivar":
+        dias = int(argv[2]) if len(argv) > 2 else AUDITORIA_RETENCION_DIAS
+        movidas = archivar(dias)
+        print(f"✅ {movidas} registros de auditoría con más de {dias} días movidos al archivo")
+        return 0
+    if comando == "purgar" and len(argv) > 2:
+        viejas = purgar(int(argv[2]))
+        print(f"✅ Particiones borradas: {', '.join(viejas) if viejas else 'ninguna'}")
+        return 0
+    print("Uso: python -m app.utils.auditoria_retencion [archivar [DIAS]|purgar MESES]")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,284 @@
+"""
+Índices en memoria para la búsqueda por prefijo (typeahead) de usuarios y estudiantes.
+
+Cada documento se parte en tokens normalizados (minúsculas, sin tildes) de sus
+campos: palabras del nombre, el email completo y sus partes, el código. Los
+pares (token, clave) se guardan en una lista ordenada; buscar un prefijo es una
+búsqueda binaria más el recorrido del rango que empieza con él.
+
+Una búsqueda con varias palabras devuelve los documentos donde cada palabra es
+prefijo de algún token ("ana gom" encuentra a "Ana María Gómez"). Se recorre el
+rango de la palabra más selectiva y el resto se verifica por documento.
+
+Los índices se construyen al iniciar (en un hilo, sin demorar el arranque) y se
+actualizan en register y delete_usuario (indexar_usuario / desindexar_usuario).
+Cada uno guarda la versión de su grupo de caché ("busqueda_usuarios",
+"busqueda_estudiantes"), que solo cambia con esas altas y bajas: si otro worker
+lo cambió (backend Redis), el índice deja de estar vigente, los routers
+consultan SQL y se reconstruye en segundo plano.
+
+Con la caché en memoria las versiones son de cada proceso y las altas y bajas
+de otro worker no se ven: el índice se sigue usando, pero pasados
+BUSQUEDA_RECARGA_SEGUNDOS desde que se construyó se reconstruye en segundo plano.
+"""
+import bisect
+import heapq
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+
+from app.database import get_db_connection
+from app.utils.cache import cache
+
+logger = logging.getLogger(__name__)
+
+BUSQUEDA_LIMITE_DEFECTO = 10
+BUSQUEDA_LIMITE_MAXIMO = 50
+BUSQUEDA_INDICE = os.getenv("BUSQUEDA_INDICE", "1") == "1"  # 0 = siempre SQL
+BUSQUEDA_RECARGA_SEGUNDOS = float(os.getenv("BUSQUEDA_RECARGA_SEGUNDOS", "60"))  # edad máxima sin caché compartida
+
+_SEPARADORES = re.compile(r"[\s@._\-+]+")
+
+
+def normalizar(texto) -> str:
+    """Minúsculas y sin tildes: 'José' y 'jose' son el mismo token."""
+    descompuesto = unicodedata.normalize("NFKD", str(texto).lower())
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def terminos(texto) -> list:
+    return [t for t in _SEPARADORES.split(normalizar(texto)) if t]
+
+
+def prefijo_like(texto: str) -> str:
+    """Patrón LIKE 'texto%' escapando los comodines que escriba el usuario."""
+    return texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+class IndicePrefijos:
+    def __init__(self, grupo: str, clave: str, campos: tuple, orden: str = "nombre"):
+        self.grupo = grupo      # grupo de caché cuya versión indica si el índice está al día
+        self.clave = clave      # campo que identifica al documento
+        self.campos = campos    # campos indexados
+        self.orden = orden      # desempate de resultados
+        self._lock = threading.Lock()
+        self._docs = {}
+        self._tokens_doc = {}   # clave -> tokens del documento
+        self._entradas = []     # [(token, clave)] ordenada
+        self.version = None
+        self.lista = False
+        self.construido_en = None
+        self._reconstruyendo = False
+
+    # ---------------------- Construcción y cambios ----------------------
+    def _tokens(self, doc):
+        tokens = set()
+        for campo in self.campos:
+            valor = doc.get(campo)
+            if not valor:
+                continue
+            completo = normalizar(valor).strip()
+            tokens.add(completo)
+            tokens.update(terminos(valor))
+        return tokens
+
+    def construir(self, docs, version=None):
+        tokens_doc = {}
+        entradas = []
+        nuevos = {}
+        for doc in docs:
+            clave = doc[self.clave]
+            nuevos[clave] = doc
+            tokens = self._tokens(doc)
+            tokens_doc[clave] = tokens
+            entradas.extend((token, clave) for token in tokens)
+        entradas.sort()
+        with self._lock:
+            self._docs, self._tokens_doc, self._entradas = nuevos, tokens_doc, entradas
+            self.version = version
+            self.lista = True
+            self.construido_en = time.time()
+
+    def agregar(self, doc, versiones=None):
+        clave = doc[self.clave]
+        with self._lock:
+            self._quitar(clave)
+            tokens = self._tokens(doc)
+            self._docs[clave] = doc
+            self._tokens_doc[clave] = tokens
+            for token in tokens:
+                bisect.insort(self._entradas, (token, clave))
+            self._avanzar_version(versiones)
+
+    def quitar(self, clave, versiones=None):
+        with self._lock:
+            self._quitar(clave)
+            self._avanzar_version(versiones)
+
+    def _quitar(self, clave):
+        tokens = self._tokens_doc.pop(clave, ())
+        self._docs.pop(clave, None)
+        for token in tokens:
+            i = bisect.bisect_left(self._entradas, (token, clave))
+            if i < len(self._entradas) and self._entradas[i] == (token, clave):
+                del self._entradas[i]
+
+    def _avanzar_version(self, versiones):
+        # versiones = (antes, después) del cambio local. Solo se avanza si el índice
+        # estaba en `antes`: así un cambio local no tapa los de otros workers.
+        if versiones is not None and self.version == versiones[0]:
+            self.version = versiones[1]
+
+    # ---------------------- Consultas ----------------------
+    def vigente(self, version) -> bool:
+        return self.lista and self.version == version
+
+    def _rango(self, prefijo):
+        inicio = bisect.bisect_left(self._entradas, (prefijo,))
+        fin = bisect.bisect_left(self._entradas, (prefijo + "\U0010ffff",))
+        return inicio, fin
+
+    def buscar(self, texto: str, limite: int = BUSQUEDA_LIMITE_DEFECTO, filtro=None):
+        """
+        Hasta `limite` documentos ordenados por relevancia: coincidencia exacta de
+        un token, luego prefijo del primer token (el nombre empieza así), luego `orden`.
+        """
+        palabras = terminos(texto)
+        if not palabras:
+            return []
+        with self._lock:
+            rangos = [self._rango(p) for p in palabras]
+            guia = min(range(len(palabras)), key=lambda i: rangos[i][1] - rangos[i][0])
+            inicio, fin = rangos[guia]
+            candidatos = {clave for _, clave in self._entradas[inicio:fin]}
+            resto = [p for i, p in enumerate(palabras) if i != guia]
+
+            puntuados = []
+            for clave in candidatos:
+                doc = self._docs[clave]
+                if filtro is not None and not filtro(doc):
+                    continue
+                tokens = self._tokens_doc[clave]
+                if not all(any(t.startswith(p) for t in tokens) for p in resto):
+                    continue
+                exactas = sum(p in tokens for p in palabras)
+                empieza = normalizar(doc.get(self.orden) or "").startswith(palabras[0])
+                puntuados.append((-exactas, not empieza, normalizar(doc.get(self.orden) or ""), clave))
+            mejores = heapq.nsmallest(limite, puntuados)
+            return [self._docs[clave] for *_, clave in mejores]
+
+    def reconstruir_en_segundo_plano(self, cargar):
+        """Reconstruye con `cargar()` en un hilo, uno a la vez."""
+        with self._lock:
+            if self._reconstruyendo:
+                return
+            self._reconstruyendo = True
+
+        def tarea():
+            try:
+                version = cache.version(self.grupo)  # antes de leer: un cambio durante la carga deja el índice no vigente
+                self.construir(cargar(), version)
+                logger.info("Índice de búsqueda '%s' construido", self.grupo,
+                            extra={"documentos": len(self._docs)})
+            except Exception as e:
+                logger.error("❌ No se pudo construir el índice de búsqueda '%s': %s", self.grupo, e)
+            finally:
+                with self._lock:
+                    self._reconstruyendo = False
+
+        threading.Thread(target=tarea, name=f"indice-{self.grupo}", daemon=True).start()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "lista": self.lista,
+                "documentos": len(self._docs),
+                "tokens": len(self._entradas),
+                "construido_en": self.construido_en,
+            }
+
+
+# ---------------------- Índices de la aplicación ----------------------
+indice_usuarios = IndicePrefijos("busqueda_usuarios", "id", ("nombre", "email"))
+# Estudiantes por usuario_id: delete_usuario solo conoce ese id
+indice_estudiantes = IndicePrefijos("busqueda_estudiantes", "usuario_id", ("nombre", "email", "codigo_estudiante"))
+
+
+def _nueva_version(indice):
+    """Publica un cambio del grupo del índice y devuelve (versión anterior, versión nueva)."""
+    antes = cache.version(indice.grupo)
+    cache.invalidar(indice.grupo)
+    return antes, cache.version(indice.grupo)
+
+
+def indexar_usuario(usuario: dict, estudiante: dict = None):
+    """Alta después del commit de register (`estudiante` con id, usuario_id y codigo_estudiante)."""
+    indice_usuarios.agregar(usuario, _nueva_version(indice_usuarios))
+    if estudiante is not None:
+        indice_estudiantes.agregar(
+            {**estudiante, "nombre": usuario["nombre"], "email": usuario["email"]},
+            _nueva_version(indice_estudiantes),
+        )
+
+
+def desindexar_usuario(usuario_id: int):
+    """Baja después del commit de delete_usuario (si era estudiante, sale de los dos índices)."""
+    for indice in (indice_usuarios, indice_estudiantes):
+        indice.quitar(usuario_id, _nueva_version(indice))
+
+
+def cargar_usuarios():
+    # Del primario: una réplica atrasada dejaría un índice viejo marcado como vigente
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Error de conexión con la base de datos")
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("SELECT id, email, rol, nombre FROM usuarios")
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def cargar_estudiantes():
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Error de conexión con la base de datos")
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("""
+            SELECT e.id, e.usuario_id, e.codigo_estudiante, u.nombre, u.email
+            FROM estudiantes e
+            JOIN usuarios u ON e.usuario_id = u.id
+            WHERE u.rol = 'estudiante'
+        """)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def iniciar_indices():
+    if BUSQUEDA_INDICE:
+        indice_usuarios.reconstruir_en_segundo_plano(cargar_usuarios)
+        indice_estudiantes.reconstruir_en_segundo_plano(cargar_estudiantes)
+
+
+def indice_vigente(indice: IndicePrefijos, cargar) -> bool:
+    """True si se puede responder desde el índice; si no, pide reconstruirlo."""
+    if not BUSQUEDA_INDICE:
+        return False
+    if indice.vigente(cache.version(indice.grupo)):
+        if not cache.compartida and time.time() - indice.construido_en > BUSQUEDA_RECARGA_SEGUNDOS:
+            indice.reconstruir_en_segundo_plano(cargar)
+        return True
+    indice.reconstruir_en_segundo_plano(cargar)
+    return False
+
+
+def get_busqueda_stats():
+    return {"usuarios": indice_usuarios.stats(), "estudiantes": indice_estudiantes.stats()}
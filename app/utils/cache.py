@@ -0,0 +1,256 @@
+"""
+Caché de lectura para los listados (notas, estudiantes, usuarios).
+
+Cada entrada pertenece a un grupo y guarda los filtros con los que se calculó.
+Al escribir, los handlers invalidan solo las entradas del grupo cuyos filtros
+coinciden con la fila modificada, en lugar de vaciar todo.
+
+Backends:
+- "memoria": LRU con TTL y límite de bytes, propio de cada proceso.
+- "redis": cualquier servidor compatible con Redis, compartido entre workers de uvicorn.
+"""
+import json
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from app.database import registrar_cambio, usar_marcas
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memoria")  # memoria | redis
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_TTL = float(os.getenv("CACHE_TTL", "60"))                         # segundos
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Las claves del índice de un grupo se podan con el reloj de cada worker: se conservan
+# un rato después de vencer para tolerar relojes desfasados entre máquinas
+_HOLGURA_RELOJ = 60  # segundos
+
+
+def _clave(grupo: str, filtros: dict) -> str:
+    return f"{grupo}|{json.dumps(filtros, sort_keys=True, default=str)}"
+
+
+def _filtros_de_clave(clave: str) -> dict:
+    return json.loads(clave.split("|", 1)[1])
+
+
+def _afectada(filtros: dict, campos: dict) -> bool:
+    """
+    Una entrada se ve afectada salvo que filtre por un campo con un valor distinto
+    al de la fila modificada. Filtros que no aparecen en `campos` (cursor, rangos...)
+    no descartan nada: ante la duda se invalida.
+    """
+    for campo, valor in campos.items():
+        filtro = filtros.get(campo)
+        if filtro is not None and filtro != valor:
+            return False
+    return True
+
+
+class MemoryBackend:
+    """LRU en memoria con TTL por entrada y tamaño total acotado en bytes."""
+
+    compartido = False  # cada worker tiene sus entradas y sus generaciones
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._datos = OrderedDict()   # clave -> (expira, datos)
+        self._grupos = {}             # grupo -> set(claves)
+        self._generaciones = {}
+        self._epoca = os.urandom(4).hex()
+        self._bytes = 0
+        self.evictions = 0
+
+    def get(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            expira, datos = entrada
+            if expira < time.monotonic():
+                self._quitar(clave)
+                return None
+            self._datos.move_to_end(clave)
+            return datos
+
+    def set(self, grupo, clave, datos, ttl):
+        if len(datos) > self.max_bytes:
+            return
+        with self._lock:
+            if clave in self._datos:
+                self._quitar(clave)
+            self._datos[clave] = (time.monotonic() + ttl, datos)
+            self._grupos.setdefault(grupo, set()).add(clave)
+            self._bytes += len(datos)
+            while self._bytes > self.max_bytes:
+                antigua = next(iter(self._datos))
+                self._quitar(antigua)
+                self.evictions += 1
+
+    def claves_grupo(self, grupo):
+        with self._lock:
+            return list(self._grupos.get(grupo, ()))
+
+    def delete(self, grupo, claves):
+        with self._lock:
+            for clave in claves:
+                if clave in self._datos:
+                    self._quitar(clave)
+
+    def generacion(self, grupo):
+        return self._generaciones.get(grupo, 0)
+
+    def version(self, grupo):
+        # La época distingue procesos y reinicios: los contadores vuelven a 0
+        return f"{self._epoca}.{self._generaciones.get(grupo, 0)}"
+
+    def incrementar_generacion(self, grupo):
+        with self._lock:
+            self._generaciones[grupo] = self._generaciones.get(grupo, 0) + 1
+
+    def _quitar(self, clave):
+        _, datos = self._datos.pop(clave)
+        self._bytes -= len(datos)
+        grupo = clave.split("|", 1)[0]
+        claves = self._grupos.get(grupo)
+        if claves is not None:
+            claves.discard(clave)
+
+    def info(self):
+        with self._lock:
+            return {"backend": "memoria", "entradas": len(self._datos), "bytes": self._bytes,
+                    "max_bytes": self.max_bytes, "evictions": self.evictions}
+
+
+class RedisBackend:
+    """
+    Backend compartido sobre un servidor compatible con Redis.
+    El LRU y el límite de memoria los aplica el servidor (maxmemory-policy allkeys-lru).
+    """
+
+    compartido = True
+
+    def __init__(self, url=CACHE_REDIS_URL):
+        import redis  # dependencia opcional: solo se necesita con CACHE_BACKEND=redis
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, clave):
+        return self._redis.get(f"cache:{clave}")
+
+    def set(self, grupo, clave, datos, ttl):
+        # Índice del grupo: sorted set con el vencimiento de cada clave como score,
+        # así las claves que Redis ya venció se podan y el índice no crece sin límite
+        ttl = max(int(ttl), 1)
+        ahora = time.time()
+        pipe = self._redis.pipeline()
+        pipe.set(f"cache:{clave}", datos, ex=ttl)
+        pipe.zadd(f"cache-claves:{grupo}", {clave: ahora + ttl})
+        pipe.zremrangebyscore(f"cache-claves:{grupo}", "-inf", ahora - _HOLGURA_RELOJ)
+        pipe.execute()
+
+    def claves_grupo(self, grupo):
+        minimo = time.time() - _HOLGURA_RELOJ
+        return [c.decode() for c in self._redis.zrangebyscore(f"cache-claves:{grupo}", minimo, "+inf")]
+
+    def delete(self, grupo, claves):
+        if not claves:
+            return
+        pipe = self._redis.pipeline()
+        pipe.delete(*[f"cache:{c}" for c in claves])
+        pipe.zrem(f"cache-claves:{grupo}", *claves)
+        pipe.execute()
+
+    def generacion(self, grupo):
+        valor = self._redis.get(f"cache-gen:{grupo}")
+        return int(valor) if valor else 0
+
+    def version(self, grupo):
+        # Época compartida por todos los workers; si Redis pierde los datos se crea otra
+        epoca, generacion = self._redis.mget("cache-epoca", f"cache-gen:{grupo}")
+        if epoca is None:
+            self._redis.set("cache-epoca", os.urandom(4).hex(), nx=True)
+            epoca = self._redis.get("cache-epoca")
+        return f"{epoca.decode()}.{int(generacion) if generacion else 0}"
+
+    def incrementar_generacion(self, grupo):
+        self._redis.incr(f"cache-gen:{grupo}")
+
+    def marcar(self, clave, segundos):
+        # Marcas de lecturas propias (app.database): Redis las vence solo
+        self._redis.set(f"cache-marca:{clave}", 1, px=max(int(segundos * 1000), 1))
+
+    def alguna_vigente(self, claves):
+        return bool(claves) and any(v is not None for v in self._redis.mget([f"cache-marca:{c}" for c in claves]))
+
+    def info(self):
+        stats = self._redis.info("stats")
+        return {"backend": "redis", "evictions": stats.get("evicted_keys", 0)}
+
+
+class ResponseCache:
+    def __init__(self, backend, ttl=CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidaciones = 0
+
+    def obtener_o_calcular(self, grupo: str, filtros: dict, calcular, ttl=None):
+        """
+        Devuelve el valor cacheado para (grupo, filtros) o lo calcula y lo guarda.
+        Si hubo una invalidación del grupo mientras se calculaba, el resultado no se guarda.
+        """
+        clave = _clave(grupo, filtros)
+        datos = self.backend.get(clave)
+        if datos is not None:
+            self.hits += 1
+            return pickle.loads(datos)
+
+        self.misses += 1
+        generacion = self.backend.generacion(grupo)
+        valor = calcular()
+        if self.backend.generacion(grupo) == generacion:
+            self.backend.set(grupo, clave, pickle.dumps(valor, pickle.HIGHEST_PROTOCOL), ttl or self.ttl)
+        return valor
+
+    def invalidar(self, grupo: str, **campos):
+        """Borra las entradas del grupo afectadas por una fila con estos valores."""
+        registrar_cambio(grupo)
+        self.backend.incrementar_generacion(grupo)
+        claves = [c for c in self.backend.claves_grupo(grupo) if _afectada(_filtros_de_clave(c), campos)]
+        self.backend.delete(grupo, claves)
+        self.invalidaciones += len(claves)
+
+    def version(self, grupo: str) -> str:
+        """Identificador que cambia con cada invalidación del grupo (base de los ETags)."""
+        return self.backend.version(grupo)
+
+    @property
+    def compartida(self) -> bool:
+        """True si todos los workers ven las mismas invalidaciones (backend Redis)."""
+        return self.backend.compartido
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "invalidaciones": self.invalidaciones,
+            **self.backend.info(),
+        }
+
+
+def _crear_backend():
+    if CACHE_BACKEND == "redis":
+        backend = RedisBackend()
+        # Las escrituras recientes se comparten entre workers igual que las generaciones
+        usar_marcas(backend)
+        return backend
+    return MemoryBackend()
+
+
+cache = ResponseCache(_crear_backend())
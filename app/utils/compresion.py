@@ -0,0 +1,90 @@
+"""
+Compresión negociada de respuestas (brotli o gzip) por encima de un tamaño mínimo.
+
+Se elige la codificación según Accept-Encoding (con sus pesos q): brotli si el
+cliente la acepta y el paquete `brotli` está instalado, si no gzip. Las
+respuestas chicas, los eventos SSE y los archivos ya comprimidos (exportaciones
+.gz) pasan sin tocar. Reutiliza los responders de Starlette, que ya manejan
+respuestas en streaming, Content-Length y Vary.
+"""
+import os
+
+import anyio.to_thread
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import DEFAULT_EXCLUDED_CONTENT_TYPES, GZipResponder, IdentityResponder
+
+try:
+    import brotli  # dependencia opcional
+except ImportError:
+    brotli = None
+
+COMPRESION_MINIMO = int(os.getenv("COMPRESION_MINIMO", "1024"))    # bytes
+GZIP_NIVEL = int(os.getenv("GZIP_NIVEL", "6"))
+BROTLI_CALIDAD = int(os.getenv("BROTLI_CALIDAD", "4"))           # 0-11; más alto comprime más y tarda más
+COMPRESION_EN_HILO = 128 * 1024  # cuerpos más grandes se comprimen fuera del event loop
+
+
+def elegir_codificacion(accept_encoding: str):
+    """'br', 'gzip' o None según las preferencias del cliente."""
+    pesos = {}
+    for parte in accept_encoding.split(","):
+        nombre, _, parametros = parte.strip().partition(";")
+        nombre = nombre.strip().lower()
+        if not nombre:
+            continue
+        q = 1.0
+        parametros = parametros.strip()
+        if parametros.startswith("q="):
+            try:
+                q = float(parametros[2:])
+            except ValueError:
+                q = 0.0
+        pesos[nombre] = q
+
+    comodin = pesos.get("*", 0.0)
+    candidatas = [("br", pesos.get("br", comodin))] if brotli is not None else []
+    candidatas.append(("gzip", pesos.get("gzip", comodin)))
+    # Ante el mismo peso gana brotli (primera de la lista)
+    codificacion, q = max(candidatas, key=lambda c: c[1])
+    return codificacion if q > 0 else None
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app, minimum_size, calidad=BROTLI_CALIDAD):
+        super().__init__(app, minimum_size, exclude_content_types=DEFAULT_EXCLUDED_CONTENT_TYPES)
+        self.calidad = calidad
+        self._compresor = None
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if len(body) >= COMPRESION_EN_HILO:
+            return await anyio.to_thread.run_sync(self._comprimir, body, more_body)
+        return self._comprimir(body, more_body)
+
+    def _comprimir(self, body: bytes, more_body: bool) -> bytes:
+        if self._compresor is None:
+            self._compresor = brotli.Compressor(quality=self.calidad)
+        if more_body:
+            return self._compresor.process(body) + self._compresor.flush()
+        return self._compresor.process(body) + self._compresor.finish()
+
+
+class CompresionMiddleware:
+    def __init__(self, app, minimo=COMPRESION_MINIMO):
+        self.app = app
+        self.minimo = minimo
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        codificacion = elegir_codificacion(Headers(scope=scope).get("accept-encoding", ""))
+        if codificacion == "br":
+            responder = BrotliResponder(self.app, self.minimo)
+        elif codificacion == "gzip":
+            responder = GZipResponder(self.app, self.minimo, compresslevel=GZIP_NIVEL)
+        else:
+            responder = IdentityResponder(self.app, self.minimo)
+        await responder(scope, receive, send)
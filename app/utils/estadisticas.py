@@ -0,0 +1,101 @@
+"""
+Estadísticas de calificaciones por (asignatura, periodo) calculadas con NumPy.
+
+Todas las notas se cargan como columnas y los grupos se resuelven en una sola
+pasada vectorizada: ordenar por (grupo, calificación) deja cada grupo contiguo
+y ordenado, así que medias, desviaciones, percentiles e histogramas salen de
+operaciones por segmentos sin recorrer los grupos en Python.
+"""
+import numpy as np
+
+NOTA_MAXIMA = 5.0
+NOTA_APROBATORIA = 3.0
+HISTOGRAMA_BINS = 10
+PERCENTILES = (10, 25, 75, 90)
+FILAS_POR_BLOQUE = 5000
+
+
+def leer_columnas(cursor, sql: str, params=()):
+    """Lee (asignatura, periodo, calificacion) por bloques y los devuelve como columnas."""
+    cursor.execute(sql, params)
+    asignaturas, periodos, calificaciones = [], [], []
+    while True:
+        filas = cursor.fetchmany(FILAS_POR_BLOQUE)
+        if not filas:
+            break
+        asig, per, cal = zip(*filas)
+        asignaturas.extend(asig)
+        periodos.extend(per)
+        calificaciones.extend(cal)
+    return asignaturas, periodos, np.asarray(calificaciones, dtype=np.float64)
+
+
+def unir_columnas(*partes):
+    """Concatena varias ternas (asignaturas, periodos, calificaciones) en una sola."""
+    asignaturas, periodos = [], []
+    for asig, per, _ in partes:
+        asignaturas.extend(asig)
+        periodos.extend(per)
+    calificaciones = np.concatenate([np.asarray(cal, dtype=np.float64) for _, _, cal in partes])
+    return asignaturas, periodos, calificaciones
+
+
+def _percentil_por_grupo(ordenadas, inicios, conteos, p):
+    # Interpolación lineal, igual que np.percentile(method="linear"), para todos los grupos a la vez
+    posicion = inicios + (conteos - 1) * (p / 100.0)
+    abajo = np.floor(posicion).astype(np.int64)
+    arriba = np.ceil(posicion).astype(np.int64)
+    peso = posicion - abajo
+    return ordenadas[abajo] * (1 - peso) + ordenadas[arriba] * peso
+
+
+def calcular_estadisticas(asignaturas, periodos, calificaciones, bins=HISTOGRAMA_BINS):
+    """
+    Devuelve una lista con las estadísticas de cada (asignatura, periodo) presente.
+    `calificaciones` es un arreglo de floats alineado con las otras dos columnas.
+    """
+    if len(calificaciones) == 0:
+        return []
+
+    # Codificar cada (asignatura, periodo) como un entero de grupo
+    claves = np.array([f"{a}\x00{p}" for a, p in zip(asignaturas, periodos)], dtype=object)
+    grupos, codigos = np.unique(claves, return_inverse=True)
+    n_grupos = len(grupos)
+
+    orden = np.lexsort((calificaciones, codigos))
+    ordenadas = calificaciones[orden]
+    conteos = np.bincount(codigos, minlength=n_grupos)
+    inicios = np.concatenate(([0], np.cumsum(conteos)[:-1]))
+
+    sumas = np.add.reduceat(ordenadas, inicios)
+    medias = sumas / conteos
+    cuadrados = np.add.reduceat(ordenadas * ordenadas, inicios)
+    desviaciones = np.sqrt(np.maximum(cuadrados / conteos - medias * medias, 0.0))
+    aprobados = np.add.reduceat((ordenadas >= NOTA_APROBATORIA).astype(np.int64), inicios)
+    minimos = ordenadas[inicios]
+    maximos = ordenadas[inicios + conteos - 1]
+    medianas = _percentil_por_grupo(ordenadas, inicios, conteos, 50)
+    percentiles = {p: _percentil_por_grupo(ordenadas, inicios, conteos, p) for p in PERCENTILES}
+
+    ancho = NOTA_MAXIMA / bins
+    bin_de_nota = np.clip((calificaciones / ancho).astype(np.int64), 0, bins - 1)
+    histogramas = np.bincount(codigos * bins + bin_de_nota, minlength=n_grupos * bins).reshape(n_grupos, bins)
+    bordes = [round(i * ancho, 2) for i in range(bins + 1)]
+
+    resultado = []
+    for i, clave in enumerate(grupos):
+        asignatura, periodo = clave.split("\x00", 1)
+        resultado.append({
+            "asignatura": asignatura,
+            "periodo": periodo,
+            "cantidad": int(conteos[i]),
+            "promedio": round(float(medias[i]), 2),
+            "mediana": round(float(medianas[i]), 2),
+            "desviacion": round(float(desviaciones[i]), 3),
+            "minimo": float(minimos[i]),
+            "maximo": float(maximos[i]),
+            "percentiles": {f"p{p}": round(float(v[i]), 2) for p, v in percentiles.items()},
+            "tasa_aprobacion": round(float(aprobados[i]) / int(conteos[i]), 4),
+            "histograma": {"bordes": bordes, "conteos": histogramas[i].tolist()},
+        })
+    return resultado
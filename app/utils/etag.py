@@ -0,0 +1,48 @@
+"""
+GET condicional (ETag / If-None-Match) para los listados.
+
+El ETag no sale de hashear el cuerpo: se arma con la versión de los grupos de
+caché de los que depende el listado (cada escritura los invalida y eso sube la
+versión) más la ruta y los parámetros de la consulta. Así una petición cuyo
+If-None-Match coincide se responde con 304 sin ejecutar la consulta principal.
+
+La versión se lee ANTES de consultar: si una escritura ocurre en medio, el ETag
+enviado queda viejo y la siguiente petición simplemente recibe un 200.
+
+Con la caché en memoria cada worker solo ve sus propias invalidaciones, así que
+el ETag incluye además un tramo de reloj de CACHE_TTL segundos: una escritura
+atendida por otro worker se nota, como mucho, al cambiar de tramo (lo mismo
+que tarda en vencer una entrada de la caché de ese worker).
+"""
+import hashlib
+import time
+
+from fastapi import Request, Response
+
+from app.utils.cache import cache
+
+
+def calcular_etag(request: Request, *grupos: str) -> str:
+    versiones = "|".join(f"{grupo}={cache.version(grupo)}" for grupo in grupos)
+    if not cache.compartida:
+        versiones += f"|t={int(time.time() // max(cache.ttl, 1))}"
+    # Parámetros ordenados: ?a=1&b=2 y ?b=2&a=1 son el mismo listado
+    consulta = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    digest = hashlib.blake2b(f"{request.url.path}?{consulta}#{versiones}".encode(), digest_size=12).hexdigest()
+    # Débil: el mismo contenido puede viajar comprimido o no
+    return f'W/"{digest}"'
+
+
+def coincide(request: Request, etag: str) -> bool:
+    """Comparación débil contra If-None-Match (admite varias etiquetas y '*')."""
+    valor = request.headers.get("if-none-match")
+    if not valor:
+        return False
+    if valor.strip() == "*":
+        return True
+    buscada = etag.removeprefix("W/")
+    return any(candidata.strip().removeprefix("W/") == buscada for candidata in valor.split(","))
+
+
+def no_modificado(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
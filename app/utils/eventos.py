@@ -0,0 +1,205 @@
+"""
+Difusión de cambios de notas a los clientes conectados por SSE (/notas/stream).
+
+Los handlers de escritura corren en hilos del executor de base de datos y
+publican aquí después del commit; cada suscriptor tiene una cola acotada en
+su event loop y recibe solo los eventos que pasan su filtro (asignatura/periodo).
+
+Si un cliente lento llena su cola, se descartan sus eventos pendientes y se le
+envía un único evento "resync": los deltas ya no son confiables y debe volver a
+pedir el listado completo. Así un cliente no puede hacer crecer la memoria del
+servidor ni frenar a los demás.
+
+Los suscriptores viven en el proceso: con varios workers de uvicorn cada uno
+difunde solo las escrituras que atendió.
+
+Los ids de evento son "<época del proceso>-<secuencia>" y el difusor guarda los
+últimos EVENTOS_HISTORIAL eventos. Un cliente que se reconecta con Last-Event-ID
+(el stream se cierra cada EVENTOS_DURACION_MAXIMA) recibe los que se perdió; solo
+si ese id no es de este proceso o ya salió del historial se le manda "resync".
+"""
+import asyncio
+import itertools
+import os
+import threading
+from collections import deque
+
+EVENTOS_BUFFER = int(os.getenv("EVENTOS_BUFFER", "256"))         # eventos pendientes por cliente
+EVENTOS_KEEPALIVE = float(os.getenv("EVENTOS_KEEPALIVE", "15"))  # segundos entre comentarios de keep-alive
+# Vida máxima de un stream: el cliente se reconecta solo. Acota la espera de un apagado
+# ordenado (uvicorn espera a que terminen las respuestas abiertas) y reparte clientes entre workers.
+EVENTOS_DURACION_MAXIMA = float(os.getenv("EVENTOS_DURACION_MAXIMA", "300"))
+EVENTOS_HISTORIAL = int(os.getenv("EVENTOS_HISTORIAL", "1024"))  # eventos recientes para reanudar con Last-Event-ID
+
+_FIN = object()
+
+
+class Suscripcion:
+    def __init__(self, asignatura=None, periodo=None, maximo=EVENTOS_BUFFER):
+        self.asignatura = asignatura
+        self.periodo = periodo
+        self.loop = asyncio.get_running_loop()
+        self.cola = asyncio.Queue(maxsize=maximo)
+        self.descartados = 0
+        self.id_inicial = None  # id desde el que reanudar si se corta antes del primer evento
+
+    def acepta(self, nota) -> bool:
+        return ((self.asignatura is None or nota["asignatura"] == self.asignatura)
+                and (self.periodo is None or nota["periodo"] == self.periodo))
+
+    def traducir(self, evento):
+        """
+        El evento tal como lo ve este suscriptor, o None si no le corresponde.
+        En "updated", una nota que entra a su filtro es "created" y una que sale es "deleted".
+        """
+        tipo = evento["tipo"]
+        if tipo == "resync":
+            notas = evento.get("notas")
+            return evento if notas is None or any(self.acepta(nota) for nota in notas) else None
+        nota, anterior = evento["nota"], evento.get("anterior")
+        ahora = self.acepta(nota)
+        antes = anterior is not None and self.acepta(anterior)
+        if tipo == "updated" and ahora != antes:
+            tipo, nota = ("created", nota) if ahora else ("deleted", anterior)
+        elif not ahora:
+            return None
+        return {"id": evento["id"], "tipo": tipo, "nota": nota}
+
+    def _encolar(self, evento):
+        # Corre en el event loop del suscriptor
+        try:
+            self.cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            self.descartados += self.cola.qsize()
+            while not self.cola.empty():
+                self.cola.get_nowait()
+            self.cola.put_nowait({"id": evento.get("id"), "tipo": "resync"})
+
+    async def siguiente(self, timeout=EVENTOS_KEEPALIVE):
+        """Próximo evento, None si pasó el intervalo de keep-alive, o _FIN al cerrar."""
+        try:
+            return await asyncio.wait_for(self.cola.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Difusor:
+    def __init__(self, historial=EVENTOS_HISTORIAL):
+        self._lock = threading.Lock()
+        self._suscripciones = set()
+        self._secuencia = itertools.count(1)
+        self._historial = deque(maxlen=historial)
+        self._olvidado = 0   # secuencia del último evento que salió del historial
+        self._ultimo = 0
+        self.epoca = os.urandom(4).hex()  # distingue procesos y reinicios: la secuencia vuelve a 1
+        self.publicados = 0
+        self.reanudados = 0
+
+    def id_evento(self, evento) -> str:
+        return f"{self.epoca}-{evento['id']}"
+
+    def suscribir(self, asignatura=None, periodo=None, ultimo_id: str = None) -> Suscripcion:
+        """
+        Debe llamarse desde el event loop que va a consumir la suscripción.
+        Con `ultimo_id` (Last-Event-ID) se encolan primero los eventos posteriores
+        del historial, o un "resync" si no se pueden reconstruir.
+        """
+        suscripcion = Suscripcion(asignatura, periodo)
+        with self._lock:
+            self._suscripciones.add(suscripcion)
+            # Bajo el mismo lock: lo que no esté en la copia llegará en vivo
+            pendientes = self._desde(ultimo_id) if ultimo_id else []
+            if not ultimo_id:
+                suscripcion.id_inicial = f"{self.epoca}-{self._ultimo}"
+        for evento in pendientes:
+            evento = suscripcion.traducir(evento)
+            if evento is not None:
+                suscripcion._encolar(evento)
+        return suscripcion
+
+    def _desde(self, ultimo_id):
+        epoca, _, secuencia = ultimo_id.strip().rpartition("-")
+        if epoca == self.epoca and secuencia.isdigit() and self._olvidado <= int(secuencia) <= self._ultimo:
+            self.reanudados += 1
+            return [evento for evento in self._historial if evento["id"] > int(secuencia)]
+        return [{"id": self._ultimo, "tipo": "resync"}]
+
+    def _registrar(self, evento):
+        # Con el lock tomado
+        evento["id"] = self._ultimo = next(self._secuencia)
+        if len(self._historial) == self._historial.maxlen:
+            self._olvidado = self._historial[0]["id"]
+        self._historial.append(evento)
+
+    def cancelar(self, suscripcion: Suscripcion):
+        with self._lock:
+            self._suscripciones.discard(suscripcion)
+
+    def publicar(self, tipo: str, nota: dict, anterior: dict = None):
+        """
+        Publica un cambio de nota ("created", "updated" o "deleted"). Seguro desde cualquier hilo.
+        En "updated" se pasa también la versión `anterior` (ver Suscripcion.traducir).
+        Se guarda en el historial aunque no haya suscriptores: alguno puede estar reconectándose.
+        """
+        evento = {"tipo": tipo, "nota": nota, "anterior": anterior}
+        with self._lock:
+            self._registrar(evento)
+            suscripciones = list(self._suscripciones)
+            self.publicados += 1
+        for suscripcion in suscripciones:
+            visto = suscripcion.traducir(evento)
+            if visto is not None:
+                _enviar(suscripcion, suscripcion._encolar, visto)
+
+    def pedir_resync(self, notas=None):
+        """
+        Cambios masivos: en lugar de un evento por fila, un "resync" a cada suscriptor
+        afectado por alguna de las `notas` (a todos si no se indican).
+        """
+        evento = {"tipo": "resync", "notas": notas}
+        with self._lock:
+            self._registrar(evento)
+            suscripciones = list(self._suscripciones)
+        for suscripcion in suscripciones:
+            if suscripcion.traducir(evento) is not None:
+                _enviar(suscripcion, suscripcion._encolar, evento)
+
+    def cerrar(self):
+        """Termina todos los streams abiertos (al apagar el servidor)."""
+        with self._lock:
+            suscripciones = list(self._suscripciones)
+            self._suscripciones.clear()
+        for suscripcion in suscripciones:
+            _enviar(suscripcion, _forzar_fin, suscripcion)
+
+    def stats(self):
+        with self._lock:
+            suscripciones = list(self._suscripciones)
+        return {
+            "suscriptores": len(suscripciones),
+            "publicados": self.publicados,
+            "reanudados": self.reanudados,
+            "pendientes": sum(s.cola.qsize() for s in suscripciones),
+            "descartados": sum(s.descartados for s in suscripciones),
+        }
+
+
+def _enviar(suscripcion, funcion, *args):
+    try:
+        suscripcion.loop.call_soon_threadsafe(funcion, *args)
+    except RuntimeError:
+        # El loop del suscriptor ya se cerró
+        pass
+
+
+def _forzar_fin(suscripcion):
+    while not suscripcion.cola.empty():
+        suscripcion.cola.get_nowait()
+    suscripcion.cola.put_nowait(_FIN)
+
+
+def es_fin(evento) -> bool:
+    return evento is _FIN
+
+
+difusor = Difusor()
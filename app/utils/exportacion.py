@@ -0,0 +1,127 @@
+"""
+Exportación en streaming (CSV o NDJSON, opcionalmente gzip) de consultas grandes.
+
+Las filas se leen con un cursor sin buffer (el servidor las envía a medida que
+se piden) en bloques de `fetchmany`, y cada bloque se escribe a la respuesta
+antes de pedir el siguiente: la memoria no crece con el número de filas.
+"""
+import csv
+import io
+import json
+import os
+import zlib
+from itertools import islice
+
+import mysql.connector
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.database import get_read_connection
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "2000"))
+
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _valor_csv(valor):
+    if valor is None:
+        return ""
+    if hasattr(valor, "isoformat"):
+        return valor.isoformat()
+    return valor
+
+
+def _lotes(cursor, previas):
+    if previas is not None:
+        while True:
+            filas = list(islice(previas, EXPORT_CHUNK_ROWS))
+            if not filas:
+                break
+            yield filas
+    while True:
+        filas = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+        if not filas:
+            break
+        yield filas
+
+
+def _bloques(conn, cursor, formato: str, previas=None):
+    terminado = False
+    try:
+        columnas = list(cursor.column_names)
+
+        if formato == "csv":
+            buffer = io.StringIO()
+            escritor = csv.writer(buffer)
+            escritor.writerow(columnas)
+            yield buffer.getvalue().encode()
+
+        for filas in _lotes(cursor, previas):
+            if formato == "csv":
+                buffer = io.StringIO()
+                escritor = csv.writer(buffer)
+                escritor.writerows([_valor_csv(v) for v in fila] for fila in filas)
+                yield buffer.getvalue().encode()
+            else:
+                yield "".join(
+                    json.dumps(dict(zip(columnas, fila)), default=str, ensure_ascii=False) + "\n"
+                    for fila in filas
+                ).encode()
+        terminado = True
+    finally:
+        if terminado:
+            cursor.close()
+            conn.close()
+        else:
+            # El cliente cortó la descarga: quedan filas sin leer en la conexión
+            conn.discard()
+
+
+def _gzip(bloques):
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> formato gzip
+    try:
+        for bloque in bloques:
+            comprimido = compresor.compress(bloque)
+            if comprimido:
+                yield comprimido
+        yield compresor.flush()
+    finally:
+        bloques.close()
+
+
+def exportar(sql: str, params, formato: str, nombre: str, comprimir: bool = False, previas=None) -> StreamingResponse:
+    """
+    Ejecuta `sql` (solo lectura) y devuelve una respuesta en streaming con el resultado.
+    `previas` (opcional) son filas con las mismas columnas que se envían antes de las de la consulta.
+    La consulta se lanza aquí (llamar con run_db) para que los errores de conexión
+    o SQL se reporten antes de empezar a enviar el cuerpo.
+    """
+    if formato not in FORMATOS:
+        raise HTTPException(status_code=400, detail=f"Formato no soportado: {formato}")
+
+    # Lectura larga y sin buffer: mejor en una réplica que reteniendo una conexión del primario
+    conn = get_read_connection()
+    if not conn:
+        raise HTTPException(status_code=500, detail="Error de conexión con la base de datos")
+    cursor = conn.cursor(buffered=False)
+    try:
+        cursor.execute(sql, params)
+    except mysql.connector.Error as err:
+        conn.discard()
+        raise HTTPException(status_code=500, detail=f"Error SQL: {err}")
+
+    contenido = _bloques(conn, cursor, formato, previas)
+    media_type = FORMATOS[formato]
+    archivo = f"{nombre}.{formato}"
+    if comprimir:
+        contenido = _gzip(contenido)
+        media_type = "application/gzip"
+        archivo += ".gz"
+    return StreamingResponse(
+        contenido,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{archivo}"'},
+    )
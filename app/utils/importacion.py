@@ -0,0 +1,74 @@
+"""
+Lectura en streaming de cargas masivas de notas (JSON, CSV o NDJSON).
+"""
+import codecs
+import csv
+import json
+
+from fastapi import HTTPException, Request
+
+TIPOS_CSV = ("text/csv", "application/csv")
+TIPOS_NDJSON = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+async def _lineas(request: Request):
+    """Itera las líneas del cuerpo a medida que llegan, sin cargarlo completo."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pendiente = ""
+    async for bloque in request.stream():
+        pendiente += decoder.decode(bloque)
+        *lineas, pendiente = pendiente.split("\n")
+        for linea in lineas:
+            yield linea.rstrip("\r")
+    pendiente += decoder.decode(b"", final=True)
+    if pendiente:
+        yield pendiente.rstrip("\r")
+
+
+async def leer_filas(request: Request):
+    """
+    Genera tuplas (numero_fila, datos) según el Content-Type de la petición.
+    Si una fila no se puede interpretar, `datos` es la excepción para que
+    el llamador la reporte sin detener la carga.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+
+    if content_type in TIPOS_CSV:
+        encabezado = None
+        numero = 0
+        async for linea in _lineas(request):
+            if not linea.strip():
+                continue
+            valores = next(csv.reader([linea]))
+            if encabezado is None:
+                encabezado = [c.strip() for c in valores]
+                continue
+            numero += 1
+            if len(valores) != len(encabezado):
+                yield numero, ValueError(f"Se esperaban {len(encabezado)} columnas y llegaron {len(valores)}")
+            else:
+                yield numero, dict(zip(encabezado, valores))
+
+    elif content_type in TIPOS_NDJSON:
+        numero = 0
+        async for linea in _lineas(request):
+            if not linea.strip():
+                continue
+            numero += 1
+            try:
+                yield numero, json.loads(linea)
+            except json.JSONDecodeError as e:
+                yield numero, e
+
+    elif content_type in ("application/json", ""):
+        try:
+            filas = await request.json()
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="JSON inválido")
+        if not isinstance(filas, list):
+            raise HTTPException(status_code=400, detail="Se esperaba un arreglo JSON de notas")
+        for numero, fila in enumerate(filas, start=1):
+            yield numero, fila
+
+    else:
+        raise HTTPException(status_code=415, detail=f"Formato no soportado: {content_type}")
@@ -0,0 +1,72 @@
+"""
+Logging estructurado (una línea JSON por evento) con nivel configurable.
+
+Los handlers de la aplicación solo encolan el registro (QueueHandler); un hilo
+aparte (QueueListener) lo formatea y lo escribe, así la E/S del log no bloquea
+el event loop ni los hilos de base de datos.
+Los campos pasados con `extra={...}` se agregan al JSON.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json | texto
+
+# Atributos estándar de LogRecord que no son campos "extra"
+_ATRIBUTOS_RECORD = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        evento = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensaje": record.getMessage(),
+        }
+        for clave, valor in vars(record).items():
+            if clave not in _ATRIBUTOS_RECORD and not clave.startswith("_"):
+                evento[clave] = valor
+        if record.exc_info:
+            evento["excepcion"] = self.formatException(record.exc_info)
+        return json.dumps(evento, default=str, ensure_ascii=False)
+
+
+def configurar_logging(nivel: str = LOG_LEVEL, formato: str = LOG_FORMAT):
+    """Instala el QueueHandler en el logger raíz y arranca el hilo que escribe a stdout."""
+    global _listener
+    if _listener is not None:
+        return
+
+    salida = logging.StreamHandler(sys.stdout)
+    if formato == "json":
+        salida.setFormatter(JsonFormatter())
+    else:
+        salida.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    cola = queue.SimpleQueue()
+    raiz = logging.getLogger()
+    raiz.handlers = [logging.handlers.QueueHandler(cola)]
+    raiz.setLevel(nivel)
+    # Los logs de uvicorn pasan por el mismo camino
+    for nombre in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        logging.getLogger(nombre).handlers = []
+        logging.getLogger(nombre).propagate = True
+
+    _listener = logging.handlers.QueueListener(cola, salida, respect_handler_level=True)
+    _listener.start()
+
+
+def detener_logging():
+    """Vacía la cola de logs pendientes y detiene el hilo escritor."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,116 @@
+"""
+Métricas de latencia en memoria con exposición en formato de texto de Prometheus.
+
+- http_request_duration_seconds: histograma por método, ruta y código de estado.
+- http_request_db_queries: histograma de sentencias SQL por petición y ruta.
+- db_query_duration_seconds: histograma por etiqueta de sentencia (p. ej. "select notas").
+"""
+import re
+import threading
+from functools import lru_cache
+
+BUCKETS_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_CONSULTAS = (0, 1, 2, 3, 5, 8, 13, 21, 34)
+
+
+class Histograma:
+    def __init__(self, nombre: str, ayuda: str, etiquetas: tuple, buckets: tuple):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}  # valores de etiquetas -> [conteos por bucket..., suma, total]
+
+    def observar(self, valores: tuple, valor: float):
+        with self._lock:
+            serie = self._series.get(valores)
+            if serie is None:
+                serie = self._series[valores] = [0] * (len(self.buckets) + 2)
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[i] += 1
+                    break
+            serie[-2] += valor
+            serie[-1] += 1
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for valores, serie in sorted(series.items()):
+            base = ",".join(f'{e}="{_escapar(v)}"' for e, v in zip(self.etiquetas, valores))
+            sep = "," if base else ""
+            acumulado = 0
+            for limite, conteo in zip(self.buckets, serie):
+                acumulado += conteo
+                lineas.append(f'{self.nombre}_bucket{{{base}{sep}le="{limite}"}} {acumulado}')
+            lineas.append(f'{self.nombre}_bucket{{{base}{sep}le="+Inf"}} {serie[-1]}')
+            lineas.append(f"{self.nombre}_sum{{{base}}} {serie[-2]}")
+            lineas.append(f"{self.nombre}_count{{{base}}} {serie[-1]}")
+        return lineas
+
+    def total(self, filtro=None):
+        """Suma de observaciones y cantidad, opcionalmente filtrando series por etiquetas."""
+        with self._lock:
+            suma = cantidad = 0
+            for valores, serie in self._series.items():
+                if filtro is None or filtro(dict(zip(self.etiquetas, valores))):
+                    suma += serie[-2]
+                    cantidad += serie[-1]
+            return suma, cantidad
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+duracion_peticiones = Histograma(
+    "http_request_duration_seconds", "Latencia de las peticiones HTTP",
+    ("method", "route", "status"), BUCKETS_SEGUNDOS,
+)
+consultas_por_peticion = Histograma(
+    "http_request_db_queries", "Sentencias SQL ejecutadas por petición",
+    ("method", "route"), BUCKETS_CONSULTAS,
+)
+duracion_consultas = Histograma(
+    "db_query_duration_seconds", "Latencia de las sentencias SQL por etiqueta",
+    ("statement",), BUCKETS_SEGUNDOS,
+)
+
+_PATRON_VERBO = re.compile(r"^\s*\(?\s*(\w+)", re.IGNORECASE)
+_PATRON_TABLA = {
+    "select": re.compile(r"\bFROM\s+`?(\w+)", re.IGNORECASE),
+    "delete": re.compile(r"\bFROM\s+`?(\w+)", re.IGNORECASE),
+    "insert": re.compile(r"\bINTO\s+`?(\w+)", re.IGNORECASE),
+    "replace": re.compile(r"\bINTO\s+`?(\w+)", re.IGNORECASE),
+    "update": re.compile(r"^\s*UPDATE\s+`?(\w+)", re.IGNORECASE),
+}
+
+
+@lru_cache(maxsize=1024)
+def etiqueta_sentencia(sql: str) -> str:
+    """'select notas', 'insert auditoria', 'commit'... a partir del texto SQL."""
+    verbo = _PATRON_VERBO.match(sql)
+    if not verbo:
+        return "otra"
+    verbo = verbo.group(1).lower()
+    patron = _PATRON_TABLA.get(verbo)
+    tabla = patron.search(sql) if patron else None
+    return f"{verbo} {tabla.group(1).lower()}" if tabla else verbo
+
+
+def registrar_consulta(sql: str, duracion: float):
+    duracion_consultas.observar((etiqueta_sentencia(sql),), duracion)
+
+
+def exponer(gauges=()):
+    """Texto de Prometheus con los histogramas y los gauges extra [(nombre, ayuda, valor)]."""
+    lineas = []
+    for histograma in (duracion_peticiones, consultas_por_peticion, duracion_consultas):
+        lineas.extend(histograma.exponer())
+    for nombre, ayuda, valor in gauges:
+        lineas.append(f"# HELP {nombre} {ayuda}")
+        lineas.append(f"# TYPE {nombre} gauge")
+        lineas.append(f"{nombre} {valor}")
+    return "\n".join(lineas) + "\n"
@@ -0,0 +1,246 @@
+"""
+Migraciones versionadas del esquema.
+
+Cada migración es (versión, descripción, pasos); un paso es una sentencia SQL o
+una función que recibe el cursor. Las aplicadas se registran en
+`schema_migraciones`. En MySQL el DDL hace commit implícito, así que una
+migración no es atómica: todos los pasos son idempotentes (IF NOT EXISTS,
+índices que se crean solo si faltan) y una migración interrumpida se puede
+volver a correr.
+
+Los índices cubren las consultas de los routers; tests/test_planes_consultas.py
+verifica con EXPLAIN que sigan usándose.
+
+Uso como comando:
+    python -m app.utils.migraciones            # aplica las pendientes
+    python -m app.utils.migraciones estado     # lista aplicadas y pendientes
+"""
+import functools
+import logging
+import sys
+
+from app.database import get_db_connection
+from app.utils.auditoria_retencion import DDL_ARCHIVO, DDL_RESUMEN
+from app.utils.periodos import DDL_EXTREMOS, DDL_PERIODOS
+from app.utils.promedios import DDL_PROMEDIOS, reconstruir_en
+from app.utils.trabajos import DDL_TRABAJOS
+
+logger = logging.getLogger(__name__)
+
+DDL_REGISTRO = """
+    CREATE TABLE IF NOT EXISTS schema_migraciones (
+        version INT PRIMARY KEY,
+        descripcion VARCHAR(200) NOT NULL,
+        aplicada_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+DDL_USUARIOS = """
+    CREATE TABLE IF NOT EXISTS usuarios (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        email VARCHAR(255) NOT NULL UNIQUE,
+        password_hash VARCHAR(255) NOT NULL,
+        rol VARCHAR(20) NOT NULL,
+        nombre VARCHAR(150) NOT NULL
+    )
+"""
+
+DDL_ESTUDIANTES = """
+    CREATE TABLE IF NOT EXISTS estudiantes (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        usuario_id INT NOT NULL,
+        codigo_estudiante VARCHAR(30) NOT NULL,
+        nombre VARCHAR(150) NOT NULL,
+        FOREIGN KEY (usuario_id) REFERENCES usuarios(id) ON DELETE CASCADE
+    )
+"""
+
+DDL_NOTAS = """
+    CREATE TABLE IF NOT EXISTS notas (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        estudiante_id INT NOT NULL,
+        asignatura VARCHAR(100) NOT NULL,
+        calificacion DECIMAL(5, 2) NOT NULL,
+        periodo VARCHAR(20) NOT NULL,
+        creado_por INT NOT NULL,
+        creado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (estudiante_id) REFERENCES estudiantes(id) ON DELETE CASCADE,
+        FOREIGN KEY (creado_por) REFERENCES usuarios(id) ON DELETE CASCADE
+    )
+"""
+
+DDL_AUDITORIA = """
+    CREATE TABLE IF NOT EXISTS auditoria (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        usuario_id INT NOT NULL,
+        accion VARCHAR(255) NOT NULL,
+        ip VARCHAR(45) NULL,
+        fecha DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (usuario_id) REFERENCES usuarios(id) ON DELETE CASCADE
+    )
+"""
+
+# (nombre, columnas) por tabla. InnoDB agrega la clave primaria al final de cada
+# índice secundario, así que (creado_en) ya ordena por (creado_en, id).
+INDICES_USUARIOS = [
+    # listar_estudiantes: WHERE rol = 'estudiante' ORDER BY nombre, sin filesort y cubriendo email
+    ("idx_usuarios_rol_nombre", "rol, nombre, email"),
+]
+
+INDICES_NOTAS = [
+    # get_notas sin filtros: ORDER BY creado_en DESC, id DESC LIMIT n
+    ("idx_notas_creado", "creado_en"),
+    # get_notas por asignatura (y periodo) en orden de creación
+    ("idx_notas_asignatura_periodo_creado", "asignatura, periodo, creado_en"),
+    ("idx_notas_periodo_creado", "periodo, creado_en"),
+    # Estadísticas: lee solo el índice (asignatura, periodo, calificacion)
+    ("idx_notas_cobertura_estadisticas", "asignatura, periodo, calificacion"),
+    # Notas de un estudiante y MIN/MAX de restar_nota sin tocar la tabla (sirve también a la FK)
+    ("idx_notas_estudiante_cobertura", "estudiante_id, asignatura, periodo, calificacion"),
+]
+
+# Respaldo SQL de la búsqueda por prefijo (/usuarios/buscar, /api/estudiantes/buscar)
+INDICES_BUSQUEDA_USUARIOS = [
+    ("idx_usuarios_nombre", "nombre"),
+]
+
+INDICES_BUSQUEDA_ESTUDIANTES = [
+    ("idx_estudiantes_codigo", "codigo_estudiante"),
+]
+
+# Respaldo SQL de /notas/ranking: los estudiantes de un (asignatura, periodo).
+# Sin suma ni conteo: esas columnas cambian con cada nota y el índice no se toca
+INDICES_RANKING = [
+    ("idx_promedios_asignatura_periodo", "asignatura, periodo"),
+]
+
+INDICES_AUDITORIA = [
+    # Orden del listado (keyset) y filtros por usuario e IP
+    ("idx_auditoria_fecha_id", "fecha, id"),
+    ("idx_auditoria_usuario_fecha", "usuario_id, fecha, id"),
+    ("idx_auditoria_ip_fecha", "ip, fecha, id"),
+]
+
+
+def crear_indices(cursor, tabla, indices):
+    """Crea los índices que falten (MySQL no tiene CREATE INDEX IF NOT EXISTS). Devuelve los creados."""
+    cursor.execute("""
+        SELECT DISTINCT index_name FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s
+    """, (tabla,))
+    existentes = {fila[0] for fila in cursor.fetchall()}
+    creados = []
+    for nombre, columnas in indices:
+        if nombre not in existentes:
+            cursor.execute(f"CREATE INDEX {nombre} ON {tabla} ({columnas})")
+            creados.append(nombre)
+    return creados
+
+
+def _indices(tabla, indices):
+    return functools.partial(crear_indices, tabla=tabla, indices=indices)
+
+
+MIGRACIONES = [
+    (1, "Tablas base", [DDL_USUARIOS, DDL_ESTUDIANTES, DDL_NOTAS, DDL_AUDITORIA]),
+    # Sin el relleno, en una base con notas todos los promedios leerían 0
+    (2, "Promedios precalculados por estudiante", [
+        DDL_PROMEDIOS,
+        functools.partial(reconstruir_en, archivados=False),
+    ]),
+    (3, "Índices de cobertura de usuarios y notas", [
+        _indices("usuarios", INDICES_USUARIOS),
+        _indices("notas", INDICES_NOTAS),
+    ]),
+    (4, "Índices, archivo y resúmenes de auditoría", [
+        _indices("auditoria", INDICES_AUDITORIA),
+        DDL_ARCHIVO,
+        DDL_RESUMEN,
+    ]),
+    (5, "Índices de búsqueda por prefijo", [
+        _indices("usuarios", INDICES_BUSQUEDA_USUARIOS),
+        _indices("estudiantes", INDICES_BUSQUEDA_ESTUDIANTES),
+    ]),
+    (6, "Registro de periodos cerrados", [DDL_PERIODOS, DDL_EXTREMOS]),
+    (7, "Trabajos en segundo plano", [DDL_TRABAJOS]),
+    (8, "Índice del respaldo SQL del ranking", [_indices("promedios_estudiante", INDICES_RANKING)]),
+]
+
+
+def _aplicadas(cursor):
+    cursor.execute("SELECT version FROM schema_migraciones")
+    return {fila[0] for fila in cursor.fetchall()}
+
+
+def aplicar(hasta=None):
+    """
+    Aplica en orden las migraciones pendientes (hasta la versión `hasta`, inclusive).
+    Un lock con nombre evita que dos procesos migren a la vez. Devuelve las versiones aplicadas.
+    """
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Error de conexión con la base de datos")
+    cursor = conn.cursor()
+    nuevas = []
+    try:
+        cursor.execute("SELECT GET_LOCK('schema_migraciones', 60)")
+        if cursor.fetchone()[0] != 1:
+            raise RuntimeError("Otro proceso está aplicando migraciones")
+        try:
+            cursor.execute(DDL_REGISTRO)
+            aplicadas = _aplicadas(cursor)
+            for version, descripcion, pasos in MIGRACIONES:
+                if version in aplicadas or (hasta is not None and version > hasta):
+                    continue
+                for paso in pasos:
+                    if callable(paso):
+                        paso(cursor)
+                    else:
+                        cursor.execute(paso)
+                cursor.execute(
+                    "INSERT INTO schema_migraciones (version, descripcion) VALUES (%s, %s)",
+                    (version, descripcion),
+                )
+                conn.commit()
+                logger.info("Migración %s aplicada: %s", version, descripcion)
+                nuevas.append(version)
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK('schema_migraciones')")
+            cursor.fetchall()
+        return nuevas
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def estado():
+    """[(versión, descripción, aplicada)] de todas las migraciones conocidas."""
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Error de conexión con la base de datos")
+    cursor = conn.cursor()
+    try:
+        cursor.execute(DDL_REGISTRO)
+        aplicadas = _aplicadas(cursor)
+    finally:
+        cursor.close()
+        conn.close()
+    return [(version, descripcion, version in aplicadas) for version, descripcion, _ in MIGRACIONES]
+
+
+def main(argv):
+    comando = argv[1] if len(argv) > 1 else "aplicar"
+    if comando == "estado":
+        for version, descripcion, aplicada in estado():
+            print(f"{'✅' if aplicada else '⏳'} {version:>3}  {descripcion}")
+        return 0
+    if comando == "aplicar":
+        nuevas = aplicar()
+        print(f"✅ Migraciones aplicadas: {', '.join(map(str, nuevas)) if nuevas else 'ninguna (esquema al día)'}")
+        return 0
+    print("Uso: python -m app.utils.migraciones [aplicar|estado]")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,32 @@
+import base64
+from datetime import datetime
+
+from fastapi import HTTPException
+
+PAGINA_LIMITE_DEFECTO = 50
+PAGINA_LIMITE_MAXIMO = 500
+
+
+def codificar_cursor(fecha: datetime, fila_id: int) -> str:
+    """Cursor opaco para paginación keyset sobre (fecha, id)."""
+    crudo = f"{fecha.isoformat()}|{fila_id}"
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str):
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        fecha, fila_id = base64.urlsafe_b64decode(cursor + relleno).decode().split("|")
+        return datetime.fromisoformat(fecha), int(fila_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+
+
+def condicion_keyset(columna_fecha: str, columna_id: str, cursor: str):
+    """
+    Condición SQL y parámetros para traer la página siguiente en orden (fecha DESC, id DESC).
+    Se escribe con OR en lugar de comparar tuplas para que MySQL use el índice (fecha, id).
+    """
+    fecha, fila_id = decodificar_cursor(cursor)
+    sql = f"({columna_fecha} < %s OR ({columna_fecha} = %s AND {columna_id} < %s))"
+    return sql, [fecha, fecha, fila_id]
@@ -0,0 +1,613 @@
+"""
+Cierre de periodos: las notas de un periodo cerrado salen de la tabla `notas`
+y pasan a un archivo columnar inmutable que se lee con mmap.
+
+Formato del archivo (PERIODOS_DIR/notas_<periodo>_<id único>.col):
+- Cabecera: b"NOTASCOL", versión y largo (uint32 little-endian) y un JSON con
+  el periodo, la cantidad de filas, el diccionario de asignaturas y la
+  posición de cada columna.
+- Columnas contiguas, alineadas a 64 bytes, ordenadas por (creado_en, id):
+  id, estudiante_id, creado_por (int32), asignatura (uint16, índice en el
+  diccionario), calificacion (int16 en centésimas) y creado_en (int64,
+  segundos desde 1970 sin zona, como los guarda MySQL).
+
+Las columnas se leen con np.frombuffer sobre el mapa, sin copiar: los filtros
+son comparaciones vectorizadas y la paginación keyset es una búsqueda binaria
+sobre creado_en. Los routers mezclan estas filas con las de la tabla, así que
+el listado, las estadísticas y la exportación no cambian al cerrar un periodo.
+
+`periodos_cerrados` registra cada archivo con su sha256. Cada proceso mantiene
+los archivos mapeados y los vuelve a leer cuando cambia la versión del grupo de
+caché "periodos" (al cerrar en este worker o en otro con backend Redis) o cada
+PERIODOS_RECARGA_SEGUNDOS. Con la caché en memoria los listados comparan además
+una firma de periodos_cerrados en cada lectura, porque los cierres de otros
+workers no cambian la versión local. Con varios servidores PERIODOS_DIR debe
+ser un directorio compartido.
+
+El registro de cada proceso es solo un camino rápido para rechazar escrituras.
+La regla "un periodo cerrado no cambia" se verifica en la base, dentro de la
+transacción de cada escritura (periodos_cerrados_en).
+
+Los agregados de `promedios_estudiante` del periodo no cambian al cerrarlo.
+Los mínimos y máximos de las notas archivadas se guardan en `extremos_cerrados`
+para que restar_nota no los pierda al recalcular los niveles "todos los periodos".
+
+Uso como comando:
+    python -m app.utils.periodos cerrar PERIODO   # archiva el periodo y lo saca de `notas`
+    python -m app.utils.periodos listar           # periodos cerrados y tamaño de sus archivos
+    python -m app.utils.periodos verificar        # compara cada archivo con su sha256 registrado
+"""
+import functools
+import hashlib
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import mysql.connector
+import numpy as np
+from mysql.connector import errorcode
+
+from app.database import get_db_connection, get_read_connection
+from app.utils.cache import cache
+
+logger = logging.getLogger(__name__)
+
+PERIODOS_DIR = os.getenv("PERIODOS_DIR", "data/periodos")
+PERIODOS_RECARGA_SEGUNDOS = float(os.getenv("PERIODOS_RECARGA_SEGUNDOS", "30"))
+
+MAGIA = b"NOTASCOL"
+FORMATO_VERSION = 1
+ALINEACION = 64
+EPOCA = datetime(1970, 1, 1)
+FILAS_POR_SENTENCIA = 1000
+
+# (columna, tipo numpy) en el orden en que se escriben
+COLUMNAS = (
+    ("id", "<i4"),
+    ("estudiante_id", "<i4"),
+    ("creado_por", "<i4"),
+    ("asignatura", "<u2"),     # índice en el diccionario de asignaturas
+    ("calificacion", "<i2"),   # centésimas: 4.35 -> 435
+    ("creado_en", "<i8"),      # segundos desde EPOCA
+)
+
+_NOMBRE_PERIODO = re.compile(r"^[0-9A-Za-z_.-]{1,20}$")
+
+DDL_PERIODOS = """
+    CREATE TABLE IF NOT EXISTS periodos_cerrados (
+        periodo VARCHAR(20) PRIMARY KEY,
+        archivo VARCHAR(255) NOT NULL,
+        filas INT NOT NULL,
+        sha256 CHAR(64) NOT NULL,
+        cerrado_por INT NULL,
+        cerrado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+DDL_EXTREMOS = """
+    CREATE TABLE IF NOT EXISTS extremos_cerrados (
+        estudiante_id INT NOT NULL,
+        asignatura VARCHAR(100) NOT NULL DEFAULT '',
+        minimo DECIMAL(5, 2) NOT NULL,
+        maximo DECIMAL(5, 2) NOT NULL,
+        PRIMARY KEY (estudiante_id, asignatura)
+    )
+"""
+
+
+def _alinear(n: int) -> int:
+    return -(-n // ALINEACION) * ALINEACION
+
+
+def _segundos(fecha: datetime) -> int:
+    return int((fecha - EPOCA).total_seconds())
+
+
+class PeriodoInvalidoError(ValueError):
+    """El nombre del periodo no sirve como parte de un nombre de archivo."""
+
+
+def nombre_archivo(periodo: str) -> str:
+    """Nombre nuevo en cada llamada: un cierre nunca pisa el archivo de otro."""
+    if not _NOMBRE_PERIODO.match(periodo or ""):
+        raise PeriodoInvalidoError(f"Periodo inválido: {periodo!r}")
+    return f"notas_{periodo}_{uuid.uuid4().hex[:12]}.col"
+
+
+# ---------------------- Formato columnar ----------------------
+def escribir_archivo(ruta: str, periodo: str, filas) -> str:
+    """
+    Escribe las notas (id, estudiante_id, asignatura, calificacion, creado_por, creado_en),
+    ordenadas por (creado_en, id). Se escribe a un temporal que se renombra al final:
+    nunca queda un archivo a medias con el nombre definitivo. Devuelve el sha256.
+    """
+    ids, estudiantes, asignaturas, calificaciones, creadores, fechas = zip(*filas)
+    diccionario = sorted(set(asignaturas))
+    codigos = {asignatura: i for i, asignatura in enumerate(diccionario)}
+    valores = {
+        "id": ids,
+        "estudiante_id": estudiantes,
+        "creado_por": creadores,
+        "asignatura": [codigos[a] for a in asignaturas],
+        "calificacion": [int(Decimal(str(c)) * 100) for c in calificaciones],
+        "creado_en": [_segundos(f) for f in fechas],
+    }
+    # np.asarray lanza OverflowError si un valor no cabe en el tipo de la columna
+    arreglos = {nombre: np.asarray(valores[nombre], dtype=tipo) for nombre, tipo in COLUMNAS}
+
+    columnas, desplazamiento = {}, 0
+    for nombre, tipo in COLUMNAS:
+        columnas[nombre] = [tipo, desplazamiento]
+        desplazamiento = _alinear(desplazamiento + arreglos[nombre].nbytes)
+    meta = json.dumps({
+        "periodo": periodo,
+        "filas": len(ids),
+        "asignaturas": diccionario,
+        "columnas": columnas,
+    }).encode()
+    base = _alinear(16 + len(meta))
+
+    contenido = bytearray(base + desplazamiento)
+    contenido[:16 + len(meta)] = MAGIA + struct.pack("<II", FORMATO_VERSION, len(meta)) + meta
+    for nombre, (_, inicio) in columnas.items():
+        datos = arreglos[nombre].tobytes()
+        contenido[base + inicio:base + inicio + len(datos)] = datos
+
+    temporal = f"{ruta}.tmp"
+    with open(temporal, "wb") as f:
+        f.write(contenido)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+    return hashlib.sha256(contenido).hexdigest()
+
+
+class ArchivoPeriodo:
+    """Notas de un periodo cerrado, mapeadas en memoria (solo lectura)."""
+
+    def __init__(self, ruta: str):
+        with open(ruta, "rb") as f:
+            self._mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mapa[:8] != MAGIA:
+            raise ValueError(f"{ruta} no es un archivo de notas")
+        version, largo = struct.unpack_from("<II", self._mapa, 8)
+        if version != FORMATO_VERSION:
+            raise ValueError(f"{ruta}: versión de formato {version} no soportada")
+        meta = json.loads(self._mapa[16:16 + largo])
+        base = _alinear(16 + largo)
+
+        self.ruta = ruta
+        self.periodo = meta["periodo"]
+        self.filas = meta["filas"]
+        self.asignaturas = meta["asignaturas"]
+        self.bytes = len(self._mapa)
+        self._codigos = {asignatura: i for i, asignatura in enumerate(self.asignaturas)}
+        self._nombres = np.array(self.asignaturas, dtype=object)
+        # Vistas sin copia sobre el mapa: las páginas se leen del disco (o de la caché del SO) al usarlas
+        vistas = {
+            nombre: np.frombuffer(self._mapa, dtype=tipo, count=self.filas, offset=base + inicio)
+            for nombre, (tipo, inicio) in meta["columnas"].items()
+        }
+        self.id = vistas["id"]
+        self.estudiante_id = vistas["estudiante_id"]
+        self.creado_por = vistas["creado_por"]
+        self.asignatura = vistas["asignatura"]
+        self.calificacion = vistas["calificacion"]
+        self.creado_en = vistas["creado_en"]
+
+    @functools.cached_property
+    def sha256(self) -> str:
+        # Lee el archivo completo: solo al registrarlo o verificarlo
+        return hashlib.sha256(self._mapa).hexdigest()
+
+    def mascara(self, filtros: dict, fin: int = None):
+        """Filas [0, fin) que cumplen los filtros de notas (el periodo lo resuelve archivos_de)."""
+        fin = self.filas if fin is None else fin
+        mascara = np.ones(fin, dtype=bool)
+        if filtros.get("estudiante_id") is not None:
+            mascara &= self.estudiante_id[:fin] == filtros["estudiante_id"]
+        if filtros.get("asignatura"):
+            codigo = self._codigos.get(filtros["asignatura"])
+            if codigo is None:
+                return np.zeros(fin, dtype=bool)
+            mascara &= self.asignatura[:fin] == codigo
+        if filtros.get("calificacion_min") is not None:
+            mascara &= self.calificacion[:fin] >= math.ceil(round(filtros["calificacion_min"] * 100, 6))
+        if filtros.get("calificacion_max") is not None:
+            mascara &= self.calificacion[:fin] <= math.floor(round(filtros["calificacion_max"] * 100, 6))
+        return mascara
+
+    def _posicion(self, fecha: datetime, fila_id: int) -> int:
+        """Cantidad de filas anteriores a (fecha, fila_id) en el orden del archivo."""
+        segundos = _segundos(fecha)
+        inicio = int(np.searchsorted(self.creado_en, segundos, "left"))
+        fin = int(np.searchsorted(self.creado_en, segundos, "right"))
+        return inicio + int(np.searchsorted(self.id[inicio:fin], fila_id, "left"))
+
+    def fila(self, i: int) -> dict:
+        return {
+            "id": int(self.id[i]),
+            "estudiante_id": int(self.estudiante_id[i]),
+            "asignatura": self.asignaturas[self.asignatura[i]],
+            "calificacion": int(self.calificacion[i]) / 100,
+            "periodo": self.periodo,
+            "creado_por": int(self.creado_por[i]),
+            "creado_en": EPOCA + timedelta(seconds=int(self.creado_en[i])),
+        }
+
+    def pagina(self, filtros: dict, despues_de=None, limite: int = 50) -> list:
+        """
+        Hasta `limite` notas en orden (creado_en DESC, id DESC), a partir del cursor
+        `despues_de` = (fecha, id) si se da: el mismo orden que el listado SQL.
+        """
+        fin = self.filas if despues_de is None else self._posicion(*despues_de)
+        indices = np.flatnonzero(self.mascara(filtros, fin))[-limite:][::-1]
+        return [self.fila(int(i)) for i in indices]
+
+    def filas_filtradas(self, filtros: dict):
+        """Todas las notas que cumplen los filtros, en orden de id (como la exportación SQL)."""
+        indices = np.flatnonzero(self.mascara(filtros))
+        for i in indices[np.argsort(self.id[indices], kind="stable")]:
+            yield self.fila(int(i))
+
+    def columnas(self, filtros: dict):
+        """(asignaturas, periodos, calificaciones) para calcular_estadisticas."""
+        indices = np.flatnonzero(self.mascara(filtros))
+        asignaturas = self._nombres[self.asignatura[indices]].tolist()
+        return asignaturas, [self.periodo] * len(indices), self.calificacion[indices] / 100.0
+
+    def notas_de_estudiantes(self, estudiante_ids) -> dict:
+        """{estudiante_id: [(periodo, asignatura, calificacion)]} de varios estudiantes en una pasada."""
+        indices = np.flatnonzero(np.isin(self.estudiante_id, np.asarray(estudiante_ids, dtype=np.int64)))
+        resultado = {}
+        for estudiante_id, asignatura, centesimas in zip(self.estudiante_id[indices].tolist(),
+                                                          self._nombres[self.asignatura[indices]].tolist(),
+                                                          self.calificacion[indices].tolist()):
+            resultado.setdefault(estudiante_id, []).append((self.periodo, asignatura, centesimas / 100))
+        return resultado
+
+    def notas_promedio(self):
+        """(estudiante_id, asignatura, periodo, calificacion) de cada nota, para los agregados."""
+        asignaturas = self._nombres[self.asignatura].tolist()
+        for estudiante_id, asignatura, centesimas in zip(self.estudiante_id.tolist(), asignaturas,
+                                                          self.calificacion.tolist()):
+            yield estudiante_id, asignatura, self.periodo, Decimal(centesimas) / 100
+
+
+# ---------------------- Registro de periodos cerrados ----------------------
+class RegistroPeriodos:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._archivos = {}        # periodo -> ArchivoPeriodo
+        self._cerrados = frozenset()
+        self.faltantes = []        # registrados cuyo archivo no se pudo abrir o no coincide
+        self.version = None
+        self.firma = None          # de periodos_cerrados, solo sin caché compartida
+        self.cargado_en = 0.0
+        self._recargando = False
+
+    def archivos(self, verificar: bool = True) -> dict:
+        """
+        Archivos mapeados por periodo. Si la versión de "periodos" cambió se recarga
+        antes de responder (un listado sin un periodo recién cerrado estaría incompleto);
+        si solo venció PERIODOS_RECARGA_SEGUNDOS, se recarga en segundo plano.
+
+        Con la caché en memoria un cierre hecho en otro worker (o desde el comando)
+        no cambia la versión de este proceso: con `verificar` también se compara
+        la firma de periodos_cerrados, leída del primario en cada llamada.
+        """
+        version = cache.version("periodos")
+        firma = _firma_cerrados() if verificar and not cache.compartida else self.firma
+        if version != self.version or firma != self.firma:
+            with self._lock:
+                if version != self.version or firma != self.firma:
+                    self._cargar(version)
+                    self.firma = firma
+        elif time.monotonic() - self.cargado_en > PERIODOS_RECARGA_SEGUNDOS:
+            self._recargar_en_segundo_plano(version)
+        return self._archivos
+
+    def cerrado(self, periodo: str) -> bool:
+        # Sin verificar: las escrituras repiten la consulta en su transacción (periodos_cerrados_en)
+        self.archivos(verificar=False)
+        return periodo in self._cerrados
+
+    def _cargar(self, version):
+        # Sin caché compartida la firma se leyó del primario: una réplica atrasada la dejaría vigente sin el cierre
+        conn = get_read_connection("periodos") if cache.compartida else get_db_connection()
+        if not conn:
+            raise RuntimeError("Error de conexión con la base de datos")
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT periodo, archivo, sha256 FROM periodos_cerrados")
+            registrados = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+        archivos, faltantes = {}, []
+        for periodo, archivo, sha in registrados:
+            actual = self._archivos.get(periodo)
+            if actual is not None and actual.sha256 == sha:
+                archivos[periodo] = actual
+                continue
+            try:
+                nuevo = ArchivoPeriodo(os.path.join(PERIODOS_DIR, archivo))
+                if nuevo.sha256 != sha:
+                    raise ValueError("el sha256 no coincide con el registrado")
+            except (OSError, ValueError) as e:
+                logger.error("❌ Archivo del periodo cerrado %s no disponible: %s", periodo, e)
+                faltantes.append(periodo)
+                continue
+            archivos[periodo] = nuevo
+        self._archivos = archivos
+        self._cerrados = frozenset(periodo for periodo, _, _ in registrados)
+        self.faltantes = faltantes
+        self.version = version
+        self.cargado_en = time.monotonic()
+
+    def _recargar_en_segundo_plano(self, version):
+        with self._lock:
+            if self._recargando:
+                return
+            self._recargando = True
+
+        def tarea():
+            try:
+                with self._lock:
+                    self._cargar(version)
+            except Exception as e:
+                logger.error("❌ No se pudo recargar el registro de periodos cerrados: %s", e)
+            finally:
+                self._recargando = False
+
+        threading.Thread(target=tarea, name="periodos-recarga", daemon=True).start()
+
+    def stats(self):
+        archivos = self._archivos
+        return {
+            "cerrados": [
+                {"periodo": a.periodo, "filas": a.filas, "bytes": a.bytes, "asignaturas": len(a.asignaturas)}
+                for _, a in sorted(archivos.items())
+            ],
+            "faltantes": list(self.faltantes),
+        }
+
+
+def _firma_cerrados():
+    """Cambia con cada periodo cerrado; las filas de periodos_cerrados no se borran."""
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Error de conexión con la base de datos")
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT COUNT(*), MAX(cerrado_en) FROM periodos_cerrados")
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+registro = RegistroPeriodos()
+
+
+def archivos_de(filtros: dict) -> list:
+    """Archivos que pueden tener notas para estos filtros (uno si se filtra por periodo)."""
+    archivos = registro.archivos()
+    periodo = filtros.get("periodo")
+    if periodo:
+        return [archivos[periodo]] if periodo in archivos else []
+    return [archivos[p] for p in sorted(archivos)]
+
+
+def periodo_cerrado(periodo: str) -> bool:
+    """Camino rápido con el registro de este proceso; la regla la hace cumplir periodos_cerrados_en()."""
+    return registro.cerrado(periodo)
+
+
+def periodos_cerrados_en(cursor, periodos) -> set:
+    """
+    Cuáles de `periodos` están cerrados, leído dentro de la transacción de escritura.
+    Se llama después de tocar `notas` (mismo orden de bloqueos que cerrar_periodo:
+    primero notas, después periodos_cerrados). Si un cierre está en curso, la
+    escritura espera a que termine y lo ve aquí; si no, el cierre espera a que
+    la escritura haga commit y archiva la nota. Así no depende de que el
+    registro de este worker esté al día.
+    """
+    periodos = sorted(set(periodos))
+    marcadores = ", ".join(["%s"] * len(periodos))
+    cursor.execute(
+        f"SELECT periodo FROM periodos_cerrados WHERE periodo IN ({marcadores}) LOCK IN SHARE MODE", periodos
+    )
+    return {fila["periodo"] if isinstance(fila, dict) else fila[0] for fila in cursor.fetchall()}
+
+
+def iniciar_periodos():
+    try:
+        registro.archivos()
+    except Exception as e:
+        # Se reintenta en la primera consulta que necesite el registro
+        logger.error("❌ No se pudo leer el registro de periodos cerrados: %s", e)
+
+
+def get_periodos_stats():
+    registro.archivos()
+    return registro.stats()
+
+
+# ---------------------- Cierre ----------------------
+def _extremos(notas):
+    """{(estudiante_id, asignatura o ''): (mínimo, máximo)} de (estudiante_id, asignatura, calificacion)."""
+    extremos = {}
+    for estudiante_id, asignatura, calificacion in notas:
+        valor = Decimal(str(calificacion))
+        for clave in ((estudiante_id, asignatura), (estudiante_id, "")):
+            minimo, maximo = extremos.get(clave, (valor, valor))
+            extremos[clave] = (min(minimo, valor), max(maximo, valor))
+    return extremos
+
+
+def _guardar_extremos(cursor, extremos: dict):
+    items = list(extremos.items())
+    for i in range(0, len(items), FILAS_POR_SENTENCIA):
+        tanda = items[i:i + FILAS_POR_SENTENCIA]
+        valores = ", ".join(["(%s, %s, %s, %s)"] * len(tanda))
+        cursor.execute(f"""
+            INSERT INTO extremos_cerrados (estudiante_id, asignatura, minimo, maximo)
+            VALUES {valores}
+            ON DUPLICATE KEY UPDATE
+                minimo = LEAST(minimo, VALUES(minimo)),
+                maximo = GREATEST(maximo, VALUES(maximo))
+        """, [campo for clave, extremo in tanda for campo in (*clave, *extremo)])
+
+
+def reconstruir_extremos(cursor):
+    """Recalcula `extremos_cerrados` desde los archivos (lo usa promedios.reconstruir)."""
+    cursor.execute("DELETE FROM extremos_cerrados")
+    for archivo in archivos_de({}):
+        _guardar_extremos(cursor, _extremos((e, a, c) for e, a, _, c in archivo.notas_promedio()))
+
+
+def notas_archivadas():
+    """(estudiante_id, asignatura, periodo, calificacion) de todas las notas archivadas."""
+    for archivo in archivos_de({}):
+        yield from archivo.notas_promedio()
+
+
+def cerrar_periodo(periodo: str, usuario_id: int = None) -> dict:
+    """
+    Archiva las notas de `periodo` y las borra de `notas` en una sola transacción.
+    El SELECT ... FOR UPDATE bloquea las notas del periodo mientras se escribe el
+    archivo; el borrado es por id, así que una nota que entre después no se pierde
+    (sigue en la tabla y los listados la mezclan con el archivo).
+
+    Antes de escribir el archivo se reclama el periodo con el INSERT en
+    periodos_cerrados: la clave primaria deja pasar un solo cierre y el otro
+    falla sin haber escrito nada. El archivo tiene un nombre único y si algo
+    falla solo se borra el que escribió esta llamada.
+    """
+    archivo = nombre_archivo(periodo)
+    os.makedirs(PERIODOS_DIR, exist_ok=True)
+    ruta = os.path.join(PERIODOS_DIR, archivo)
+
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Error de conexión con la base de datos")
+    cursor = conn.cursor()
+    escrito = False
+    try:
+        cursor.execute("SELECT 1 FROM periodos_cerrados WHERE periodo = %s", (periodo,))
+        if cursor.fetchone():
+            raise ValueError(f"El periodo {periodo} ya está cerrado")
+        cursor.execute("""
+            SELECT id, estudiante_id, asignatura, calificacion, creado_por, creado_en
+            FROM notas
+            WHERE periodo = %s
+            ORDER BY creado_en, id
+            FOR UPDATE
+        """, (periodo,))
+        filas = cursor.fetchall()
+        if not filas:
+            raise ValueError(f"El periodo {periodo} no tiene notas")
+
+        # Después de bloquear las notas (el mismo orden que las escrituras) y antes de escribir nada
+        try:
+            cursor.execute(
+                "INSERT INTO periodos_cerrados (periodo, archivo, filas, sha256, cerrado_por) VALUES (%s, %s, %s, '', %s)",
+                (periodo, archivo, len(filas), usuario_id),
+            )
+        except mysql.connector.IntegrityError as err:
+            if err.errno == errorcode.ER_DUP_ENTRY:
+                raise ValueError(f"El periodo {periodo} ya está cerrado")
+            raise
+
+        sha = escribir_archivo(ruta, periodo, filas)
+        escrito = True
+        cursor.execute("UPDATE periodos_cerrados SET sha256 = %s WHERE periodo = %s", (sha, periodo))
+        _guardar_extremos(cursor, _extremos((f[1], f[2], f[3]) for f in filas))
+        ids = [f[0] for f in filas]
+        for i in range(0, len(ids), FILAS_POR_SENTENCIA):
+            tanda = ids[i:i + FILAS_POR_SENTENCIA]
+            cursor.execute(f"DELETE FROM notas WHERE id IN ({', '.join(['%s'] * len(tanda))})", tanda)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        if escrito:
+            os.remove(ruta)
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+    cache.invalidar("periodos")
+    cache.invalidar("notas", periodo=periodo)
+    cache.invalidar("estadisticas", periodo=periodo)
+    logger.info("Periodo %s cerrado", periodo, extra={"filas": len(filas), "archivo": archivo})
+    return {"periodo": periodo, "filas": len(filas), "archivo": archivo, "bytes": os.path.getsize(ruta)}
+
+
+def verificar() -> list:
+    """[(periodo, problema)] de los archivos registrados que faltan o no coinciden."""
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Error de conexión con la base de datos")
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT periodo, archivo, filas, sha256 FROM periodos_cerrados ORDER BY periodo")
+        registrados = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+    problemas = []
+    for periodo, archivo, filas, sha in registrados:
+        try:
+            leido = ArchivoPeriodo(os.path.join(PERIODOS_DIR, archivo))
+        except (OSError, ValueError) as e:
+            problemas.append((periodo, str(e)))
+            continue
+        if leido.sha256 != sha:
+            problemas.append((periodo, "el sha256 no coincide con el registrado"))
+        elif leido.filas != filas:
+            problemas.append((periodo, f"{leido.filas} filas en el archivo, {filas} registradas"))
+    return problemas
+
+
+def main(argv):
+    comando = argv[1] if len(argv) > 1 else ""
+    if comando == "cerrar" and len(argv) > 2:
+        resumen = cerrar_periodo(argv[2])
+        print(f"✅ Periodo {resumen['periodo']} cerrado: {resumen['filas']} notas en "
+              f"{resumen['archivo']} ({resumen['bytes']} bytes)")
+        return 0
+    if comando == "listar":
+        stats = get_periodos_stats()
+        for p in stats["cerrados"]:
+            print(f"🔒 {p['periodo']:<12}{p['filas']:>10} notas {p['bytes']:>12} bytes")
+        for periodo in stats["faltantes"]:
+            print(f"❌ {periodo}: archivo no disponible")
+        return 0
+    if comando == "verificar":
+        problemas = verificar()
+        for periodo, problema in problemas:
+            print(f"❌ {periodo}: {problema}")
+        if problemas:
+            return 1
+        print("✅ Archivos de periodos cerrados íntegros")
+        return 0
+    print("Uso: python -m app.utils.periodos [cerrar PERIODO|listar|verificar]")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,291 @@
+"""
+Agregados de notas por estudiante (suma, conteo, mínimo y máximo).
+
+Cada nota cuenta en cuatro filas de `promedios_estudiante`, una por nivel:
+(estudiante), (estudiante, asignatura), (estudiante, periodo) y
+(estudiante, asignatura, periodo). El valor '' significa "todos".
+Los handlers de notas actualizan estas filas en la misma transacción que la nota.
+Las notas de periodos cerrados (app/utils/periodos.py) siguen contando aquí
+aunque ya no estén en la tabla `notas`.
+
+Uso como comando:
+    python -m app.utils.promedios rebuild   # recalcula todo desde la tabla notas
+    python -m app.utils.promedios verify    # compara contra la tabla notas
+"""
+import sys
+from decimal import Decimal
+
+from app.database import get_db_connection
+from app.utils.periodos import notas_archivadas, reconstruir_extremos
+
+TODOS = ""
+
+DDL_PROMEDIOS = """
+    CREATE TABLE IF NOT EXISTS promedios_estudiante (
+        estudiante_id INT NOT NULL,
+        asignatura VARCHAR(100) NOT NULL DEFAULT '',
+        periodo VARCHAR(20) NOT NULL DEFAULT '',
+        suma DECIMAL(12, 2) NOT NULL DEFAULT 0,
+        conteo INT NOT NULL DEFAULT 0,
+        minimo DECIMAL(5, 2) NULL,
+        maximo DECIMAL(5, 2) NULL,
+        PRIMARY KEY (estudiante_id, asignatura, periodo)
+    )
+"""
+
+UMBRAL_APROBADO = 3
+FILAS_POR_SENTENCIA = 1000
+
+
+def calcular_estado(promedio) -> str:
+    return "activo" if promedio >= UMBRAL_APROBADO else "bajo rendimiento"
+
+
+def _claves(estudiante_id, asignatura, periodo):
+    return [
+        (estudiante_id, TODOS, TODOS),
+        (estudiante_id, asignatura, TODOS),
+        (estudiante_id, TODOS, periodo),
+        (estudiante_id, asignatura, periodo),
+    ]
+
+
+def sumar_nota(cursor, estudiante_id: int, asignatura: str, periodo: str, calificacion):
+    """Agrega una nota nueva a los cuatro niveles con un solo INSERT ... ON DUPLICATE KEY UPDATE."""
+    sumar_notas(cursor, [(estudiante_id, asignatura, periodo, calificacion)])
+
+
+def sumar_notas(cursor, notas):
+    """
+    Agrega varias notas (estudiante_id, asignatura, periodo, calificacion) de una vez.
+    Las notas se combinan en memoria por clave antes de escribir.
+    """
+    items = list(_combinar(notas).items())
+    # Por tandas para no pasar el límite de parámetros por sentencia de MySQL
+    for i in range(0, len(items), FILAS_POR_SENTENCIA):
+        _upsert(cursor, items[i:i + FILAS_POR_SENTENCIA])
+
+
+def _combinar(notas):
+    """{clave: (suma, conteo, mínimo, máximo)} de las notas en los cuatro niveles."""
+    deltas = {}
+    for estudiante_id, asignatura, periodo, calificacion in notas:
+        valor = Decimal(str(calificacion))
+        for clave in _claves(estudiante_id, asignatura, periodo):
+            suma, conteo, minimo, maximo = deltas.get(clave, (Decimal(0), 0, valor, valor))
+            deltas[clave] = (suma + valor, conteo + 1, min(minimo, valor), max(maximo, valor))
+    return deltas
+
+
+def _upsert(cursor, items):
+    valores = ", ".join(["(%s, %s, %s, %s, %s, %s, %s)"] * len(items))
+    params = [campo for clave, delta in items for campo in (*clave, *delta)]
+    cursor.execute(f"""
+        INSERT INTO promedios_estudiante (estudiante_id, asignatura, periodo, suma, conteo, minimo, maximo)
+        VALUES {valores}
+        ON DUPLICATE KEY UPDATE
+            suma = suma + VALUES(suma),
+            conteo = conteo + VALUES(conteo),
+            minimo = LEAST(COALESCE(minimo, VALUES(minimo)), VALUES(minimo)),
+            maximo = GREATEST(COALESCE(maximo, VALUES(maximo)), VALUES(maximo))
+    """, params)
+
+
+def restar_nota(cursor, estudiante_id: int, asignatura: str, periodo: str, calificacion):
+    """
+    Quita una nota de los cuatro niveles. Debe llamarse después de borrar o modificar
+    la fila en `notas`: si la nota era el mínimo o el máximo del grupo, ese valor se
+    recalcula con una subconsulta indexada por estudiante. En los niveles de todos
+    los periodos entran también los extremos de los periodos cerrados; 999 y -1
+    (fuera del rango de notas) hacen de "sin valor" para LEAST y GREATEST.
+    """
+    cursor.execute("""
+        UPDATE promedios_estudiante p
+        SET p.suma = p.suma - %s,
+            p.conteo = p.conteo - 1,
+            p.minimo = IF(p.minimo = %s, NULLIF(LEAST(
+                COALESCE((
+                    SELECT MIN(n.calificacion) FROM notas n
+                    WHERE n.estudiante_id = p.estudiante_id
+                      AND (p.asignatura = '' OR n.asignatura = p.asignatura)
+                      AND (p.periodo = '' OR n.periodo = p.periodo)
+                ), 999),
+                COALESCE((
+                    SELECT c.minimo FROM extremos_cerrados c
+                    WHERE p.periodo = '' AND c.estudiante_id = p.estudiante_id AND c.asignatura = p.asignatura
+                ), 999)
+            ), 999), p.minimo),
+            p.maximo = IF(p.maximo = %s, NULLIF(GREATEST(
+                COALESCE((
+                    SELECT MAX(n.calificacion) FROM notas n
+                    WHERE n.estudiante_id = p.estudiante_id
+                      AND (p.asignatura = '' OR n.asignatura = p.asignatura)
+                      AND (p.periodo = '' OR n.periodo = p.periodo)
+                ), -1),
+                COALESCE((
+                    SELECT c.maximo FROM extremos_cerrados c
+                    WHERE p.periodo = '' AND c.estudiante_id = p.estudiante_id AND c.asignatura = p.asignatura
+                ), -1)
+            ), -1), p.maximo)
+        WHERE p.estudiante_id = %s
+          AND p.asignatura IN ('', %s)
+          AND p.periodo IN ('', %s)
+    """, (calificacion, calificacion, calificacion, estudiante_id, asignatura, periodo))
+
+
+def obtener_promedios(cursor, estudiante_id: int, asignatura: str = None, periodo: str = None):
+    """Lee los agregados de un estudiante; sin filtros devuelve el desglose completo."""
+    condiciones = ["estudiante_id = %s"]
+    params = [estudiante_id]
+    if asignatura is not None:
+        condiciones.append("asignatura = %s")
+        params.append(asignatura)
+    if periodo is not None:
+        condiciones.append("periodo = %s")
+        params.append(periodo)
+    cursor.execute(f"""
+        SELECT asignatura, periodo, suma, conteo, minimo, maximo
+        FROM promedios_estudiante
+        WHERE {' AND '.join(condiciones)}
+        ORDER BY asignatura, periodo
+    """, params)
+    resultado = []
+    for asig, per, suma, conteo, minimo, maximo in cursor.fetchall():
+        promedio = round(float(suma) / conteo, 2) if conteo else 0.0
+        resultado.append({
+            "asignatura": asig or None,
+            "periodo": per or None,
+            "suma": float(suma),
+            "conteo": conteo,
+            "minimo": float(minimo) if minimo is not None else None,
+            "maximo": float(maximo) if maximo is not None else None,
+            "promedio": promedio,
+            "estado": calcular_estado(promedio),
+        })
+    return resultado
+
+
+# ---------------------- Reconstrucción y verificación ----------------------
+_SELECT_NIVELES = """
+    SELECT estudiante_id, '' AS asignatura, '' AS periodo,
+           SUM(calificacion), COUNT(*), MIN(calificacion), MAX(calificacion)
+    FROM notas GROUP BY estudiante_id
+    UNION ALL
+    SELECT estudiante_id, asignatura, '',
+           SUM(calificacion), COUNT(*), MIN(calificacion), MAX(calificacion)
+    FROM notas GROUP BY estudiante_id, asignatura
+    UNION ALL
+    SELECT estudiante_id, '', periodo,
+           SUM(calificacion), COUNT(*), MIN(calificacion), MAX(calificacion)
+    FROM notas GROUP BY estudiante_id, periodo
+    UNION ALL
+    SELECT estudiante_id, asignatura, periodo,
+           SUM(calificacion), COUNT(*), MIN(calificacion), MAX(calificacion)
+    FROM notas GROUP BY estudiante_id, asignatura, periodo
+"""
+
+
+def reconstruir():
+    """
+    Recalcula la tabla de agregados completa desde `notas` y los archivos de
+    periodos cerrados, en una sola transacción (también `extremos_cerrados`).
+    """
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Error de conexión con la base de datos")
+    cursor = conn.cursor()
+    try:
+        filas = reconstruir_en(cursor)
+        conn.commit()
+        return filas
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def reconstruir_en(cursor, archivados=True) -> int:
+    """
+    El cuerpo de reconstruir() sobre un cursor dado, sin commit. La migración que
+    crea la tabla lo usa con archivados=False: todavía no existen las tablas de
+    periodos cerrados (llegan en una migración posterior), así que no hay archivos.
+    """
+    cursor.execute(DDL_PROMEDIOS)
+    cursor.execute("DELETE FROM promedios_estudiante")
+    cursor.execute(f"""
+        INSERT INTO promedios_estudiante (estudiante_id, asignatura, periodo, suma, conteo, minimo, maximo)
+        {_SELECT_NIVELES}
+    """)
+    if archivados:
+        sumar_notas(cursor, notas_archivadas())
+        reconstruir_extremos(cursor)
+    cursor.execute("SELECT COUNT(*) FROM promedios_estudiante")
+    return cursor.fetchone()[0]
+
+
+def verificar():
+    """
+    Compara los agregados guardados con los calculados desde `notas` y los periodos cerrados.
+    Devuelve la lista de diferencias (vacía si todo cuadra).
+    Las filas guardadas con conteo 0 equivalen a no tener fila.
+    """
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Error de conexión con la base de datos")
+    cursor = conn.cursor()
+    try:
+        cursor.execute(_SELECT_NIVELES)
+        esperado = {tuple(f[:3]): tuple(f[3:]) for f in cursor.fetchall()}
+        cursor.execute("""
+            SELECT estudiante_id, asignatura, periodo, suma, conteo, minimo, maximo
+            FROM promedios_estudiante WHERE conteo > 0
+        """)
+        guardado = {tuple(f[:3]): _normalizar(f[3:]) for f in cursor.fetchall()}
+    finally:
+        cursor.close()
+        conn.close()
+
+    for clave, (suma, conteo, minimo, maximo) in _combinar(notas_archivadas()).items():
+        if clave in esperado:
+            s, c, mi, ma = esperado[clave]
+            suma, conteo = suma + Decimal(str(s)), conteo + c
+            minimo, maximo = min(minimo, Decimal(str(mi))), max(maximo, Decimal(str(ma)))
+        esperado[clave] = (suma, conteo, minimo, maximo)
+    esperado = {clave: _normalizar(valores) for clave, valores in esperado.items()}
+
+    diferencias = []
+    for clave in sorted(set(esperado) | set(guardado), key=str):
+        if esperado.get(clave) != guardado.get(clave):
+            diferencias.append({"clave": clave, "esperado": esperado.get(clave), "guardado": guardado.get(clave)})
+    return diferencias
+
+
+def _normalizar(valores):
+    suma, conteo, minimo, maximo = valores
+    return (round(Decimal(str(suma)), 2), int(conteo),
+            round(Decimal(str(minimo)), 2), round(Decimal(str(maximo)), 2))
+
+
+def main(argv):
+    comando = argv[1] if len(argv) > 1 else ""
+    if comando == "rebuild":
+        filas = reconstruir()
+        print(f"✅ Agregados reconstruidos: {filas} filas")
+        return 0
+    if comando == "verify":
+        diferencias = verificar()
+        for d in diferencias[:50]:
+            print(f"❌ {d['clave']}: esperado={d['esperado']} guardado={d['guardado']}")
+        if diferencias:
+            print(f"❌ {len(diferencias)} agregados no coinciden con la tabla notas")
+            return 1
+        print("✅ Agregados consistentes con la tabla notas")
+        return 0
+    print("Uso: python -m app.utils.promedios [rebuild|verify]")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,424 @@
+"""
+Ranking de estudiantes por asignatura y periodo, en memoria.
+
+Cada estudiante entra al ranking de un (asignatura, periodo) con su promedio en
+ese grupo, redondeado a centésimas (0..500, mitades hacia arriba). Cada grupo
+guarda un árbol de Fenwick con cuántos estudiantes tienen cada promedio:
+- posición = 1 + estudiantes con promedio mayor (los empates comparten posición: 1, 2, 2, 4),
+- percentil = porcentaje de estudiantes con promedio menor o igual,
+ambos son sumas de prefijos en O(log 501). Los N mejores se recorren saltando de
+un promedio ocupado al siguiente con búsquedas en el mismo árbol.
+
+El índice se construye al iniciar (en un hilo) desde `promedios_estudiante`,
+que incluye los periodos cerrados, y los handlers de notas le aplican cada
+cambio después del commit (registrar_cambios). Como los índices de búsqueda,
+guarda la versión del grupo de caché "ranking": si otro worker la cambió, el
+ranking se calcula desde SQL para ese grupo y el índice se reconstruye en
+segundo plano. Con la caché en memoria los cambios de otros workers no mueven la
+versión: pasados RANKING_RECARGA_SEGUNDOS desde que se construyó, el índice
+también se reconstruye en segundo plano.
+
+Uso como comando:
+    python -m app.utils.ranking verificar   # compara con RANK() sobre `notas` y los periodos cerrados
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from app.database import get_db_connection, get_read_connection
+from app.utils.cache import cache
+from app.utils.periodos import notas_archivadas
+
+logger = logging.getLogger(__name__)
+
+RANKING_LIMITE_DEFECTO = 10
+RANKING_LIMITE_MAXIMO = 100
+RANKING_INDICE = os.getenv("RANKING_INDICE", "1") == "1"  # 0 = siempre SQL
+RANKING_RECARGA_SEGUNDOS = float(os.getenv("RANKING_RECARGA_SEGUNDOS", "60"))  # edad máxima sin caché compartida
+
+ESCALA = 500  # calificación máxima en centésimas
+
+# Promedio en centésimas redondeado como centesimas(): (2 * suma + conteo) DIV (2 * conteo)
+_PROMEDIO_SQL = "(2 * {suma} + {conteo}) DIV (2 * {conteo})"
+
+
+def a_centesimas(calificacion) -> int:
+    return int(Decimal(str(calificacion)) * 100)
+
+
+def centesimas(suma: int, conteo: int) -> int:
+    """Promedio en centésimas con enteros (sin errores de coma flotante), mitades hacia arriba."""
+    return (2 * suma + conteo) // (2 * conteo)
+
+
+class ArbolFenwick:
+    """Conteos en las posiciones 0..tamano-1 con sumas de prefijos y búsqueda por acumulado en O(log n)."""
+
+    def __init__(self, tamano: int):
+        self.tamano = tamano
+        self.total = 0
+        self._arbol = [0] * (tamano + 1)
+        self._paso = 1 << (tamano.bit_length() - 1)
+
+    def sumar(self, posicion: int, delta: int):
+        self.total += delta
+        i = posicion + 1
+        while i <= self.tamano:
+            self._arbol[i] += delta
+            i += i & -i
+
+    def prefijo(self, posicion: int) -> int:
+        """Suma de las posiciones 0..posicion."""
+        i, suma = posicion + 1, 0
+        while i > 0:
+            suma += self._arbol[i]
+            i -= i & -i
+        return suma
+
+    def buscar(self, k: int) -> int:
+        """Menor posición cuyo prefijo llega a k (1 <= k <= total)."""
+        posicion, paso = 0, self._paso
+        while paso:
+            siguiente = posicion + paso
+            if siguiente <= self.tamano and self._arbol[siguiente] < k:
+                posicion = siguiente
+                k -= self._arbol[siguiente]
+            paso >>= 1
+        return posicion
+
+
+class RankingGrupo:
+    """Ranking de un (asignatura, periodo)."""
+
+    def __init__(self):
+        self.arbol = ArbolFenwick(ESCALA + 1)
+        self._acumulado = {}                 # estudiante_id -> (suma en centésimas, conteo)
+        self._promedio = {}                  # estudiante_id -> promedio en centésimas
+        self._cubetas = defaultdict(set)     # promedio -> estudiantes
+
+    def __len__(self):
+        return self.arbol.total
+
+    def cambiar(self, estudiante_id: int, suma: int, conteo: int):
+        """Agrega (o quita, con valores negativos) suma en centésimas y notas a un estudiante."""
+        anterior = self._acumulado.pop(estudiante_id, (0, 0))
+        promedio = self._promedio.pop(estudiante_id, None)
+        if promedio is not None:
+            self.arbol.sumar(promedio, -1)
+            self._cubetas[promedio].discard(estudiante_id)
+            if not self._cubetas[promedio]:
+                del self._cubetas[promedio]
+        suma, conteo = anterior[0] + suma, anterior[1] + conteo
+        if conteo <= 0:
+            return
+        promedio = min(max(centesimas(suma, conteo), 0), ESCALA)
+        self._acumulado[estudiante_id] = (suma, conteo)
+        self._promedio[estudiante_id] = promedio
+        self._cubetas[promedio].add(estudiante_id)
+        self.arbol.sumar(promedio, 1)
+
+    def _fila(self, estudiante_id, promedio, posicion, hasta):
+        return {
+            "posicion": posicion,
+            "estudiante_id": estudiante_id,
+            "promedio": promedio / 100,
+            "notas": self._acumulado[estudiante_id][1],
+            "percentil": round(100 * hasta / self.arbol.total, 1),
+        }
+
+    def posicion(self, estudiante_id: int):
+        """Posición y percentil del estudiante, o None si no tiene notas en el grupo."""
+        promedio = self._promedio.get(estudiante_id)
+        if promedio is None:
+            return None
+        hasta = self.arbol.prefijo(promedio)
+        return self._fila(estudiante_id, promedio, self.arbol.total - hasta + 1, hasta)
+
+    def mejores(self, n: int) -> list:
+        """Los n primeros; dentro de un empate, por estudiante_id."""
+        resultado = []
+        restante = self.arbol.total  # estudiantes con promedio <= el siguiente por visitar
+        while restante > 0 and len(resultado) < n:
+            promedio = self.arbol.buscar(restante)
+            empatados = self._cubetas[promedio]
+            posicion = self.arbol.total - restante + 1
+            for estudiante_id in sorted(empatados)[:n - len(resultado)]:
+                resultado.append(self._fila(estudiante_id, promedio, posicion, restante))
+            restante -= len(empatados)
+        return resultado
+
+    def promedios(self) -> dict:
+        return dict(self._promedio)
+
+
+def consultar_grupo(grupo: RankingGrupo, estudiante_id=None, limite=RANKING_LIMITE_DEFECTO) -> dict:
+    return {
+        "total": len(grupo),
+        "mejores": grupo.mejores(limite),
+        "estudiante": grupo.posicion(estudiante_id) if estudiante_id is not None else None,
+    }
+
+
+class IndiceRanking:
+    grupo = "ranking"   # grupo de caché cuya versión indica si el índice está al día
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._grupos = {}   # (asignatura, periodo) -> RankingGrupo
+        self.version = None
+        self.lista = False
+        self.construido_en = None
+        self._reconstruyendo = False
+
+    def construir(self, filas, version=None):
+        """filas: (estudiante_id, asignatura, periodo, suma, conteo) del nivel (asignatura, periodo)."""
+        grupos = defaultdict(RankingGrupo)
+        for estudiante_id, asignatura, periodo, suma, conteo in filas:
+            grupos[(asignatura, periodo)].cambiar(estudiante_id, a_centesimas(suma), conteo)
+        with self._lock:
+            self._grupos = dict(grupos)
+            self.version = version
+            self.lista = True
+            self.construido_en = time.time()
+
+    def aplicar(self, cambios, versiones=None):
+        """cambios: (estudiante_id, asignatura, periodo, suma en centésimas, conteo) a sumar."""
+        with self._lock:
+            for estudiante_id, asignatura, periodo, suma, conteo in cambios:
+                grupo = self._grupos.get((asignatura, periodo))
+                if grupo is None:
+                    grupo = self._grupos[(asignatura, periodo)] = RankingGrupo()
+                grupo.cambiar(estudiante_id, suma, conteo)
+                if not len(grupo):
+                    del self._grupos[(asignatura, periodo)]
+            # Igual que en los índices de búsqueda: solo se avanza si el índice estaba en `antes`
+            if versiones is not None and self.version == versiones[0]:
+                self.version = versiones[1]
+
+    def vigente(self, version) -> bool:
+        return self.lista and self.version == version
+
+    def consultar(self, asignatura, periodo, estudiante_id=None, limite=RANKING_LIMITE_DEFECTO) -> dict:
+        with self._lock:
+            return consultar_grupo(self._grupos.get((asignatura, periodo), RankingGrupo()), estudiante_id, limite)
+
+    def promedios(self) -> dict:
+        """{(asignatura, periodo): {estudiante_id: promedio en centésimas}}"""
+        with self._lock:
+            return {clave: grupo.promedios() for clave, grupo in self._grupos.items()}
+
+    def reconstruir_en_segundo_plano(self, cargar):
+        with self._lock:
+            if self._reconstruyendo:
+                return
+            self._reconstruyendo = True
+
+        def tarea():
+            try:
+                version = cache.version(self.grupo)  # antes de leer: un cambio durante la carga deja el índice no vigente
+                self.construir(cargar(), version)
+                logger.info("Índice de ranking construido", extra={"grupos": len(self._grupos)})
+            except Exception as e:
+                logger.error("❌ No se pudo construir el índice de ranking: %s", e)
+            finally:
+                with self._lock:
+                    self._reconstruyendo = False
+
+        threading.Thread(target=tarea, name="indice-ranking", daemon=True).start()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "lista": self.lista,
+                "grupos": len(self._grupos),
+                "estudiantes": sum(len(grupo) for grupo in self._grupos.values()),
+                "construido_en": self.construido_en,
+            }
+
+
+indice_ranking = IndiceRanking()
+
+
+# ---------------------- Carga y cambios ----------------------
+_SELECT_PROMEDIOS = """
+    SELECT p.estudiante_id, p.asignatura, p.periodo, p.suma, p.conteo
+    FROM promedios_estudiante p
+    JOIN estudiantes e ON e.id = p.estudiante_id
+    WHERE p.asignatura <> '' AND p.periodo <> '' AND p.conteo > 0
+"""
+
+
+def cargar_promedios():
+    # Del primario: una réplica atrasada dejaría un índice viejo marcado como vigente
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Error de conexión con la base de datos")
+    cursor = conn.cursor()
+    try:
+        cursor.execute(_SELECT_PROMEDIOS)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def registrar_cambios(cambios):
+    """
+    Aplica al índice notas agregadas o quitadas, después del commit:
+    cambios = [(estudiante_id, asignatura, periodo, calificacion, +1 | -1)].
+    """
+    antes = cache.version(indice_ranking.grupo)
+    cache.invalidar(indice_ranking.grupo)
+    if RANKING_INDICE:
+        indice_ranking.aplicar(
+            [(e, a, p, signo * a_centesimas(c), signo) for e, a, p, c, signo in cambios],
+            (antes, cache.version(indice_ranking.grupo)),
+        )
+
+
+def descartar_ranking():
+    """Cambios que no pasan por registrar_cambios (p. ej. borrar un estudiante): el índice se reconstruye."""
+    cache.invalidar(indice_ranking.grupo)
+
+
+def _ranking_sql(asignatura: str, periodo: str) -> RankingGrupo:
+    conn = get_read_connection(indice_ranking.grupo)
+    if not conn:
+        raise RuntimeError("Error de conexión con la base de datos")
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT p.estudiante_id, p.suma, p.conteo
+            FROM promedios_estudiante p
+            JOIN estudiantes e ON e.id = p.estudiante_id
+            WHERE p.asignatura = %s AND p.periodo = %s AND p.conteo > 0
+        """, (asignatura, periodo))
+        filas = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+    grupo = RankingGrupo()
+    for estudiante_id, suma, conteo in filas:
+        grupo.cambiar(estudiante_id, a_centesimas(suma), conteo)
+    return grupo
+
+
+def consultar_ranking(asignatura: str, periodo: str, estudiante_id: int = None,
+                      limite: int = RANKING_LIMITE_DEFECTO) -> dict:
+    """Total, los `limite` mejores y (opcional) la posición de un estudiante en el grupo."""
+    if RANKING_INDICE:
+        if indice_ranking.vigente(cache.version(indice_ranking.grupo)):
+            if not cache.compartida and time.time() - indice_ranking.construido_en > RANKING_RECARGA_SEGUNDOS:
+                indice_ranking.reconstruir_en_segundo_plano(cargar_promedios)
+            return indice_ranking.consultar(asignatura, periodo, estudiante_id, limite)
+        indice_ranking.reconstruir_en_segundo_plano(cargar_promedios)
+    return consultar_grupo(_ranking_sql(asignatura, periodo), estudiante_id, limite)
+
+
+def iniciar_ranking():
+    if RANKING_INDICE:
+        indice_ranking.reconstruir_en_segundo_plano(cargar_promedios)
+
+
+def get_ranking_stats():
+    return indice_ranking.stats()
+
+
+# ---------------------- Verificación ----------------------
+def ranking_sql() -> dict:
+    """
+    {(asignatura, periodo): {estudiante_id: (promedio en centésimas, posición)}} calculado
+    con RANK() sobre `notas`. Los grupos con notas archivadas se combinan y ordenan aquí.
+    """
+    promedio = _PROMEDIO_SQL.format(suma="SUM(n.calificacion * 100)", conteo="COUNT(*)")
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Error de conexión con la base de datos")
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT n.asignatura, n.periodo, n.estudiante_id,
+                   SUM(n.calificacion * 100), COUNT(*), {promedio},
+                   RANK() OVER (PARTITION BY n.asignatura, n.periodo ORDER BY {promedio} DESC)
+            FROM notas n
+            GROUP BY n.asignatura, n.periodo, n.estudiante_id
+        """)
+        filas = cursor.fetchall()
+        cursor.execute("SELECT id FROM estudiantes")
+        existentes = {fila[0] for fila in cursor.fetchall()}
+    finally:
+        cursor.close()
+        conn.close()
+
+    esperado = defaultdict(dict)
+    acumulado = defaultdict(dict)   # (asignatura, periodo) -> {estudiante_id: (suma, conteo)}
+    for asignatura, periodo, estudiante_id, suma, conteo, promedio_sql, posicion in filas:
+        esperado[(asignatura, periodo)][estudiante_id] = (int(promedio_sql), posicion)
+        acumulado[(asignatura, periodo)][estudiante_id] = (int(suma), conteo)
+
+    archivados = set()
+    for estudiante_id, asignatura, periodo, calificacion in notas_archivadas():
+        if estudiante_id not in existentes:
+            continue
+        suma, conteo = acumulado[(asignatura, periodo)].get(estudiante_id, (0, 0))
+        acumulado[(asignatura, periodo)][estudiante_id] = (suma + a_centesimas(calificacion), conteo + 1)
+        archivados.add((asignatura, periodo))
+    for clave in archivados:
+        promedios = {estudiante_id: centesimas(suma, conteo) for estudiante_id, (suma, conteo) in acumulado[clave].items()}
+        orden = sorted(promedios.values(), reverse=True)
+        # Posición de competición, como RANK(): 1 + cuántos tienen un promedio mayor
+        primera = {}
+        for i, valor in enumerate(orden):
+            primera.setdefault(valor, i + 1)
+        esperado[clave] = {estudiante_id: (valor, primera[valor]) for estudiante_id, valor in promedios.items()}
+    return dict(esperado)
+
+
+def verificar(indice: IndiceRanking = None) -> list:
+    """
+    Compara el índice (uno recién construido desde `promedios_estudiante` si no se
+    pasa otro) con el ranking calculado en SQL. Devuelve las diferencias.
+    """
+    if indice is None:
+        indice = IndiceRanking()
+        indice.construir(cargar_promedios())
+    esperado = ranking_sql()
+    obtenido = {}
+    with indice._lock:
+        for clave, grupo in indice._grupos.items():
+            obtenido[clave] = {estudiante_id: (fila["promedio"], fila["posicion"])
+                               for estudiante_id in grupo.promedios()
+                               for fila in [grupo.posicion(estudiante_id)]}
+
+    diferencias = []
+    for clave in sorted(set(esperado) | set(obtenido)):
+        sql = {e: (p / 100, r) for e, (p, r) in esperado.get(clave, {}).items()}
+        memoria = obtenido.get(clave, {})
+        for estudiante_id in sorted(set(sql) | set(memoria)):
+            if sql.get(estudiante_id) != memoria.get(estudiante_id):
+                diferencias.append({"grupo": clave, "estudiante_id": estudiante_id,
+                                    "esperado": sql.get(estudiante_id), "indice": memoria.get(estudiante_id)})
+    return diferencias
+
+
+def main(argv):
+    comando = argv[1] if len(argv) > 1 else ""
+    if comando == "verificar":
+        diferencias = verificar()
+        for d in diferencias[:50]:
+            print(f"❌ {d['grupo']} estudiante {d['estudiante_id']}: esperado={d['esperado']} índice={d['indice']}")
+        if diferencias:
+            print(f"❌ {len(diferencias)} posiciones no coinciden con el ranking calculado en SQL")
+            return 1
+        print("✅ Ranking consistente con la tabla notas y los periodos cerrados")
+        return 0
+    print("Uso: python -m app.utils.ranking verificar")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,62 @@
+"""
+Serialización rápida de listados grandes.
+
+Los handlers de listados devuelven filas que vienen de nuestras propias consultas,
+así que volver a validarlas con el response_model (list[NotaResponse], ...) solo
+gasta CPU. `respuesta_lista` proyecta cada fila a los campos del modelo, sin
+validarla, y la serializa con orjson (o con json de la librería estándar si
+orjson no está instalado). El response_model sigue declarado en la ruta para la
+documentación OpenAPI.
+
+JSON_RAPIDO=0 desactiva el camino rápido y vuelve a la validación de FastAPI.
+"""
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+
+from fastapi import Response
+
+try:
+    import orjson  # dependencia opcional
+except ImportError:
+    orjson = None
+
+JSON_RAPIDO = os.getenv("JSON_RAPIDO", "1") == "1"
+
+
+def _por_defecto(valor):
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+
+def serializar(datos) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(datos, default=_por_defecto)
+    return json.dumps(datos, default=_por_defecto, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class RespuestaJSON(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return serializar(content)
+
+
+def respuesta_lista(filas, modelo=None, headers=None):
+    """
+    Devuelve una RespuestaJSON con las filas (dicts) recortadas a los campos de
+    `modelo` y los `headers` dados (normalmente response.headers del Response
+    inyectado en el handler, que FastAPI no aplica a una respuesta devuelta).
+    Si el camino rápido está desactivado, devuelve las filas tal cual para que
+    FastAPI las valide con el response_model y aplique él mismo esos headers.
+    """
+    if not JSON_RAPIDO:
+        return filas
+    if modelo is not None:
+        campos = tuple(modelo.model_fields)
+        filas = [{campo: fila[campo] for campo in campos} for fila in filas]
+    return RespuestaJSON(filas, headers=headers)
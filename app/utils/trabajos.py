@@ -0,0 +1,585 @@
+"""
+Trabajos en segundo plano: boletines del periodo o historiales académicos de
+todos los estudiantes con notas en un periodo, empaquetados en un ZIP.
+
+- POST /trabajos/ registra el trabajo en la tabla `trabajos` (pendiente) y lo
+  encola. La cola es acotada (TRABAJOS_MAX_PENDIENTES; llena = 503) y la
+  atienden TRABAJOS_CONCURRENTES hilos coordinadores por worker de la API.
+- El coordinador no genera nada: manda la cohorte a un pool de procesos propio
+  (TRABAJOS_PROCESOS, con prioridad baja vía nice) en lotes de
+  TRABAJOS_LOTE_ESTUDIANTES. Cada proceso abre su propia conexión, a una réplica
+  si hay, y lee las notas del lote con un cursor sin buffer ordenado por
+  estudiante: escribe el archivo de cada uno en cuanto termina su grupo, sin
+  cargar el lote entero. Las notas de periodos cerrados salen de los archivos
+  mapeados (app/utils/periodos.py). Los procesos no usan el pool de conexiones
+  ni el executor de los routers; el coordinador sí toma una conexión del pool
+  para cada actualización corta de la tabla `trabajos` (estado, avance por lote).
+- Cada trabajo tiene como máximo TRABAJOS_PROCESOS lotes en vuelo. Al terminar
+  cada lote se guarda el avance (hechos/total) y se revisa la marca de
+  cancelación: cancelar deja de mandar lotes, espera a los que están corriendo
+  y borra lo generado. Si la cancelación llega mientras se arma el ZIP, el
+  trabajo no se marca terminado: se borra el ZIP y queda cancelado.
+- El ZIP queda en TRABAJOS_DIR (compartido si hay varios servidores) y se borra
+  pasadas TRABAJOS_RETENCION_HORAS.
+
+El estado vive en la tabla, así que cualquier worker responde el estado, la
+descarga y la cancelación. Un trabajo cuyo proceso murió (reinicio) se marca
+como fallido al arrancar el siguiente proceso en el mismo servidor.
+"""
+import csv
+import logging
+import multiprocessing
+import os
+import queue
+import re
+import shutil
+import socket
+import threading
+import uuid
+import zipfile
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import groupby
+from operator import itemgetter
+
+from app.database import (
+    DB_REPLICA_HOSTS, _crear_conexion_mysql, _crear_conexion_replica, _parsear_replicas, get_db_connection,
+)
+from app.utils.periodos import ArchivoPeriodo, archivos_de
+from app.utils.promedios import calcular_estado
+import mysql.connector
+
+logger = logging.getLogger(__name__)
+
+TRABAJOS_DIR = os.getenv("TRABAJOS_DIR", "data/trabajos")
+TRABAJOS_PROCESOS = int(os.getenv("TRABAJOS_PROCESOS", "2"))
+TRABAJOS_CONCURRENTES = int(os.getenv("TRABAJOS_CONCURRENTES", "1"))        # trabajos a la vez por worker
+TRABAJOS_MAX_PENDIENTES = int(os.getenv("TRABAJOS_MAX_PENDIENTES", "20"))
+TRABAJOS_LOTE_ESTUDIANTES = int(os.getenv("TRABAJOS_LOTE_ESTUDIANTES", "200"))
+TRABAJOS_RETENCION_HORAS = int(os.getenv("TRABAJOS_RETENCION_HORAS", "24"))
+TRABAJOS_NICE = int(os.getenv("TRABAJOS_NICE", "10"))                      # 0 = misma prioridad que la API
+
+TIPOS = ("boletines", "historiales")
+
+_FIN = object()
+_NOMBRE_SEGURO = re.compile(r"[^\w.-]+")
+
+DDL_TRABAJOS = """
+    CREATE TABLE IF NOT EXISTS trabajos (
+        id CHAR(32) PRIMARY KEY,
+        tipo VARCHAR(20) NOT NULL,
+        periodo VARCHAR(20) NOT NULL,
+        estado VARCHAR(20) NOT NULL,
+        total INT NOT NULL DEFAULT 0,
+        hechos INT NOT NULL DEFAULT 0,
+        cancelado TINYINT(1) NOT NULL DEFAULT 0,
+        archivo VARCHAR(255) NULL,
+        bytes BIGINT NULL,
+        error VARCHAR(500) NULL,
+        proceso VARCHAR(100) NOT NULL,
+        creado_por INT NOT NULL,
+        creado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        terminado_en TIMESTAMP NULL,
+        KEY idx_trabajos_usuario_creado (creado_por, creado_en),
+        KEY idx_trabajos_estado (estado, terminado_en)
+    )
+"""
+
+
+class TrabajosOcupadosError(RuntimeError):
+    """La cola de trabajos de este worker está llena."""
+
+
+class TrabajoCancelado(Exception):
+    pass
+
+
+# ---------------------- Dentro de los procesos del pool ----------------------
+def _iniciar_proceso(nice):
+    if nice and hasattr(os, "nice"):
+        os.nice(nice)
+
+
+def _conectar_lectura(indice: int):
+    """Conexión propia del proceso: una réplica (repartidas por lote) o el primario."""
+    replicas = _parsear_replicas(DB_REPLICA_HOSTS)
+    if replicas:
+        host, port = replicas[indice % len(replicas)]
+        try:
+            return _crear_conexion_replica(host, port)
+        except mysql.connector.Error as e:
+            logger.warning("⚠️ Réplica %s:%s no disponible para el trabajo, se usa el primario: %s", host, port, e)
+    return _crear_conexion_mysql()
+
+
+def cohorte(periodo: str, ruta_archivo: str = None) -> list:
+    """Estudiantes con notas en el periodo (tabla y archivo si está cerrado), ordenados."""
+    conn = _conectar_lectura(0)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT DISTINCT estudiante_id FROM notas WHERE periodo = %s", (periodo,))
+        ids = {fila[0] for fila in cursor.fetchall()}
+    finally:
+        cursor.close()
+        conn.close()
+    if ruta_archivo:
+        ids.update(set(ArchivoPeriodo(ruta_archivo).estudiante_id.tolist()))
+    return sorted(ids)
+
+
+def generar_lote(tipo: str, periodo: str, indice: int, estudiante_ids: list, rutas_archivos: list,
+                 directorio: str) -> int:
+    """Escribe el archivo de cada estudiante del lote. Devuelve cuántos estudiantes procesó."""
+    conn = _conectar_lectura(indice)
+    try:
+        return escribir_lote(conn, tipo, periodo, estudiante_ids, rutas_archivos, directorio)
+    finally:
+        conn.close()
+
+
+def escribir_lote(conn, tipo, periodo, estudiante_ids, rutas_archivos, directorio) -> int:
+    estudiante_ids = sorted(estudiante_ids)
+    archivadas = defaultdict(list)
+    for ruta in rutas_archivos:
+        for estudiante_id, notas in ArchivoPeriodo(ruta).notas_de_estudiantes(estudiante_ids).items():
+            archivadas[estudiante_id].extend(notas)
+
+    marcadores = ", ".join(["%s"] * len(estudiante_ids))
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT e.id, e.codigo_estudiante, u.nombre
+            FROM estudiantes e
+            JOIN usuarios u ON e.usuario_id = u.id
+            WHERE e.id IN ({marcadores})
+        """, estudiante_ids)
+        datos = {fila[0]: fila[1:] for fila in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+    condicion, params = "", list(estudiante_ids)
+    if tipo == "boletines":
+        condicion, params = "AND periodo = %s", params + [periodo]
+    # Sin buffer: las filas llegan a medida que se consumen, un estudiante a la vez
+    cursor = conn.cursor(buffered=False)
+    try:
+        cursor.execute(f"""
+            SELECT estudiante_id, periodo, asignatura, calificacion
+            FROM notas
+            WHERE estudiante_id IN ({marcadores}) {condicion}
+            ORDER BY estudiante_id
+        """, params)
+        vivas = groupby(cursor, key=itemgetter(0))
+        actual = next(vivas, None)
+        for estudiante_id in estudiante_ids:
+            notas = archivadas.get(estudiante_id, [])
+            if actual is not None and actual[0] == estudiante_id:
+                notas = notas + [fila[1:] for fila in actual[1]]
+                actual = next(vivas, None)
+            if estudiante_id in datos:  # si lo borraron mientras corría el trabajo, se omite
+                codigo, nombre = datos[estudiante_id]
+                escribir_estudiante(directorio, tipo, periodo, estudiante_id, codigo, nombre, notas)
+        for _ in cursor:
+            pass  # un cursor sin buffer se debe leer completo antes de cerrarlo
+    finally:
+        cursor.close()
+    return len(estudiante_ids)
+
+
+def _resumen(calificaciones):
+    return len(calificaciones), round(sum(calificaciones) / len(calificaciones), 2), min(calificaciones), max(calificaciones)
+
+
+def escribir_estudiante(directorio, tipo, periodo, estudiante_id, codigo, nombre, notas):
+    """CSV del estudiante con sus notas (periodo, asignatura, calificacion) agrupadas."""
+    grupos = defaultdict(list)
+    for per, asignatura, calificacion in notas:
+        grupos[(per, asignatura) if tipo == "historiales" else asignatura].append(float(calificacion))
+    todas = [c for calificaciones in grupos.values() for c in calificaciones]
+
+    ruta = os.path.join(directorio, f"{_NOMBRE_SEGURO.sub('_', str(codigo))}_{estudiante_id}.csv")
+    with open(ruta, "w", newline="", encoding="utf-8") as f:
+        escritor = csv.writer(f)
+        escritor.writerow(["Boletín de calificaciones" if tipo == "boletines" else "Historial académico"])
+        escritor.writerow(["Estudiante", nombre])
+        escritor.writerow(["Código", codigo])
+        if tipo == "boletines":
+            escritor.writerow(["Periodo", periodo])
+            escritor.writerow([])
+            escritor.writerow(["Asignatura", "Notas", "Promedio", "Mínima", "Máxima", "Estado"])
+            for asignatura in sorted(grupos):
+                conteo, promedio, minima, maxima = _resumen(grupos[asignatura])
+                escritor.writerow([asignatura, conteo, promedio, minima, maxima, calcular_estado(promedio)])
+        else:
+            escritor.writerow([])
+            escritor.writerow(["Periodo", "Asignatura", "Notas", "Promedio", "Mínima", "Máxima", "Estado"])
+            for per, asignatura in sorted(grupos):
+                conteo, promedio, minima, maxima = _resumen(grupos[(per, asignatura)])
+                escritor.writerow([per, asignatura, conteo, promedio, minima, maxima, calcular_estado(promedio)])
+        if todas:
+            conteo, promedio, minima, maxima = _resumen(todas)
+            escritor.writerow([])
+            escritor.writerow(["Promedio general", conteo, promedio, minima, maxima, calcular_estado(promedio)])
+
+
+def empaquetar(directorio: str, destino: str) -> int:
+    """Comprime los archivos del trabajo en `destino`, borra el directorio y devuelve el tamaño."""
+    temporal = f"{destino}.tmp"
+    with zipfile.ZipFile(temporal, "w", zipfile.ZIP_DEFLATED) as paquete:
+        for nombre in sorted(os.listdir(directorio)):
+            paquete.write(os.path.join(directorio, nombre), nombre)
+    os.replace(temporal, destino)
+    shutil.rmtree(directorio, ignore_errors=True)
+    return os.path.getsize(destino)
+
+
+_procesos = None
+_procesos_lock = threading.Lock()
+
+
+def _get_procesos():
+    global _procesos
+    if _procesos is None:
+        with _procesos_lock:
+            if _procesos is None:
+                # spawn: los hijos no heredan los hilos, el pool de conexiones ni los sockets del worker
+                _procesos = ProcessPoolExecutor(max_workers=TRABAJOS_PROCESOS,
+                                                mp_context=multiprocessing.get_context("spawn"),
+                                                initializer=_iniciar_proceso, initargs=(TRABAJOS_NICE,))
+    return _procesos
+
+
+# ---------------------- Estado en la tabla ----------------------
+def _proceso() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _ejecutar_sql(sql, params=(), filas=False):
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Error de conexión con la base de datos")
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(sql, params)
+        if filas:
+            return cursor.fetchall()
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _a_dict(fila):
+    total, hechos = fila["total"], fila["hechos"]
+    return {
+        "id": fila["id"],
+        "tipo": fila["tipo"],
+        "periodo": fila["periodo"],
+        "estado": fila["estado"],
+        "total": total,
+        "hechos": hechos,
+        "progreso": round(hechos / total, 3) if total else (1.0 if fila["estado"] == "terminado" else 0.0),
+        "cancelacion_pedida": bool(fila["cancelado"]),
+        "bytes": fila["bytes"],
+        "error": fila["error"],
+        "creado_por": fila["creado_por"],
+        "creado_en": fila["creado_en"],
+        "terminado_en": fila["terminado_en"],
+    }
+
+
+_COLUMNAS = """id, tipo, periodo, estado, total, hechos, cancelado, archivo, bytes, error,
+               creado_por, creado_en, terminado_en"""
+
+
+def _leer(trabajo_id):
+    filas = _ejecutar_sql(f"SELECT {_COLUMNAS} FROM trabajos WHERE id = %s", (trabajo_id,), filas=True)
+    return filas[0] if filas else None
+
+
+def _avance(trabajo_id, hechos, total=None) -> bool:
+    """Guarda el avance y devuelve True si pidieron cancelar el trabajo."""
+    if total is None:
+        _ejecutar_sql("UPDATE trabajos SET hechos = %s WHERE id = %s", (hechos, trabajo_id))
+    else:
+        _ejecutar_sql("UPDATE trabajos SET hechos = %s, total = %s WHERE id = %s", (hechos, total, trabajo_id))
+    fila = _ejecutar_sql("SELECT cancelado FROM trabajos WHERE id = %s", (trabajo_id,), filas=True)
+    return not fila or bool(fila[0]["cancelado"])
+
+
+def _finalizar(trabajo_id, estado, archivo=None, bytes_=None, error=None):
+    _ejecutar_sql("""
+        UPDATE trabajos SET estado = %s, archivo = %s, bytes = %s, error = %s, terminado_en = CURRENT_TIMESTAMP
+        WHERE id = %s
+    """, (estado, archivo, bytes_, error[:500] if error else None, trabajo_id))
+
+
+def _terminar(trabajo_id, archivo, bytes_) -> bool:
+    """Marca el trabajo terminado salvo que hayan pedido cancelarlo (entonces devuelve False)."""
+    return _ejecutar_sql("""
+        UPDATE trabajos SET estado = 'terminado', archivo = %s, bytes = %s, terminado_en = CURRENT_TIMESTAMP
+        WHERE id = %s AND cancelado = 0
+    """, (archivo, bytes_, trabajo_id)) > 0
+
+
+# ---------------------- Coordinador ----------------------
+class ColaTrabajos:
+    """
+    Cola acotada de trabajos de este worker. Cada hilo coordinador ejecuta un
+    trabajo a la vez repartiendo sus lotes en el pool de procesos.
+    """
+
+    def __init__(self, concurrentes=TRABAJOS_CONCURRENTES, max_pendientes=TRABAJOS_MAX_PENDIENTES):
+        self.concurrentes = concurrentes
+        self._cola = queue.Queue(maxsize=max_pendientes)
+        self._hilos = []
+        self._lock = threading.Lock()
+        self._en_curso = set()
+        self._activa = True
+        self.stats = {"encolados": 0, "terminados": 0, "fallidos": 0, "cancelados": 0, "rechazados": 0}
+
+    def start(self):
+        with self._lock:
+            self._activa = True
+            self._hilos = [h for h in self._hilos if h.is_alive()]
+            for i in range(len(self._hilos), self.concurrentes):
+                hilo = threading.Thread(target=self._run, name=f"trabajos-{i}", daemon=True)
+                hilo.start()
+                self._hilos.append(hilo)
+
+    def stop(self, timeout=10.0):
+        """Deja de tomar trabajos: los que quedan en la cola se marcan como interrumpidos al reiniciar."""
+        with self._lock:
+            self._activa = False
+            hilos, self._hilos = self._hilos, []
+        for _ in hilos:
+            try:
+                self._cola.put_nowait(_FIN)
+            except queue.Full:
+                break
+        for hilo in hilos:
+            hilo.join(timeout)
+
+    def encolar(self, trabajo_id):
+        self.start()
+        try:
+            self._cola.put_nowait(trabajo_id)
+        except queue.Full:
+            self.stats["rechazados"] += 1
+            raise TrabajosOcupadosError("Hay demasiados trabajos pendientes, intenta más tarde")
+        self.stats["encolados"] += 1
+
+    def _run(self):
+        while True:
+            trabajo_id = self._cola.get()
+            if trabajo_id is _FIN or not self._activa:
+                return
+            try:
+                self._ejecutar(trabajo_id)
+            except Exception as e:
+                logger.error("❌ Error registrando el estado del trabajo %s: %s", trabajo_id, e)
+
+    def _ejecutar(self, trabajo_id):
+        # Si lo cancelaron mientras esperaba ya no está pendiente
+        if not _ejecutar_sql("UPDATE trabajos SET estado = 'en_curso' WHERE id = %s AND estado = 'pendiente'",
+                             (trabajo_id,)):
+            self.stats["cancelados"] += 1
+            return
+        trabajo = _leer(trabajo_id)
+
+        tipo, periodo = trabajo["tipo"], trabajo["periodo"]
+        cerrado = archivos_de({"periodo": periodo})
+        archivos = cerrado if tipo == "boletines" else archivos_de({})
+        rutas = [archivo.ruta for archivo in archivos]
+        directorio = os.path.join(TRABAJOS_DIR, trabajo_id)
+        os.makedirs(directorio, exist_ok=True)
+        procesos = _get_procesos()
+        en_vuelo = set()
+        with self._lock:
+            self._en_curso.add(trabajo_id)
+        try:
+            estudiantes = procesos.submit(cohorte, periodo, cerrado[0].ruta if cerrado else None).result()
+            lotes = [estudiantes[i:i + TRABAJOS_LOTE_ESTUDIANTES]
+                     for i in range(0, len(estudiantes), TRABAJOS_LOTE_ESTUDIANTES)]
+            if _avance(trabajo_id, 0, total=len(estudiantes)):
+                raise TrabajoCancelado()
+            hechos, siguiente = 0, 0
+            while siguiente < len(lotes) or en_vuelo:
+                # Como mucho un lote por proceso: otro trabajo puede avanzar y cancelar es inmediato
+                while siguiente < len(lotes) and len(en_vuelo) < TRABAJOS_PROCESOS:
+                    en_vuelo.add(procesos.submit(generar_lote, tipo, periodo, siguiente, lotes[siguiente],
+                                                 rutas, directorio))
+                    siguiente += 1
+                listos, en_vuelo = wait(en_vuelo, return_when=FIRST_COMPLETED)
+                hechos += sum(futuro.result() for futuro in listos)
+                if _avance(trabajo_id, hechos):
+                    raise TrabajoCancelado()
+            nombre = f"{trabajo_id}.zip"
+            destino = os.path.join(TRABAJOS_DIR, nombre)
+            bytes_ = procesos.submit(empaquetar, directorio, destino).result()
+            # Atómico con cancelar_trabajo: o gana la cancelación o el trabajo ya no se puede cancelar
+            if not _terminar(trabajo_id, nombre, bytes_):
+                os.remove(destino)
+                raise TrabajoCancelado()
+            self.stats["terminados"] += 1
+            logger.info("Trabajo %s terminado", trabajo_id,
+                        extra={"tipo": tipo, "periodo": periodo, "estudiantes": hechos, "bytes": bytes_})
+        except TrabajoCancelado:
+            wait(en_vuelo)
+            shutil.rmtree(directorio, ignore_errors=True)
+            _finalizar(trabajo_id, "cancelado")
+            self.stats["cancelados"] += 1
+        except Exception as e:
+            wait(en_vuelo)
+            shutil.rmtree(directorio, ignore_errors=True)
+            logger.error("❌ Falló el trabajo %s: %s", trabajo_id, e)
+            _finalizar(trabajo_id, "fallido", error=str(e) or type(e).__name__)
+            self.stats["fallidos"] += 1
+        finally:
+            with self._lock:
+                self._en_curso.discard(trabajo_id)
+        limpiar_vencidos()
+
+    def pendientes(self):
+        return self._cola.qsize()
+
+    def en_curso(self):
+        with self._lock:
+            return len(self._en_curso)
+
+
+_cola = ColaTrabajos()
+
+
+# ---------------------- API del módulo ----------------------
+def crear_trabajo(tipo: str, periodo: str, usuario_id: int) -> dict:
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de trabajo inválido: {tipo!r}")
+    if not periodo or len(periodo) > 20:
+        raise ValueError("Periodo inválido")
+    trabajo_id = uuid.uuid4().hex
+    _ejecutar_sql("""
+        INSERT INTO trabajos (id, tipo, periodo, estado, proceso, creado_por)
+        VALUES (%s, %s, %s, 'pendiente', %s, %s)
+    """, (trabajo_id, tipo, periodo, _proceso(), usuario_id))
+    try:
+        _cola.encolar(trabajo_id)
+    except TrabajosOcupadosError:
+        _ejecutar_sql("DELETE FROM trabajos WHERE id = %s", (trabajo_id,))
+        raise
+    return _a_dict(_leer(trabajo_id))
+
+
+def obtener_trabajo(trabajo_id: str):
+    fila = _leer(trabajo_id)
+    return _a_dict(fila) if fila else None
+
+
+def listar_trabajos(usuario_id: int = None, limite: int = 50) -> list:
+    """Los trabajos más recientes (de un usuario, o de todos)."""
+    if usuario_id is None:
+        filas = _ejecutar_sql(f"SELECT {_COLUMNAS} FROM trabajos ORDER BY creado_en DESC LIMIT %s",
+                              (limite,), filas=True)
+    else:
+        filas = _ejecutar_sql(f"""
+            SELECT {_COLUMNAS} FROM trabajos WHERE creado_por = %s
+            ORDER BY creado_en DESC LIMIT %s
+        """, (usuario_id, limite), filas=True)
+    return [_a_dict(fila) for fila in filas]
+
+
+def cancelar_trabajo(trabajo_id: str) -> bool:
+    """
+    Pide cancelar un trabajo pendiente o en curso. Uno pendiente queda cancelado
+    en el acto; uno en curso, al terminar su lote actual (o el ZIP). False si ya había terminado.
+    """
+    # MySQL asigna de izquierda a derecha: terminado_en se calcula con el estado anterior
+    return _ejecutar_sql("""
+        UPDATE trabajos
+        SET cancelado = 1,
+            terminado_en = IF(estado = 'pendiente', CURRENT_TIMESTAMP, terminado_en),
+            estado = IF(estado = 'pendiente', 'cancelado', estado)
+        WHERE id = %s AND estado IN ('pendiente', 'en_curso') AND cancelado = 0
+    """, (trabajo_id,)) > 0
+
+
+def ruta_resultado(trabajo_id: str):
+    """Ruta del ZIP de un trabajo terminado, o None si no existe (vencido o no terminado)."""
+    fila = _leer(trabajo_id)
+    if fila is None or fila["estado"] != "terminado" or not fila["archivo"]:
+        return None
+    ruta = os.path.join(TRABAJOS_DIR, fila["archivo"])
+    return ruta if os.path.exists(ruta) else None
+
+
+def _vivo(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def recuperar_interrumpidos() -> int:
+    """Marca como fallidos los trabajos activos de procesos de este servidor que ya no existen."""
+    host = socket.gethostname()
+    filas = _ejecutar_sql("SELECT id, proceso FROM trabajos WHERE estado IN ('pendiente', 'en_curso')", filas=True)
+    interrumpidos = 0
+    for fila in filas:
+        servidor, _, pid = fila["proceso"].rpartition(":")
+        if servidor != host or not pid.isdigit() or _vivo(int(pid)):
+            continue
+        _finalizar(fila["id"], "fallido", error="Interrumpido: el proceso que lo ejecutaba terminó")
+        shutil.rmtree(os.path.join(TRABAJOS_DIR, fila["id"]), ignore_errors=True)
+        interrumpidos += 1
+    return interrumpidos
+
+
+def limpiar_vencidos() -> int:
+    """Borra los ZIP con más de TRABAJOS_RETENCION_HORAS y marca sus trabajos como vencidos."""
+    try:
+        filas = _ejecutar_sql("""
+            SELECT id, archivo FROM trabajos
+            WHERE estado = 'terminado' AND terminado_en < NOW() - INTERVAL %s HOUR
+        """, (TRABAJOS_RETENCION_HORAS,), filas=True)
+        for fila in filas:
+            if fila["archivo"]:
+                try:
+                    os.remove(os.path.join(TRABAJOS_DIR, fila["archivo"]))
+                except FileNotFoundError:
+                    pass
+            _ejecutar_sql("UPDATE trabajos SET estado = 'vencido', archivo = NULL WHERE id = %s", (fila["id"],))
+        return len(filas)
+    except Exception as e:
+        logger.warning("⚠️ No se pudieron limpiar los resultados vencidos: %s", e)
+        return 0
+
+
+def iniciar_trabajos():
+    os.makedirs(TRABAJOS_DIR, exist_ok=True)
+    _cola.start()
+    try:
+        interrumpidos = recuperar_interrumpidos()
+        if interrumpidos:
+            logger.warning("⚠️ %d trabajos interrumpidos por un reinicio quedaron como fallidos", interrumpidos)
+        limpiar_vencidos()
+    except Exception as e:
+        logger.error("❌ No se pudo revisar la tabla de trabajos: %s", e)
+
+
+def detener_trabajos():
+    global _procesos
+    _cola.stop(timeout=0)  # no toma más trabajos; el que está corriendo termina al cerrar el pool
+    with _procesos_lock:
+        procesos, _procesos = _procesos, None
+    if procesos is not None:
+        # Los lotes que no empezaron se descartan; el coordinador marca el trabajo como fallido
+        procesos.shutdown(wait=True, cancel_futures=True)
+
+
+def get_trabajos_stats():
+    return {**_cola.stats, "pendientes": _cola.pendientes(), "en_curso": _cola.en_curso(),
+            "procesos": TRABAJOS_PROCESOS, "concurrentes": _cola.concurrentes}
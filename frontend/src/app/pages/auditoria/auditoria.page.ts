@@ -19,6 +19,8 @@ import { LoggerService } from '../../services/logger.service';
 export class AuditoriaPage implements OnInit {
   filtro = '';
   auditoria: LogAuditoria[] = [];
+  siguienteCursor: string | null = null;
+  cargando = false;
 
   constructor(
     private navCtrl: NavController,
@@ -33,28 +35,37 @@ export class AuditoriaPage implements OnInit {
   }
 
   cargarAuditoria() {
-    this.auditoriaService.obtenerRegistros().subscribe({
-      next: (data) => {
-        this.logger.debug('Registros de auditoría cargados', { 
-          count: data.length 
-        });
-        this.auditoria = data;
-      },
-      error: (err) => {
-        this.logger.error('Error cargando auditoría', err);
-        this.mostrarAlerta('Error', 'No tienes permisos o la sesión expiró');
-      },
-    });
+    this.siguienteCursor = null;
+    this.auditoria = [];
+    this.cargarPagina();
+  }
+
+  cargarMas() {
+    if (this.siguienteCursor && !this.cargando) {
+      this.cargarPagina();
+    }
   }
 
-  get auditoriaFiltrada() {
-    const f = this.filtro.toLowerCase();
-    return this.auditoria.filter(
-      (log) =>
-        log.accion.toLowerCase().includes(f) ||
-        log.usuario.toLowerCase().includes(f) ||
-        log.ip.includes(f)
-    );
+  // El filtro se aplica en el servidor: prefijo de la acción
+  private cargarPagina() {
+    this.cargando = true;
+    this.auditoriaService
+      .obtenerRegistros({ accion: this.filtro.trim() }, this.siguienteCursor)
+      .subscribe({
+        next: (pagina) => {
+          this.logger.debug('Registros de auditoría cargados', { 
+            count: pagina.registros.length 
+          });
+          this.auditoria = [...this.auditoria, ...pagina.registros];
+          this.siguienteCursor = pagina.siguienteCursor;
+          this.cargando = false;
+        },
+        error: (err) => {
+          this.cargando = false;
+          this.logger.error('Error cargando auditoría', err);
+          this.mostrarAlerta('Error', 'No tienes permisos o la sesión expiró');
+        },
+      });
   }
 
   async mostrarAlerta(titulo: string, mensaje: string) {
@@ -22,6 +22,8 @@ import { FormsModule } from '@angular/forms';
 })
 export class EstudiantesPage implements OnInit {
   estudiantes: Estudiante[] = [];
+  busqueda = '';
+  coincidencias: Set<number> | null = null; // ids que devolvió /buscar, null = sin búsqueda
   user: any = null;
 
   constructor(
@@ -64,6 +66,31 @@ export class EstudiantesPage implements OnInit {
     });
   }
 
+  // El servidor resuelve la búsqueda; el promedio y el estado salen de la lista ya cargada
+  buscar() {
+    const q = this.busqueda.trim();
+    if (!q) {
+      this.coincidencias = null;
+      return;
+    }
+    this.estudiantesService.buscarEstudiantes(q, 50).subscribe({
+      next: (data) => {
+        if (q !== this.busqueda.trim()) return;
+        this.coincidencias = new Set(data.map((e) => e.id));
+      },
+      error: (err) => {
+        this.logger.error('Error al buscar estudiantes', err);
+      },
+    });
+  }
+
+  get estudiantesVisibles(): Estudiante[] {
+    const coincidencias = this.coincidencias;
+    return coincidencias
+      ? this.estudiantes.filter((e) => coincidencias.has(e.id))
+      : this.estudiantes;
+  }
+
   getEstadoColor(estado: string): string {
     switch (estado?.toLowerCase()) {
       case 'activo':
@@ -1,6 +1,7 @@
-import { Component, OnInit } from '@angular/core';
+import { Component, OnDestroy, OnInit } from '@angular/core';
+import { Subscription } from 'rxjs';
 import { AuthService, User } from '../../services/auth.service';
-import { NotasService, Nota } from '../../services/notas.service';
+import { NotasService, Nota, EventoNota } from '../../services/notas.service';
 import { LoggerService } from '../../services/logger.service';
 import { AlertController } from '@ionic/angular';
 import { IonicModule } from '@ionic/angular';
@@ -14,7 +15,7 @@ import { FormsModule } from '@angular/forms';
   standalone: true,
   imports: [IonicModule, CommonModule, FormsModule],
 })
-export class NotasPage implements OnInit {
+export class NotasPage implements OnInit, OnDestroy {
   user: User | null = null;
   notas: Nota[] = [];
   notasFiltradas: Nota[] = [];
@@ -22,6 +23,11 @@ export class NotasPage implements OnInit {
   estudiantes: any[] = [];
   asignaturaFiltro: string = '';
   busquedaEstudiante: string = '';
+  siguienteCursor: string | null = null;
+  cargandoNotas = false;
+  private cambiosSub?: Subscription;
+  // Notas borradas desde esta vista: un evento 'created' atrasado no las devuelve a la tabla
+  private eliminadas = new Set<number>();
 
   constructor(
     private authService: AuthService,
@@ -33,6 +39,50 @@ export class NotasPage implements OnInit {
   ngOnInit() {
     this.user = this.authService.getCurrentUser();
     this.cargarDatosIniciales();
+    this.suscribirCambios();
+  }
+
+  ngOnDestroy() {
+    this.cambiosSub?.unsubscribe();
+  }
+
+  // Cambios en vivo: se aplican como deltas sobre la tabla en lugar de recargarla.
+  // Las respuestas de crear/editar/borrar pasan por aquí también, así que el mismo
+  // cambio puede llegar dos veces (respuesta y stream) y aplicarlo debe ser idempotente.
+  private suscribirCambios() {
+    this.cambiosSub?.unsubscribe();
+    this.cambiosSub = this.notasService
+      .suscribirCambios({ asignatura: this.asignaturaFiltro })
+      .subscribe((evento) => this.aplicarCambio(evento));
+  }
+
+  private aplicarCambio(evento: EventoNota) {
+    if (evento.tipo === 'resync' || !evento.nota) {
+      this.cargarNotas();
+      return;
+    }
+    const nota = evento.nota;
+    if (evento.tipo === 'deleted') {
+      this.eliminadas.add(nota.id!);
+      this.notas = this.notas.filter((n) => n.id !== nota.id);
+    } else if (evento.tipo === 'updated') {
+      this.notas = this.notas.map((n) => (n.id === nota.id ? { ...n, ...nota } : n));
+    } else if (
+      !this.eliminadas.has(nota.id!) &&
+      !this.notas.some((n) => n.id === nota.id) &&
+      this.coincideConFiltros(nota)
+    ) {
+      // Las más recientes van primero, igual que en el listado del servidor
+      this.notas = [nota, ...this.notas];
+    } else {
+      return; // ya estaba aplicada (nuestra propia respuesta) o no corresponde al filtro
+    }
+    this.notasFiltradas = [...this.notas];
+    this.enriquecerNotasConDatos();
+  }
+
+  private coincideConFiltros(nota: Nota): boolean {
+    return !this.asignaturaFiltro || nota.asignatura === this.asignaturaFiltro;
   }
 
   cargarDatosIniciales() {
@@ -41,22 +91,45 @@ export class NotasPage implements OnInit {
     this.cargarEstudiantes();
   }
 
+  // Carga la primera página con los filtros actuales; el filtrado se hace en el servidor
   cargarNotas() {
-    this.notasService.obtenerNotasProfesor().subscribe({
-      next: (notas) => {
-        this.logger.debug('Notas cargadas', { 
-          count: notas.length 
-        });
-        this.notas = notas;
-        this.notasFiltradas = [...this.notas];
-        // Enriquecer las notas con datos de estudiantes
-        this.enriquecerNotasConDatos();
-      },
-      error: (error) => {
-        this.logger.error('Error cargando notas', error);
-        this.mostrarMensaje('Error', 'No se pudieron cargar las notas');
-      },
-    });
+    this.siguienteCursor = null;
+    this.notas = [];
+    this.eliminadas.clear();
+    this.cargarPaginaNotas();
+  }
+
+  cargarMasNotas() {
+    if (this.siguienteCursor && !this.cargandoNotas) {
+      this.cargarPaginaNotas();
+    }
+  }
+
+  private cargarPaginaNotas() {
+    this.cargandoNotas = true;
+    this.notasService
+      .obtenerNotasProfesor(
+        { asignatura: this.asignaturaFiltro },
+        this.siguienteCursor
+      )
+      .subscribe({
+        next: (pagina) => {
+          this.logger.debug('Notas cargadas', {
+            count: pagina.notas.length
+          });
+          this.notas = [...this.notas, ...pagina.notas];
+          this.notasFiltradas = [...this.notas];
+          this.siguienteCursor = pagina.siguienteCursor;
+          this.cargandoNotas = false;
+          // Enriquecer las notas con datos de estudiantes
+          this.enriquecerNotasConDatos();
+        },
+        error: (error) => {
+          this.cargandoNotas = false;
+          this.logger.error('Error cargando notas', error);
+          this.mostrarMensaje('Error', 'No se pudieron cargar las notas');
+        },
+      });
   }
 
   cargarCursos() {
@@ -106,13 +179,8 @@ export class NotasPage implements OnInit {
   }
 
   filtrarNotas() {
-    if (this.asignaturaFiltro) {
-      this.notasFiltradas = this.notas.filter(
-        (nota) => nota.asignatura === this.asignaturaFiltro
-      );
-    } else {
-      this.notasFiltradas = [...this.notas];
-    }
+    this.cargarNotas();
+    this.suscribirCambios();
   }
 
   formatearFecha(fecha: Date | string | undefined | null): string {
@@ -249,9 +317,10 @@ export class NotasPage implements OnInit {
     };
 
     this.notasService.agregarNota(nuevaNota).subscribe({
-      next: () => {
+      next: (creada) => {
+        // Sin esperar al stream; su evento 'created' se descarta por id
+        this.aplicarCambio({ tipo: 'created', nota: creada });
         this.mostrarMensaje('Éxito', 'Calificación registrada correctamente');
-        this.cargarNotas(); // Recargar la lista
       },
       error: (error) => {
         this.logger.error('Error registrando calificación', error);
@@ -331,9 +400,9 @@ export class NotasPage implements OnInit {
     };
 
     this.notasService.actualizarNota(nota.id!, notaActualizada).subscribe({
-      next: () => {
+      next: (actualizada) => {
+        this.aplicarCambio({ tipo: 'updated', nota: actualizada });
         this.mostrarMensaje('Éxito', 'Calificación actualizada correctamente');
-        this.cargarNotas();
       },
       error: (error) => {
         this.logger.error('Error actualizando calificación', error);
@@ -364,11 +433,11 @@ export class NotasPage implements OnInit {
           handler: () => {
             this.notasService.eliminarNota(nota.id!).subscribe({
               next: () => {
+                this.aplicarCambio({ tipo: 'deleted', nota });
                 this.mostrarMensaje(
                   'Éxito',
                   'Calificación eliminada correctamente'
                 );
-                this.cargarNotas();
               },
               error: (error) => {
                 this.logger.error('Error eliminando calificación', error);
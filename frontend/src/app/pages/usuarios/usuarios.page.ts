@@ -4,17 +4,20 @@ import { UsuariosService, Usuario } from '../../services/usuarios.service';
 import { LoggerService } from '../../services/logger.service';
 import { IonicModule, AlertController } from '@ionic/angular';
 import { CommonModule } from '@angular/common';
+import { FormsModule } from '@angular/forms';
 
 @Component({
   selector: 'app-usuarios',
   templateUrl: './usuarios.page.html',
   styleUrls: ['./usuarios.page.scss'],
   standalone: true,
-  imports: [IonicModule, CommonModule],
+  imports: [IonicModule, CommonModule, FormsModule],
 })
 export class UsuariosPage implements OnInit {
   user: User | null = null;
   usuarios: Usuario[] = [];
+  busqueda = '';
+  resultados: Usuario[] | null = null; // null = sin búsqueda activa
 
   constructor(
     private authService: AuthService,
@@ -48,6 +51,33 @@ export class UsuariosPage implements OnInit {
     });
   }
 
+  // Resultados del servidor mientras se escribe; las estadísticas usan la lista completa
+  buscar() {
+    const q = this.busqueda.trim();
+    if (!q) {
+      this.resultados = null;
+      return;
+    }
+    this.usuariosService.buscarUsuarios(q, 20).subscribe({
+      next: (data) => {
+        if (q !== this.busqueda.trim()) return; // llegó tarde: ya se escribió otra cosa
+        this.resultados = data.map((u) => ({
+          ...u,
+          role: u.rol,
+          ultimoAcceso: '2024-03-20 10:00',
+          estado: 'Activo',
+        }));
+      },
+      error: (error) => {
+        this.logger.error('Error al buscar usuarios', error);
+      },
+    });
+  }
+
+  get usuariosVisibles(): Usuario[] {
+    return this.resultados ?? this.usuarios;
+  }
+
   async eliminarUsuario(usuario: Usuario) {
     const alert = await this.alertController.create({
       header: 'Confirmar eliminación',
@@ -65,6 +95,7 @@ export class UsuariosPage implements OnInit {
                   `Usuario ${usuario.nombre} eliminado correctamente`
                 );
                 this.cargarUsuarios();
+                this.buscar();
               },
               error: (err) => {
                 this.logger.error('Error eliminando usuario', err);
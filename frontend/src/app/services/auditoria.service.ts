@@ -1,6 +1,7 @@
 import { Injectable } from '@angular/core';
-import { HttpClient, HttpHeaders } from '@angular/common/http';
+import { HttpClient, HttpHeaders, HttpParams } from '@angular/common/http';
 import { Observable } from 'rxjs';
+import { map } from 'rxjs/operators';
 import { AuthService } from './auth.service';
 
 export interface LogAuditoria {
@@ -11,6 +12,19 @@ export interface LogAuditoria {
   ip: string;
 }
 
+export interface FiltrosAuditoria {
+  usuario_id?: number;
+  accion?: string;
+  ip?: string;
+  desde?: string;
+  hasta?: string;
+}
+
+export interface PaginaAuditoria {
+  registros: LogAuditoria[];
+  siguienteCursor: string | null;
+}
+
 @Injectable({
   providedIn: 'root',
 })
@@ -19,11 +33,31 @@ export class AuditoriaService {
 
   constructor(private http: HttpClient, private authService: AuthService) {}
 
-  obtenerRegistros(): Observable<LogAuditoria[]> {
+  obtenerRegistros(
+    filtros: FiltrosAuditoria = {},
+    cursor: string | null = null,
+    limit: number = 50
+  ): Observable<PaginaAuditoria> {
     const token = this.authService.getToken();
     const headers = new HttpHeaders({
       Authorization: `Bearer ${token}`,
     });
-    return this.http.get<LogAuditoria[]>(this.apiUrl, { headers });
+    let params = new HttpParams().set('limit', limit);
+    Object.entries(filtros).forEach(([clave, valor]) => {
+      if (valor !== undefined && valor !== null && valor !== '') {
+        params = params.set(clave, valor);
+      }
+    });
+    if (cursor) {
+      params = params.set('cursor', cursor);
+    }
+    return this.http
+      .get<LogAuditoria[]>(this.apiUrl, { headers, params, observe: 'response' })
+      .pipe(
+        map((respuesta) => ({
+          registros: respuesta.body || [],
+          siguienteCursor: respuesta.headers.get('X-Next-Cursor'),
+        }))
+      );
   }
 }
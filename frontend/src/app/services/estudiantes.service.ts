@@ -1,5 +1,5 @@
 import { Injectable } from '@angular/core';
-import { HttpClient } from '@angular/common/http';
+import { HttpClient, HttpParams } from '@angular/common/http';
 import { Observable } from 'rxjs';
 
 export interface Estudiante {
@@ -12,6 +12,14 @@ export interface Estudiante {
   estado: string;
 }
 
+export interface ResultadoBusquedaEstudiante {
+  id: number;
+  usuario_id: number;
+  codigo_estudiante: string;
+  nombre: string;
+  email: string;
+}
+
 @Injectable({
   providedIn: 'root'
 })
@@ -24,6 +32,12 @@ export class EstudiantesService {
     return this.http.get<Estudiante[]>(this.apiUrl);
   }
 
+  // Buscar por prefijo de nombre, email o código (autocompletado)
+  buscarEstudiantes(q: string, limit = 10): Observable<ResultadoBusquedaEstudiante[]> {
+    const params = new HttpParams().set('q', q).set('limit', limit);
+    return this.http.get<ResultadoBusquedaEstudiante[]>(`${this.apiUrl}/buscar`, { params });
+  }
+
   eliminarEstudiante(id: number): Observable<any> {
     return this.http.delete(`${this.apiUrl}/${id}`);
   }
@@ -1,5 +1,5 @@
 import { Injectable } from '@angular/core';
-import { HttpClient, HttpHeaders } from '@angular/common/http';
+import { HttpClient, HttpHeaders, HttpParams } from '@angular/common/http';
 import { Observable, of } from 'rxjs';
 import { catchError, map } from 'rxjs/operators';
 import { LoggerService } from './logger.service';
@@ -22,6 +22,26 @@ export interface Nota {
   creado_en?: string;
 }
 
+export interface FiltrosNotas {
+  estudiante_id?: number;
+  asignatura?: string;
+  periodo?: string;
+  calificacion_min?: number;
+  calificacion_max?: number;
+}
+
+export interface PaginaNotas {
+  notas: Nota[];
+  siguienteCursor: string | null;
+}
+
+export type TipoEventoNota = 'created' | 'updated' | 'deleted' | 'resync';
+
+export interface EventoNota {
+  tipo: TipoEventoNota;
+  nota?: Nota;
+}
+
 export interface Curso {
   id: string;
   nombre: string;
@@ -47,18 +67,132 @@ export class NotasService {
     });
   }
 
-  obtenerNotasProfesor(): Observable<Nota[]> {
+  obtenerNotasProfesor(
+    filtros: FiltrosNotas = {},
+    cursor: string | null = null,
+    limit: number = 50
+  ): Observable<PaginaNotas> {
+    let params = new HttpParams().set('limit', limit);
+    Object.entries(filtros).forEach(([clave, valor]) => {
+      if (valor !== undefined && valor !== null && valor !== '') {
+        params = params.set(clave, valor);
+      }
+    });
+    if (cursor) {
+      params = params.set('cursor', cursor);
+    }
+
     return this.http
-      .get<any[]>(`${this.apiUrl}/`, { headers: this.getAuthHeaders() })
+      .get<any[]>(`${this.apiUrl}/`, {
+        headers: this.getAuthHeaders(),
+        params,
+        observe: 'response',
+      })
       .pipe(
-        map((notas) => this.adaptarNotasBackend(notas)),
+        map((respuesta) => ({
+          notas: this.adaptarNotasBackend(respuesta.body || []),
+          siguienteCursor: respuesta.headers.get('X-Next-Cursor'),
+        })),
         catchError((error) => {
           this.logger.error('Error obteniendo notas', error);
-          return of([]);
+          return of({ notas: [], siguienteCursor: null });
         })
       );
   }
 
+  /**
+   * Cambios de notas en vivo desde /notas/stream (Server-Sent Events).
+   * Se usa fetch en lugar de EventSource porque el endpoint exige el header
+   * Authorization. Al reconectar (el servidor cierra el stream cada pocos
+   * minutos) se envía Last-Event-ID: el servidor reenvía lo que se perdió y
+   * solo manda 'resync' si no puede. Con 401/403 deja de reintentar.
+   */
+  suscribirCambios(filtros: FiltrosNotas = {}): Observable<EventoNota> {
+    const params = new URLSearchParams();
+    Object.entries(filtros).forEach(([clave, valor]) => {
+      if (valor !== undefined && valor !== null && valor !== '') {
+        params.set(clave, String(valor));
+      }
+    });
+
+    return new Observable<EventoNota>((observer) => {
+      const control = new AbortController();
+      let reintento: ReturnType<typeof setTimeout> | undefined;
+      let ultimoId: string | null = null;
+
+      const conectar = async () => {
+        let espera = 5000;
+        try {
+          const headers: Record<string, string> = {
+            Authorization: `Bearer ${localStorage.getItem('auth_token')}`,
+          };
+          if (ultimoId) {
+            headers['Last-Event-ID'] = ultimoId;
+          }
+          const respuesta = await fetch(`${this.apiUrl}/stream?${params}`, {
+            headers,
+            signal: control.signal,
+          });
+          if (respuesta.status === 401 || respuesta.status === 403) {
+            // Token vencido o sin permiso: reintentar no lo arregla
+            this.logger.warn('Stream de notas rechazado', { status: respuesta.status });
+            observer.complete();
+            return;
+          }
+          if (!respuesta.ok || !respuesta.body) {
+            throw new Error(`HTTP ${respuesta.status}`);
+          }
+
+          const lector = respuesta.body.getReader();
+          const decoder = new TextDecoder();
+          let pendiente = '';
+          while (true) {
+            const { value, done } = await lector.read();
+            if (done) break;
+            pendiente += decoder.decode(value, { stream: true });
+            const bloques = pendiente.split('\n\n');
+            pendiente = bloques.pop() || '';
+            bloques.forEach((bloque) => {
+              const id = bloque.split('\n').find((linea) => linea.startsWith('id:'));
+              if (id) ultimoId = id.slice(3).trim();
+              const evento = this.parsearEvento(bloque);
+              if (evento) observer.next(evento);
+            });
+          }
+          // Cierre normal del servidor: reconectar enseguida y reanudar desde ultimoId
+          espera = 0;
+        } catch (error) {
+          if (control.signal.aborted) return;
+          this.logger.error('Stream de notas interrumpido', error);
+        }
+        if (!control.signal.aborted) {
+          reintento = setTimeout(conectar, espera);
+        }
+      };
+
+      conectar();
+      return () => {
+        control.abort();
+        clearTimeout(reintento);
+      };
+    });
+  }
+
+  private parsearEvento(bloque: string): EventoNota | null {
+    let tipo = '';
+    let datos = '';
+    bloque.split('\n').forEach((linea) => {
+      if (linea.startsWith('event:')) tipo = linea.slice(6).trim();
+      else if (linea.startsWith('data:')) datos += linea.slice(5).trim();
+    });
+    if (!tipo) return null;
+    if (tipo === 'resync') return { tipo: 'resync' };
+    return {
+      tipo: tipo as TipoEventoNota,
+      nota: this.adaptarNotaBackend(JSON.parse(datos)),
+    };
+  }
+
   obtenerMisNotas(): Observable<Nota[]> {
     return this.http
       .get<any[]>(`${this.apiUrl}/mias`, { headers: this.getAuthHeaders() })
@@ -1,5 +1,5 @@
 import { Injectable } from '@angular/core';
-import { HttpClient, HttpHeaders } from '@angular/common/http';
+import { HttpClient, HttpHeaders, HttpParams } from '@angular/common/http';
 import { Observable } from 'rxjs';
 
 export interface Usuario {
@@ -35,6 +35,15 @@ export class UsuariosService {
     });
   }
 
+  // Buscar usuarios por prefijo de nombre o email (autocompletado)
+  buscarUsuarios(q: string, limit = 10): Observable<Usuario[]> {
+    const params = new HttpParams().set('q', q).set('limit', limit);
+    return this.http.get<Usuario[]>(`${this.apiUrl}/buscar`, {
+      headers: this.getAuthHeaders(),
+      params,
+    });
+  }
+
   // Eliminar usuario
   eliminarUsuario(id: number): Observable<any> {
     return this.http.delete(`${this.apiUrl}/${id}`, {
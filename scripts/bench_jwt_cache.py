@@ -0,0 +1,37 @@
+"""
+Microbenchmark: costo de autenticación por petición con y sin la caché de tokens.
+
+Uso:
+    python -m scripts.bench_jwt_cache [iteraciones]
+"""
+import sys
+import time
+
+from app import security
+
+
+def medir(iteraciones, token, limpiar):
+    inicio = time.perf_counter()
+    for _ in range(iteraciones):
+        if limpiar:
+            security.token_cache.clear()
+        security.verify_token(token)
+    return (time.perf_counter() - inicio) / iteraciones * 1e6
+
+
+def main():
+    iteraciones = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    token = security.create_access_token({"sub": "bench@test.com", "rol": "profesor", "user_id": 1})
+
+    sin_cache = medir(iteraciones, token, limpiar=True)
+    security.verify_token(token)
+    con_cache = medir(iteraciones, token, limpiar=False)
+
+    print(f"Iteraciones: {iteraciones}")
+    print(f"Sin caché (jwt.decode + firma): {sin_cache:8.2f} µs/petición")
+    print(f"Con caché (hash + LRU):         {con_cache:8.2f} µs/petición")
+    print(f"Aceleración: x{sin_cache / con_cache:.1f}")
+
+
+if __name__ == "__main__":
+    main()
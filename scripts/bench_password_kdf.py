@@ -0,0 +1,75 @@
+"""
+Benchmark de login con distintos costos del KDF de contraseñas.
+
+Para cada configuración mide la latencia de una verificación aislada y el
+throughput/latencia con C verificaciones concurrentes a través del pool de
+contraseñas (el mismo camino que usa /api/auth/login).
+
+Uso:
+    python -m scripts.bench_password_kdf [concurrencia] [peticiones]
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+from app import security
+
+CONFIGURACIONES = [
+    ("scrypt", {"SCRYPT_N": 2 ** 13}),
+    ("scrypt", {"SCRYPT_N": 2 ** 14}),
+    ("scrypt", {"SCRYPT_N": 2 ** 15}),
+    ("pbkdf2", {"PBKDF2_ITERATIONS": 100_000}),
+    ("pbkdf2", {"PBKDF2_ITERATIONS": 300_000}),
+    ("pbkdf2", {"PBKDF2_ITERATIONS": 600_000}),
+]
+
+
+async def _login_simulado(hashed, latencias):
+    inicio = time.perf_counter()
+    ok = await security.verify_password_async("clave-de-prueba", hashed)
+    latencias.append(time.perf_counter() - inicio)
+    assert ok
+
+
+async def _carga(hashed, concurrencia, peticiones):
+    latencias = []
+    semaforo = asyncio.Semaphore(concurrencia)
+
+    async def una():
+        async with semaforo:
+            await _login_simulado(hashed, latencias)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(una() for _ in range(peticiones)))
+    return time.perf_counter() - inicio, latencias
+
+
+def main():
+    concurrencia = int(sys.argv[1]) if len(sys.argv) > 1 else security.PASSWORD_WORKERS * 2
+    peticiones = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+
+    print(f"Executor: {security.PASSWORD_EXECUTOR} x{security.PASSWORD_WORKERS} | "
+          f"concurrencia {concurrencia} | {peticiones} logins")
+    print(f"{'KDF':<8}{'costo':>10}{'1 login ms':>12}{'logins/s':>10}{'p50 ms':>9}{'p95 ms':>9}")
+    for kdf, costos in CONFIGURACIONES:
+        security.PASSWORD_KDF = kdf
+        for nombre, valor in costos.items():
+            setattr(security, nombre, valor)
+        hashed = security.get_password_hash("clave-de-prueba")
+
+        inicio = time.perf_counter()
+        security.verify_password("clave-de-prueba", hashed)
+        una = (time.perf_counter() - inicio) * 1000
+
+        total, latencias = asyncio.run(_carga(hashed, concurrencia, peticiones))
+        latencias.sort()
+        p95 = latencias[int(len(latencias) * 0.95) - 1]
+        print(f"{kdf:<8}{list(costos.values())[0]:>10}{una:>12.1f}{peticiones / total:>10.1f}"
+              f"{statistics.median(latencias) * 1000:>9.1f}{p95 * 1000:>9.1f}")
+
+    security.close_password_executor()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Compara el costo de servir un listado grande de notas:
+- FastAPI clásico: response_model=list[NotaResponse] (validación + encoder estándar)
+- Camino rápido: respuesta_lista (proyección sin validar + orjson)
+y los bytes enviados sin comprimir, con gzip y con brotli.
+
+Mide tiempo de CPU del proceso por petición (incluye el hilo del TestClient).
+
+Uso:
+    python -m scripts.bench_respuestas [FILAS] [PETICIONES]
+"""
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.models import NotaResponse
+from app.utils import compresion
+from app.utils.compresion import CompresionMiddleware
+from app.utils.respuestas import orjson, respuesta_lista
+
+
+def generar_filas(n):
+    rnd = random.Random(7)
+    inicio = datetime(2024, 1, 1)
+    # Mismas columnas que devuelve _consultar_notas, con tipos de mysql-connector
+    return [{
+        "id": i,
+        "estudiante_id": rnd.randint(1, 2000),
+        "asignatura": rnd.choice(["Matemáticas", "Física", "Química", "Historia"]),
+        "calificacion": Decimal(str(round(rnd.uniform(0, 5), 1))),
+        "periodo": rnd.choice(["2024-1", "2024-2"]),
+        "creado_por": rnd.randint(1, 30),
+        "creado_en": inicio + timedelta(minutes=i),
+        "estudiante_nombre": f"Estudiante {i}",
+        "creado_por_nombre": "Profesor",
+    } for i in range(n)]
+
+
+def crear_app(filas):
+    app = FastAPI()
+    app.add_middleware(CompresionMiddleware)
+
+    @app.get("/clasico", response_model=list[NotaResponse])
+    def clasico():
+        return filas
+
+    @app.get("/rapido", response_model=list[NotaResponse])
+    def rapido():
+        return respuesta_lista(filas, NotaResponse)
+
+    return app
+
+
+def medir(cliente, ruta, peticiones, encoding="identity"):
+    cliente.get(ruta, headers={"Accept-Encoding": encoding})  # calentamiento
+    cpu = time.process_time()
+    reloj = time.perf_counter()
+    for _ in range(peticiones):
+        respuesta = cliente.get(ruta, headers={"Accept-Encoding": encoding})
+    cpu = (time.process_time() - cpu) / peticiones
+    reloj = (time.perf_counter() - reloj) / peticiones
+    return cpu, reloj, respuesta
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    peticiones = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    filas = generar_filas(n)
+    cliente = TestClient(crear_app(filas))
+
+    print(f"{n} notas por respuesta, {peticiones} peticiones | orjson: {'sí' if orjson else 'no'}"
+          f" | brotli: {'sí' if compresion.brotli else 'no'}")
+
+    cpu_clasico, reloj_clasico, r_clasico = medir(cliente, "/clasico", peticiones)
+    cpu_rapido, reloj_rapido, r_rapido = medir(cliente, "/rapido", peticiones)
+    assert r_clasico.json() == r_rapido.json(), "Los dos caminos deben devolver el mismo JSON"
+    print(f"Clásico : {cpu_clasico * 1000:8.2f} ms CPU/pet  {reloj_clasico * 1000:8.2f} ms reloj  {len(r_clasico.content):>9} bytes")
+    print(f"Rápido  : {cpu_rapido * 1000:8.2f} ms CPU/pet  {reloj_rapido * 1000:8.2f} ms reloj  {len(r_rapido.content):>9} bytes")
+    print(f"Mejora CPU: {cpu_clasico / cpu_rapido:.1f}x")
+
+    # Bytes en el cable: el TestClient descomprime, así que se cuentan los crudos
+    for encoding in ("gzip", "br"):
+        if encoding == "br" and not compresion.brotli:
+            continue
+        cpu, reloj, _ = medir(cliente, "/rapido", peticiones, encoding)
+        with cliente.stream("GET", "/rapido", headers={"Accept-Encoding": encoding}) as respuesta:
+            en_cable = sum(len(bloque) for bloque in respuesta.iter_raw())
+            codificacion = respuesta.headers.get("content-encoding")
+        print(f"Rápido+{encoding:<4}: {cpu * 1000:8.2f} ms CPU/pet  {reloj * 1000:8.2f} ms reloj  "
+              f"{en_cable:>9} bytes ({codificacion}, {en_cable / len(r_rapido.content):.1%})")
+
+
+if __name__ == "__main__":
+    main()
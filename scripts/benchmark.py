@@ -0,0 +1,364 @@
+"""
+Benchmark de carga reproducible contra una base MySQL local.
+
+1. Siembra la base (DB_HOST, DB_NAME, DB_USER, DB_PASSWORD, DB_PORT) con el esquema
+   de la aplicación (migraciones) y una cantidad configurable de profesores, estudiantes y notas.
+2. Ejecuta la app FastAPI real en el mismo proceso (httpx + ASGI, con middlewares,
+   pool, auditoría y caché) y la recorre por escenarios: login, listar notas,
+   listar estudiantes, crear nota, actualizar nota y auditoría.
+3. Para cada nivel de concurrencia reporta throughput, p50/p95/p99 y sentencias SQL
+   por petición (del histograma de /metrics), y guarda todo en JSON.
+
+Con --comparar se contrasta contra un JSON anterior y se sale con código 1 si
+algún p95 empeora más de --tolerancia, para usarlo en CI.
+
+La siembra BORRA las tablas: por seguridad solo corre contra localhost salvo --permitir-remoto.
+
+Uso:
+    docker run -d -p 3306:3306 -e MYSQL_ROOT_PASSWORD=bench -e MYSQL_DATABASE=sistema_notas mysql:8
+    DB_HOST=127.0.0.1 DB_USER=root DB_PASSWORD=bench \\
+        python -m scripts.benchmark --estudiantes 2000 --notas-por-estudiante 20 \\
+        --concurrencia 1,8,32 --peticiones 400 --salida bench.json
+    python -m scripts.benchmark --sin-sembrar --comparar bench.json --salida bench-nuevo.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+from app import database
+from app.database import get_db_connection
+from app.security import get_password_hash
+from app.utils import metricas, migraciones
+from app.utils.cache import cache
+from app.utils.promedios import reconstruir
+
+CLAVE_SEMBRADA = "Bench1234!"
+HOSTS_LOCALES = ("localhost", "127.0.0.1", "::1")
+ASIGNATURAS = ["Matemáticas", "Física", "Química", "Historia", "Lenguaje", "Inglés", "Biología", "Arte"]
+PERIODOS = ["2023-1", "2023-2", "2024-1", "2024-2"]
+FILAS_POR_INSERT = 1000
+
+# ---------------------- Siembra ----------------------
+def _insertar(cursor, sql, filas):
+    for i in range(0, len(filas), FILAS_POR_INSERT):
+        cursor.executemany(sql, filas[i:i + FILAS_POR_INSERT])
+
+
+def sembrar(profesores: int, estudiantes: int, notas_por_estudiante: int, auditoria: int, semilla: int):
+    """Recrea los datos de prueba. Devuelve los ids necesarios para los escenarios."""
+    rnd = random.Random(semilla)
+    hash_clave = get_password_hash(CLAVE_SEMBRADA)  # un solo hash para todos: la siembra no mide el KDF
+
+    migraciones.aplicar()
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Error de conexión con la base de datos")
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+        for tabla in ("promedios_estudiante", "extremos_cerrados", "periodos_cerrados",
+                      "auditoria", "notas", "estudiantes", "usuarios"):
+            cursor.execute(f"TRUNCATE TABLE {tabla}")
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+
+        usuarios = [("admin@bench.example.com", hash_clave, "admin", "Admin Bench")]
+        usuarios += [(f"profesor{i}@bench.example.com", hash_clave, "profesor", f"Profesor {i}") for i in range(profesores)]
+        usuarios += [(f"estudiante{i}@bench.example.com", hash_clave, "estudiante", f"Estudiante {i}") for i in range(estudiantes)]
+        _insertar(cursor, "INSERT INTO usuarios (email, password_hash, rol, nombre) VALUES (%s, %s, %s, %s)", usuarios)
+
+        # Con TRUNCATE los ids empiezan en 1 y siguen el orden de inserción
+        primer_estudiante = 2 + profesores
+        _insertar(cursor, "INSERT INTO estudiantes (usuario_id, codigo_estudiante, nombre) VALUES (%s, %s, %s)", [
+            (primer_estudiante + i, f"EST{i:06d}", f"Estudiante {i}") for i in range(estudiantes)
+        ])
+
+        inicio = datetime(2024, 1, 1)
+        notas = [
+            (est, rnd.choice(ASIGNATURAS), round(rnd.uniform(0, 5), 1), rnd.choice(PERIODOS),
+             rnd.randint(1, 1 + profesores), inicio + timedelta(seconds=rnd.randint(0, 3 * 10 ** 7)))
+            for est in range(1, estudiantes + 1)
+            for _ in range(notas_por_estudiante)
+        ]
+        _insertar(cursor, """
+            INSERT INTO notas (estudiante_id, asignatura, calificacion, periodo, creado_por, creado_en)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, notas)
+
+        _insertar(cursor, "INSERT INTO auditoria (usuario_id, accion, ip, fecha) VALUES (%s, %s, %s, %s)", [
+            (rnd.randint(1, 1 + profesores), "Consultó todas las notas", "127.0.0.1",
+             inicio + timedelta(seconds=rnd.randint(0, 3 * 10 ** 7)))
+            for _ in range(auditoria)
+        ])
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+    reconstruir()
+    return {"profesores": profesores, "estudiantes": estudiantes, "notas": len(notas), "auditoria": auditoria}
+
+
+def contar_filas():
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Error de conexión con la base de datos")
+    cursor = conn.cursor()
+    try:
+        cuentas = {}
+        for tabla in ("usuarios", "estudiantes", "notas", "auditoria"):
+            cursor.execute(f"SELECT COUNT(*) FROM {tabla}")
+            cuentas[tabla] = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM usuarios WHERE rol = 'profesor'")
+        cuentas["profesores"] = cursor.fetchone()[0]
+        cursor.execute("SELECT MIN(id), MAX(id) FROM notas")
+        cuentas["rango_notas"] = cursor.fetchone()
+        cursor.execute("SELECT MIN(id), MAX(id) FROM estudiantes")
+        cuentas["rango_estudiantes"] = cursor.fetchone()
+        return cuentas
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# ---------------------- Escenarios ----------------------
+def _nota_aleatoria(rnd, datos):
+    return {
+        "estudiante_id": rnd.randint(*datos["rango_estudiantes"]),
+        "asignatura": rnd.choice(ASIGNATURAS),
+        "calificacion": round(rnd.uniform(0, 5), 1),
+        "periodo": rnd.choice(PERIODOS),
+    }
+
+
+def construir_escenarios(datos, tokens):
+    """Cada escenario es (nombre, función async que recibe (cliente, rnd) y hace una petición)."""
+    admin = {"Authorization": f"Bearer {tokens['admin']}"}
+    profesor = {"Authorization": f"Bearer {tokens['profesor']}"}
+    n_profesores = max(datos["profesores"], 1)
+
+    async def login(cliente, rnd):
+        return await cliente.post("/api/auth/login", json={
+            "email": f"profesor{rnd.randrange(n_profesores)}@bench.example.com", "password": CLAVE_SEMBRADA,
+        })
+
+    async def listar_notas(cliente, rnd):
+        params = {"limit": 50}
+        if rnd.random() < 0.5:
+            params["asignatura"] = rnd.choice(ASIGNATURAS)
+        return await cliente.get("/notas/", params=params, headers=profesor)
+
+    async def listar_estudiantes(cliente, rnd):
+        return await cliente.get("/api/estudiantes/", headers=profesor)
+
+    async def crear_nota(cliente, rnd):
+        return await cliente.post("/notas/", json=_nota_aleatoria(rnd, datos), headers=profesor)
+
+    async def actualizar_nota(cliente, rnd):
+        nota_id = rnd.randint(*datos["rango_notas"])
+        return await cliente.put(f"/notas/{nota_id}", json=_nota_aleatoria(rnd, datos), headers=admin)
+
+    async def auditoria(cliente, rnd):
+        return await cliente.get("/auditoria/", headers=admin)
+
+    return [
+        ("login", login),
+        ("listar_notas", listar_notas),
+        ("listar_estudiantes", listar_estudiantes),
+        ("crear_nota", crear_nota),
+        ("actualizar_nota", actualizar_nota),
+        ("auditoria", auditoria),
+    ]
+
+
+def percentil(valores_ordenados, p):
+    if not valores_ordenados:
+        return 0.0
+    posicion = (len(valores_ordenados) - 1) * p / 100
+    abajo = int(posicion)
+    arriba = min(abajo + 1, len(valores_ordenados) - 1)
+    return valores_ordenados[abajo] + (valores_ordenados[arriba] - valores_ordenados[abajo]) * (posicion - abajo)
+
+
+def _consultas_totales():
+    return metricas.consultas_por_peticion.total()
+
+
+async def correr_escenario(cliente, nombre, peticion, concurrencia, peticiones, semilla, sin_cache):
+    latencias = []
+    errores = {}
+    pendientes = iter(range(peticiones))
+
+    async def trabajador(indice):
+        rnd = random.Random(f"{semilla}-{nombre}-{concurrencia}-{indice}")
+        for _ in pendientes:
+            if sin_cache:
+                cache.invalidar("notas")
+                cache.invalidar("estudiantes")
+            inicio = time.perf_counter()
+            try:
+                respuesta = await peticion(cliente, rnd)
+                estado = respuesta.status_code
+            except Exception as e:
+                estado = type(e).__name__
+            latencias.append(time.perf_counter() - inicio)
+            if estado != 200:
+                errores[str(estado)] = errores.get(str(estado), 0) + 1
+
+    suma_antes, cantidad_antes = _consultas_totales()
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabajador(i) for i in range(concurrencia)))
+    duracion = time.perf_counter() - inicio
+    suma_despues, cantidad_despues = _consultas_totales()
+
+    latencias.sort()
+    atendidas = cantidad_despues - cantidad_antes
+    return {
+        "escenario": nombre,
+        "concurrencia": concurrencia,
+        "peticiones": len(latencias),
+        "errores": errores,
+        "duracion_s": round(duracion, 3),
+        "throughput_rps": round(len(latencias) / duracion, 2) if duracion else 0.0,
+        "p50_ms": round(percentil(latencias, 50) * 1000, 2),
+        "p95_ms": round(percentil(latencias, 95) * 1000, 2),
+        "p99_ms": round(percentil(latencias, 99) * 1000, 2),
+        "max_ms": round(latencias[-1] * 1000, 2) if latencias else 0.0,
+        "consultas_por_peticion": round((suma_despues - suma_antes) / atendidas, 2) if atendidas else 0.0,
+    }
+
+
+async def _token(cliente, email):
+    respuesta = await cliente.post("/api/auth/login", json={"email": email, "password": CLAVE_SEMBRADA})
+    respuesta.raise_for_status()
+    return respuesta.json()["access_token"]
+
+
+async def ejecutar(args, datos):
+    from app.main import app, iniciar_servicios, cerrar_conexiones
+
+    iniciar_servicios()
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # una línea por petición taparía el reporte
+    try:
+        transporte = httpx.ASGITransport(app=app, client=("127.0.0.1", 50000))
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=60) as cliente:
+            tokens = {
+                "admin": await _token(cliente, "admin@bench.example.com"),
+                "profesor": await _token(cliente, "profesor0@bench.example.com"),
+            }
+            escenarios = construir_escenarios(datos, tokens)
+            if args.escenarios:
+                escenarios = [e for e in escenarios if e[0] in args.escenarios]
+
+            resultados = []
+            for concurrencia in args.concurrencia:
+                for nombre, peticion in escenarios:
+                    # Calentamiento: llena el pool, la caché de tokens y los planes del servidor
+                    await correr_escenario(cliente, nombre, peticion, concurrencia, min(concurrencia * 2, 20), "calentamiento", args.sin_cache)
+                    resultado = await correr_escenario(
+                        cliente, nombre, peticion, concurrencia, args.peticiones, args.semilla, args.sin_cache
+                    )
+                    resultados.append(resultado)
+                    _imprimir(resultado)
+            return resultados
+    finally:
+        cerrar_conexiones()
+
+
+# ---------------------- Reporte ----------------------
+def _imprimir(r):
+    errores = f" errores={r['errores']}" if r["errores"] else ""
+    print(
+        f"{r['escenario']:<20} c={r['concurrencia']:<4} {r['throughput_rps']:>9.1f} req/s  "
+        f"p50={r['p50_ms']:>8.2f}ms p95={r['p95_ms']:>8.2f}ms p99={r['p99_ms']:>8.2f}ms  "
+        f"sql/pet={r['consultas_por_peticion']:.2f}{errores}"
+    )
+
+
+def _commit_actual():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def comparar(anterior_path, resultados, tolerancia):
+    """Devuelve la lista de regresiones de p95 respecto a un JSON anterior."""
+    with open(anterior_path, encoding="utf-8") as f:
+        anterior = {(r["escenario"], r["concurrencia"]): r for r in json.load(f)["resultados"]}
+    regresiones = []
+    for r in resultados:
+        base = anterior.get((r["escenario"], r["concurrencia"]))
+        if not base or not base["p95_ms"]:
+            continue
+        cambio = (r["p95_ms"] - base["p95_ms"]) / base["p95_ms"]
+        marca = "❌" if cambio > tolerancia else "✅"
+        print(f"{marca} {r['escenario']:<20} c={r['concurrencia']:<4} p95 {base['p95_ms']:.2f} -> {r['p95_ms']:.2f} ms ({cambio:+.1%})"
+              f"  sql/pet {base['consultas_por_peticion']:.2f} -> {r['consultas_por_peticion']:.2f}")
+        if cambio > tolerancia or r["consultas_por_peticion"] > base["consultas_por_peticion"]:
+            regresiones.append(r["escenario"])
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de carga del Sistema de Notas")
+    parser.add_argument("--profesores", type=int, default=20)
+    parser.add_argument("--estudiantes", type=int, default=1000)
+    parser.add_argument("--notas-por-estudiante", type=int, default=10)
+    parser.add_argument("--auditoria", type=int, default=20000, help="filas de auditoría sembradas")
+    parser.add_argument("--concurrencia", type=lambda s: [int(x) for x in s.split(",")], default=[1, 8, 32])
+    parser.add_argument("--peticiones", type=int, default=300, help="peticiones por escenario y nivel")
+    parser.add_argument("--escenarios", type=lambda s: s.split(","), default=None)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--sin-sembrar", action="store_true", help="reutiliza los datos ya sembrados")
+    parser.add_argument("--sin-cache", action="store_true", help="invalida la caché de listados antes de cada petición")
+    parser.add_argument("--salida", default="benchmark.json")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="empeoramiento de p95 permitido (0.2 = 20%%)")
+    parser.add_argument("--permitir-remoto", action="store_true")
+    args = parser.parse_args(argv)
+
+    host = database.DB_CONFIG["host"]
+    if host not in HOSTS_LOCALES and not args.permitir_remoto:
+        print(f"❌ DB_HOST={host} no es local. La siembra borra tablas: usa una base local o --permitir-remoto.")
+        return 2
+
+    if not args.sin_sembrar:
+        inicio = time.perf_counter()
+        sembrado = sembrar(args.profesores, args.estudiantes, args.notas_por_estudiante, args.auditoria, args.semilla)
+        print(f"✅ Base sembrada en {time.perf_counter() - inicio:.1f}s: {sembrado}")
+    datos = contar_filas()
+
+    resultados = asyncio.run(ejecutar(args, datos))
+
+    informe = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit_actual(),
+        "python": platform.python_version(),
+        "configuracion": {k: v for k, v in vars(args).items() if k not in ("comparar", "salida")},
+        "datos": {k: v for k, v in datos.items() if not k.startswith("rango")},
+        "pool": {"min": database.POOL_MIN_SIZE, "max": database.POOL_MAX_SIZE},
+        "resultados": resultados,
+    }
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(informe, f, indent=2, ensure_ascii=False)
+    print(f"✅ Resultados guardados en {args.salida}")
+
+    if args.comparar:
+        regresiones = comparar(args.comparar, resultados, args.tolerancia)
+        if regresiones:
+            print(f"❌ Regresiones en: {', '.join(sorted(set(regresiones)))}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""
+Dobles de conexión y fixtures compartidos por las pruebas.
+
+Las pruebas no necesitan MySQL: instalan en el pool de app.database conexiones
+falsas (o, para los planes de consulta, conexiones reales que registran cada
+sentencia) y lo cierran al terminar.
+"""
+import time
+
+import pytest
+from starlette.requests import Request
+
+from app import database
+from app.security import get_password_hash
+from app.utils.auditoria_logger import detener_auditoria
+
+HASH_PRUEBA = get_password_hash("clave")
+
+
+# ---------------------- Conexiones falsas ----------------------
+class CursorFalso:
+    """Cursor sin base: cada execute() tarda `demora` y fetchone() devuelve una fila fija (o None si `vacio`)."""
+
+    def __init__(self, dictionary=False, demora=0.0, vacio=False, **kwargs):
+        self.dictionary = dictionary
+        self.demora = demora
+        self.vacio = vacio
+        self.rowcount = 1
+        self.lastrowid = 1
+
+    def execute(self, sql, params=None):
+        if self.demora:
+            time.sleep(self.demora)
+
+    def executemany(self, sql, seq):
+        if self.demora:
+            time.sleep(self.demora)
+
+    def fetchone(self):
+        if self.vacio:
+            return None
+        if self.dictionary:
+            return {"id": 1, "email": "a@test.com", "rol": "profesor", "nombre": "Profe",
+                    "password_hash": HASH_PRUEBA, "estudiante_id": 1, "asignatura": "Matemáticas",
+                    "periodo": "2024-1", "calificacion": 4.0, "creado_por": 1}
+        return (1, "Matemáticas", "2024-1", 4.0)
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+
+class ConexionFalsa:
+    """Conexión sin base; `nombre` identifica de qué pool salió (primario o réplica)."""
+    in_transaction = False
+
+    def __init__(self, nombre="primario", demora=0.0, vacia=False, crear_cursor=None):
+        self.nombre = nombre
+        self.demora = demora
+        self.vacia = vacia
+        self._crear_cursor = crear_cursor
+
+    def cursor(self, *args, **kwargs):
+        if self._crear_cursor is not None:
+            return self._crear_cursor(self, **kwargs)
+        return CursorFalso(demora=self.demora, vacio=self.vacia, **kwargs)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        pass
+
+
+def fabrica(nombre="primario", caida=None, **opciones):
+    """Fábrica de ConexionFalsa para init_pool/init_replicas; falla mientras caida["valor"] sea verdadero."""
+    def crear():
+        if caida is not None and caida["valor"]:
+            raise database.Error(f"{nombre} no responde")
+        return ConexionFalsa(nombre, **opciones)
+    return crear
+
+
+# ---------------------- Captura de sentencias reales ----------------------
+class CursorCapturado:
+    def __init__(self, cursor, capturadas):
+        self._cursor = cursor
+        self._capturadas = capturadas
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        self._capturadas.append((self._capturadas.caso, operation, params))
+        return self._cursor.execute(operation, params, *args, **kwargs)
+
+
+class ConexionCapturada:
+    """Envuelve una conexión real y anota (caso, sql, params) de cada sentencia en `capturadas`."""
+
+    def __init__(self, raw, capturadas):
+        self._raw = raw
+        self._capturadas = capturadas
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        return CursorCapturado(self._raw.cursor(*args, **kwargs), self._capturadas)
+
+
+class Capturadas(list):
+    """Sentencias capturadas; `caso` es el nombre del caso que se está ejecutando."""
+    caso = None
+
+
+# ---------------------- Peticiones ----------------------
+class RespuestaFalsa:
+    def __init__(self):
+        self.headers = {}
+
+
+def peticion(path="/"):
+    return Request({
+        "type": "http", "method": "GET", "path": path, "query_string": b"",
+        "headers": [], "client": ("127.0.0.1", 50000),
+    })
+
+
+# ---------------------- Fixtures ----------------------
+@pytest.fixture
+def instalar_pool():
+    """Instala un pool de app.database con la fábrica dada y lo cierra (con la auditoría) al terminar."""
+    def instalar(factory=None, **opciones):
+        opciones.setdefault("min_size", 0)
+        database.init_pool(factory=factory or fabrica(), **opciones)
+        database.init_replicas([])
+    yield instalar
+    # El escritor de auditoría vacía su cola con este pool antes de cerrarlo
+    detener_auditoria()
+    database.close_pool()
@@ -0,0 +1,32 @@
+"""
+Las consultas lentas de varios handlers async se solapan: N llamadas concurrentes a
+get_usuario (una consulta, sin caché) tardan lo que ceil(N / hilos) consultas, no N.
+"""
+import asyncio
+import math
+import time
+
+from app import database
+from app.routers.usuarios import get_usuario
+from conftest import fabrica
+
+DEMORA = 0.2
+
+
+async def medir(n):
+    usuario = {"user_id": 1, "rol": "admin", "sub": "admin@test.com"}
+    inicio = time.perf_counter()
+    await asyncio.gather(*(get_usuario(1, current_user=usuario) for _ in range(n)))
+    return time.perf_counter() - inicio
+
+
+def test_consultas_concurrentes_se_solapan(instalar_pool):
+    n = database.DB_EXECUTOR_WORKERS
+    instalar_pool(fabrica(demora=DEMORA), max_size=max(n, database.POOL_MAX_SIZE) * 2)
+
+    una = asyncio.run(medir(1))
+    total = asyncio.run(medir(n))
+
+    # Con el executor acotado se esperan ceil(n / hilos) rondas; en serie serían n
+    rondas = math.ceil(n / database.DB_EXECUTOR_WORKERS)
+    assert total <= una * rondas * 1.5, f"1 consulta: {una:.3f}s | {n} concurrentes: {total:.3f}s"
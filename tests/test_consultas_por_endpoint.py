@@ -0,0 +1,58 @@
+"""
+Sentencias SQL (incluido COMMIT) que ejecuta cada endpoint, contra su presupuesto,
+para detectar regresiones de round trips. Usa conexiones falsas.
+"""
+import asyncio
+
+import pytest
+
+from app.database import contar_consultas
+from app.models import LoginRequest, NotaCreate, UserCreate
+from app.routers import auth, estudiantes, notas, usuarios
+from app.utils.cache import cache
+from app.utils.periodos import iniciar_periodos
+from app.utils.ranking import indice_ranking
+from conftest import RespuestaFalsa, fabrica, peticion
+
+ADMIN = {"user_id": 99, "rol": "admin", "sub": "admin@test.com"}
+NOTA = NotaCreate(estudiante_id=1, asignatura="Matemáticas", calificacion=4.5, periodo="2024-1")
+
+# Sentencias máximas por endpoint (incluye COMMIT)
+CASOS = {
+    "login": (1, lambda: auth.login(LoginRequest(email="a@test.com", password="clave"))),
+    "register (profesor)": (3, lambda: auth.register(
+        UserCreate(email="p@test.com", password="x", rol="profesor", nombre="Profe"))),
+    "register (estudiante)": (4, lambda: auth.register(
+        UserCreate(email="e@test.com", password="x", rol="estudiante", nombre="Est"))),
+    # Con la caché en memoria el listado lee además la firma de periodos_cerrados
+    "get_notas": (2, lambda: notas.get_notas(
+        request=peticion("/notas/"), response=RespuestaFalsa(), cursor=None, limit=50, estudiante_id=None,
+        asignatura=None, periodo=None, calificacion_min=None, calificacion_max=None, current_user=ADMIN)),
+    "crear_nota": (4, lambda: notas.crear_nota(NOTA, peticion(), current_user=ADMIN)),
+    "actualizar_nota": (6, lambda: notas.actualizar_nota(1, NOTA, peticion(), current_user=ADMIN)),
+    "eliminar_nota": (5, lambda: notas.eliminar_nota(1, peticion(), current_user=ADMIN)),
+    "ranking": (1, lambda: notas.ranking_notas(asignatura="Matemáticas", periodo="2024-1", estudiante_id=2,
+                                               limit=10, current_user=ADMIN)),
+    "get_usuarios": (1, lambda: usuarios.get_usuarios(peticion("/usuarios/"), RespuestaFalsa(), current_user=ADMIN)),
+    "delete_usuario": (3, lambda: usuarios.delete_usuario(2, peticion(), current_user=ADMIN)),
+    "listar_estudiantes": (1, lambda: estudiantes.listar_estudiantes(peticion("/api/estudiantes/"), RespuestaFalsa())),
+}
+
+# Casos que necesitan que la base no encuentre filas (el email a registrar no existe)
+SIN_FILAS = {"register (profesor)", "register (estudiante)"}
+
+
+@pytest.mark.parametrize("nombre", list(CASOS))
+def test_sentencias_dentro_del_presupuesto(instalar_pool, nombre):
+    instalar_pool(fabrica(vacia=nombre in SIN_FILAS), max_size=4)
+    iniciar_periodos()  # como al arrancar la API: el registro no se lee dentro de una petición
+    # Índice de ranking ya construido, como tras el arranque (los nombres son la única consulta)
+    indice_ranking.construir([(1, "Matemáticas", "2024-1", 8.5, 2), (2, "Matemáticas", "2024-1", 3.0, 1)],
+                             cache.version("ranking"))
+    for grupo in ("notas", "usuarios", "estudiantes"):
+        cache.invalidar(grupo)
+
+    limite, llamar = CASOS[nombre]
+    with contar_consultas() as contador:
+        asyncio.run(llamar())
+    assert contador.total <= limite, "\n".join(contador.sentencias)
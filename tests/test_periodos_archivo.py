@@ -0,0 +1,130 @@
+"""
+Formato columnar de los periodos cerrados, sin base de datos: ida y vuelta, columnas
+sin copia, filtros, páginas keyset y estadísticas contra recorrer las filas en Python.
+"""
+import heapq
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import islice
+
+import numpy as np
+import pytest
+
+from app.utils.estadisticas import calcular_estadisticas, unir_columnas
+from app.utils.periodos import ArchivoPeriodo, escribir_archivo
+
+NOTAS = 20000
+ASIGNATURAS = ["Matemáticas", "Física", "Química", "Historia", "Inglés", "Biología"]
+FILTROS = [{}, {"asignatura": "Física"}, {"asignatura": "No existe"}, {"estudiante_id": 42},
+           {"calificacion_min": 3.0}, {"calificacion_max": 2.995}, {"asignatura": "Química", "calificacion_min": 4.5}]
+
+
+def generar(n, semilla):
+    rnd = random.Random(semilla)
+    inicio = datetime(2024, 2, 1, 8, 0, 0)
+    filas = []
+    for i in range(1, n + 1):
+        # Muchas notas con el mismo segundo: el desempate por id tiene que funcionar
+        creado_en = inicio + timedelta(seconds=rnd.randrange(0, n // 3 + 1))
+        calificacion = Decimal(rnd.randrange(0, 501)) / 100
+        filas.append((i, rnd.randrange(1, 500), rnd.choice(ASIGNATURAS), calificacion, rnd.randrange(1, 5), creado_en))
+    filas.sort(key=lambda f: (f[5], f[0]))
+    return filas
+
+
+def como_nota(fila, periodo):
+    return {"id": fila[0], "estudiante_id": fila[1], "asignatura": fila[2], "calificacion": float(fila[3]),
+            "periodo": periodo, "creado_por": fila[4], "creado_en": fila[5]}
+
+
+def cumple(nota, filtros):
+    return ((filtros.get("estudiante_id") is None or nota["estudiante_id"] == filtros["estudiante_id"])
+            and (not filtros.get("asignatura") or nota["asignatura"] == filtros["asignatura"])
+            and (filtros.get("calificacion_min") is None or nota["calificacion"] >= filtros["calificacion_min"])
+            and (filtros.get("calificacion_max") is None or nota["calificacion"] <= filtros["calificacion_max"]))
+
+
+def pagina_esperada(notas, filtros, despues_de, limite):
+    orden = sorted(notas, key=lambda n: (n["creado_en"], n["id"]), reverse=True)
+    if despues_de is not None:
+        orden = [n for n in orden if (n["creado_en"], n["id"]) < despues_de]
+    return [n for n in orden if cumple(n, filtros)][:limite]
+
+
+@pytest.fixture(scope="module")
+def filas():
+    return generar(NOTAS, 7)
+
+
+@pytest.fixture(scope="module")
+def notas(filas):
+    return [como_nota(f, "2024-1") for f in filas]
+
+
+@pytest.fixture
+def escribir(tmp_path):
+    """Escribe las filas en un archivo columnar y lo abre."""
+    def crear(filas, nombre="notas_2024-1.col"):
+        ruta = str(tmp_path / nombre)
+        sha = escribir_archivo(ruta, "2024-1", filas)
+        return ArchivoPeriodo(ruta), sha
+    return crear
+
+
+def test_ida_y_vuelta(escribir, filas, notas):
+    archivo, sha = escribir(filas)
+    assert archivo.sha256 == sha
+    assert archivo.bytes <= NOTAS * 24 + 4096  # 24 bytes por nota más cabecera y alineación
+    assert [archivo.fila(i) for i in range(archivo.filas)] == notas
+
+
+def test_columnas_sin_copia_y_de_solo_lectura(escribir, filas):
+    archivo, _ = escribir(filas)
+    for columna in (archivo.id, archivo.estudiante_id, archivo.calificacion, archivo.creado_en):
+        assert not columna.flags.owndata and not columna.flags.writeable
+
+
+@pytest.mark.parametrize("filtros", FILTROS, ids=str)
+def test_filtros_y_paginas_keyset(escribir, filas, notas, filtros):
+    archivo, _ = escribir(filas)
+    despues_de = None
+    for _ in range(3):
+        obtenida = archivo.pagina(filtros, despues_de, 50)
+        assert obtenida == pagina_esperada(notas, filtros, despues_de, 50)
+        if not obtenida:
+            break
+        despues_de = (obtenida[-1]["creado_en"], obtenida[-1]["id"])
+    # Cursor arbitrario (fecha con varias notas en el mismo segundo)
+    nota = random.Random(11).choice(notas)
+    cursor = (nota["creado_en"], nota["id"])
+    assert archivo.pagina(filtros, cursor, 50) == pagina_esperada(notas, filtros, cursor, 50)
+
+
+def test_filas_filtradas_en_orden_de_id(escribir, filas, notas):
+    archivo, _ = escribir(filas)
+    filtros = {"asignatura": "Historia"}
+    esperadas = sorted([n for n in notas if cumple(n, filtros)], key=lambda n: n["id"])
+    assert list(archivo.filas_filtradas(filtros)) == esperadas
+
+
+def test_mezcla_de_tabla_y_archivo(escribir, filas, notas):
+    # La tabla aporta las notas más nuevas; el archivo, el resto
+    corte = len(notas) // 2
+    tabla, archivada = notas[corte:], notas[:corte]
+    parcial, _ = escribir(filas[:corte], "parcial.col")
+
+    despues_de, mezcladas = None, []
+    for _ in range(4):
+        pagina_tabla = pagina_esperada(tabla, {}, despues_de, 101)
+        pagina = list(islice(heapq.merge(pagina_tabla, parcial.pagina({}, despues_de, 101),
+                                         key=lambda n: (n["creado_en"], n["id"]), reverse=True), 101))[:100]
+        mezcladas.extend(pagina)
+        despues_de = (pagina[-1]["creado_en"], pagina[-1]["id"])
+    assert mezcladas == pagina_esperada(tabla + archivada, {}, None, 400)
+
+    columnas = unir_columnas(parcial.columnas({}), (
+        [n["asignatura"] for n in tabla], [n["periodo"] for n in tabla], [n["calificacion"] for n in tabla]))
+    todas = ([n["asignatura"] for n in notas], [n["periodo"] for n in notas],
+             np.asarray([n["calificacion"] for n in notas]))
+    assert calcular_estadisticas(*columnas) == calcular_estadisticas(*todas)
@@ -0,0 +1,168 @@
+"""
+Planes de ejecución de las consultas que emiten los routers.
+
+Siembra una base MySQL local (como scripts.benchmark), ejecuta los handlers con
+conexiones reales que registran cada sentencia con sus parámetros y corre EXPLAIN
+sobre cada SELECT/UPDATE/DELETE: falla si alguna recorre completa una tabla grande
+(type=ALL) o necesita filesort / tabla temporal sobre más de PLANES_UMBRAL filas.
+
+Los recorridos completos intencionales se declaran en PERMITIDOS con su motivo.
+La siembra BORRA las tablas, así que solo corre a pedido y contra localhost:
+    DB_HOST=127.0.0.1 DB_USER=root DB_PASSWORD=bench PLANES_CONSULTAS=1 python -m pytest tests/test_planes_consultas.py
+"""
+import asyncio
+import os
+from datetime import datetime
+
+import pytest
+
+from app import database
+from app.database import get_db_connection, run_db
+from app.models import LoginRequest, NotaCreate
+from app.utils.cache import cache
+from conftest import Capturadas, ConexionCapturada, RespuestaFalsa, peticion
+from scripts.benchmark import CLAVE_SEMBRADA, HOSTS_LOCALES, contar_filas, sembrar
+
+PLANES_UMBRAL = int(os.getenv("PLANES_UMBRAL", "1000"))  # filas estimadas a partir de las que una tabla es grande
+
+pytestmark = pytest.mark.skipif(
+    os.getenv("PLANES_CONSULTAS") != "1" or database.DB_CONFIG["host"] not in HOSTS_LOCALES,
+    reason="necesita PLANES_CONSULTAS=1 y una base MySQL local (la siembra borra las tablas)",
+)
+
+# (caso, tabla): motivo. Recorridos completos que hoy son parte del diseño.
+PERMITIDOS = {
+    ("get_usuarios", "usuarios"): "listado completo de usuarios sin filtros ni paginación",
+}
+
+VERBOS_EXPLICABLES = ("SELECT", "UPDATE", "DELETE")
+
+
+def construir_casos(datos):
+    from app.routers import auditoria, auth, estudiantes, notas, usuarios
+    from app.utils import ranking
+
+    admin = {"user_id": 1, "rol": "admin", "sub": "admin@bench.example.com"}
+    primer_estudiante = datos["rango_estudiantes"][0]
+    primera_nota, ultima_nota = datos["rango_notas"]
+    nota = NotaCreate(estudiante_id=primer_estudiante, asignatura="Matemáticas", calificacion=4.0, periodo="2024-1")
+    filtros_notas = {"estudiante_id": None, "asignatura": None, "periodo": None,
+                     "calificacion_min": None, "calificacion_max": None}
+    filtros_auditoria = {"usuario_id": None, "accion": None, "ip": None, "desde": None, "hasta": None}
+
+    def listar_notas(cursor=None, **filtros):
+        return notas.get_notas(request=peticion("/notas/"), response=RespuestaFalsa(), cursor=cursor, limit=50,
+                               **{**filtros_notas, **filtros}, current_user=admin)
+
+    def listar_auditoria(cursor=None, **filtros):
+        return auditoria.obtener_auditoria(request=peticion("/auditoria/"), response=RespuestaFalsa(), cursor=cursor,
+                                           limit=50, **{**filtros_auditoria, **filtros}, current_user=admin)
+
+    async def segunda_pagina(listar):
+        primera = await listar()
+        return await listar(cursor=primera.headers.get("X-Next-Cursor"))
+
+    return [
+        ("login", lambda: auth.login(LoginRequest(email="admin@bench.example.com", password=CLAVE_SEMBRADA))),
+        ("get_notas", listar_notas),
+        ("get_notas (página 2)", lambda: segunda_pagina(listar_notas)),
+        ("get_notas (estudiante)", lambda: listar_notas(estudiante_id=primer_estudiante)),
+        ("get_notas (asignatura)", lambda: listar_notas(asignatura="Matemáticas")),
+        ("get_notas (asignatura y periodo)", lambda: listar_notas(asignatura="Matemáticas", periodo="2024-1")),
+        ("get_notas (periodo)", lambda: listar_notas(periodo="2024-1")),
+        ("estadisticas", lambda: notas.estadisticas_notas(asignatura=None, periodo=None, current_user=admin)),
+        ("estadisticas (asignatura)", lambda: notas.estadisticas_notas(asignatura="Física", periodo=None, current_user=admin)),
+        ("crear_nota", lambda: notas.crear_nota(nota, peticion(), current_user=admin)),
+        ("actualizar_nota", lambda: notas.actualizar_nota(primera_nota, nota, peticion(), current_user=admin)),
+        ("eliminar_nota", lambda: notas.eliminar_nota(ultima_nota, peticion(), current_user=admin)),
+        ("ranking", lambda: notas.ranking_notas(asignatura="Matemáticas", periodo="2024-1",
+                                                estudiante_id=primer_estudiante, limit=10, current_user=admin)),
+        # Respaldo SQL del ranking (cuando el índice en memoria no está vigente)
+        ("ranking (SQL)", lambda: run_db(ranking._ranking_sql, "Matemáticas", "2024-1")),
+        ("listar_estudiantes", lambda: estudiantes.listar_estudiantes(peticion("/api/estudiantes/"), RespuestaFalsa())),
+        ("promedios_estudiante", lambda: estudiantes.promedios_estudiante(
+            primer_estudiante, asignatura=None, periodo=None, current_user=admin)),
+        ("get_usuarios", lambda: usuarios.get_usuarios(peticion("/usuarios/"), RespuestaFalsa(), current_user=admin)),
+        ("get_usuario", lambda: usuarios.get_usuario(1, current_user=admin)),
+        # Respaldo SQL de la búsqueda (el índice en memoria no toca la base)
+        ("buscar_usuarios (SQL)", lambda: run_db(usuarios._buscar_usuarios_sql, "Estudiante 1", None, 10)),
+        ("buscar_usuarios (SQL, rol)", lambda: run_db(usuarios._buscar_usuarios_sql, "prof", "profesor", 10)),
+        ("buscar_estudiantes (SQL)", lambda: run_db(estudiantes._buscar_estudiantes_sql, "EST0001", 10)),
+        ("obtener_auditoria", listar_auditoria),
+        ("obtener_auditoria (página 2)", lambda: segunda_pagina(listar_auditoria)),
+        ("obtener_auditoria (usuario)", lambda: listar_auditoria(usuario_id=2)),
+        ("obtener_auditoria (ip)", lambda: listar_auditoria(ip="127.0.0.1")),
+        ("obtener_auditoria (rango)", lambda: listar_auditoria(desde=datetime(2024, 3, 1), hasta=datetime(2024, 4, 1))),
+    ]
+
+
+async def capturar(casos, capturadas):
+    for nombre, llamar in casos:
+        capturadas.caso = nombre
+        for grupo in ("notas", "estadisticas", "usuarios", "estudiantes"):
+            cache.invalidar(grupo)
+        await llamar()
+    capturadas.caso = None
+
+
+def _explicable(sql):
+    return sql.lstrip().split(None, 1)[0].upper() in VERBOS_EXPLICABLES and "information_schema" not in sql
+
+
+def revisar_planes(capturadas, umbral):
+    """[(caso, sql, filas de EXPLAIN, problemas)] de cada sentencia distinta capturada."""
+    vistas = set()
+    revisadas = []
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        for caso, sql, params in list(capturadas):
+            if caso is None or not _explicable(sql):
+                continue
+            clave = (caso, " ".join(sql.split()))
+            if clave in vistas:
+                continue
+            vistas.add(clave)
+            cursor.execute(f"EXPLAIN {sql}", params)
+            plan = cursor.fetchall()
+            problemas = []
+            for fila in plan:
+                tabla = fila.get("table") or ""
+                filas = fila.get("rows") or 0
+                extra = fila.get("Extra") or ""
+                if tabla.startswith("<") or filas < umbral or (caso, tabla) in PERMITIDOS:
+                    continue
+                if fila.get("type") == "ALL":
+                    problemas.append(f"{tabla}: recorre la tabla completa (~{filas} filas)")
+                if "Using filesort" in extra or "Using temporary" in extra:
+                    problemas.append(f"{tabla}: {extra} sobre ~{filas} filas")
+            revisadas.append((caso, sql, plan, problemas))
+    finally:
+        cursor.close()
+        conn.close()
+    return revisadas
+
+
+def test_planes_sin_recorridos_costosos(instalar_pool):
+    sembrar(20, 2000, 10, 20000, 42)
+    datos = contar_filas()
+
+    # Estadísticas frescas para que el optimizador elija como lo haría en producción
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("ANALYZE TABLE usuarios, estudiantes, notas, auditoria, promedios_estudiante")
+        cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+    capturadas = Capturadas()
+    instalar_pool(lambda: ConexionCapturada(database._crear_conexion_mysql(), capturadas))
+    asyncio.run(capturar(construir_casos(datos), capturadas))
+    revisadas = revisar_planes(capturadas, PLANES_UMBRAL)
+
+    assert revisadas
+    costosas = [f"{caso}: {' '.join(sql.split())[:70]} → {'; '.join(problemas)}"
+                for caso, sql, _, problemas in revisadas if problemas]
+    assert not costosas, "\n".join(costosas)
@@ -0,0 +1,100 @@
+"""
+Índice de ranking sin base de datos: redondeo como ROUND(AVG(...), 2) de MySQL y,
+tras miles de cambios incrementales, posición, percentil y los N mejores iguales
+a ordenar las notas desde cero.
+"""
+import random
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+import pytest
+
+from app.utils.ranking import IndiceRanking, centesimas
+
+OPERACIONES = 5000
+ASIGNATURAS = ["Matemáticas", "Física", "Química"]
+PERIODOS = ["2024-1", "2024-2"]
+
+
+def ranking_esperado(notas, asignatura, periodo):
+    """[(posición, estudiante_id, promedio, percentil)] ordenando los promedios desde cero."""
+    por_estudiante = defaultdict(list)
+    for estudiante_id, asig, per, calificacion in notas.values():
+        if (asig, per) == (asignatura, periodo):
+            por_estudiante[estudiante_id].append(calificacion)
+    promedios = {e: (sum(c) / len(c)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+                 for e, c in por_estudiante.items()}
+    orden = sorted(promedios.items(), key=lambda par: (-par[1], par[0]))
+    total = len(orden)
+    return [(1 + sum(p > promedio for p in promedios.values()), e, float(promedio),
+             round(100 * sum(p <= promedio for p in promedios.values()) / total, 1)) for e, promedio in orden]
+
+
+def como_tuplas(filas):
+    return [(f["posicion"], f["estudiante_id"], f["promedio"], f["percentil"]) for f in filas]
+
+
+@pytest.fixture(scope="module")
+def incremental():
+    """(índice, notas): el índice tras OPERACIONES altas, cambios y bajas aplicados uno a uno."""
+    rnd = random.Random(3)
+    indice = IndiceRanking()
+    indice.construir([])
+    notas, siguiente = {}, 1
+    for _ in range(OPERACIONES):
+        operacion = rnd.random()
+        # Calificaciones en décimas: muchos empates
+        calificacion = Decimal(rnd.randrange(0, 51)) / 10
+        if operacion < 0.6 or not notas:
+            nota = (rnd.randrange(1, 300), rnd.choice(ASIGNATURAS), rnd.choice(PERIODOS), calificacion)
+            notas[siguiente] = nota
+            siguiente += 1
+            indice.aplicar([(nota[0], nota[1], nota[2], int(calificacion * 100), 1)])
+        elif operacion < 0.85:
+            nota_id = rnd.choice(list(notas))
+            anterior = notas[nota_id]
+            nueva = (anterior[0], rnd.choice(ASIGNATURAS), anterior[2], calificacion)
+            notas[nota_id] = nueva
+            indice.aplicar([(anterior[0], anterior[1], anterior[2], -int(anterior[3] * 100), -1),
+                            (nueva[0], nueva[1], nueva[2], int(calificacion * 100), 1)])
+        else:
+            anterior = notas.pop(rnd.choice(list(notas)))
+            indice.aplicar([(anterior[0], anterior[1], anterior[2], -int(anterior[3] * 100), -1)])
+    return indice, notas
+
+
+def test_redondeo_del_promedio_en_centesimas():
+    rnd = random.Random(3)
+    for _ in range(20000):
+        conteo = rnd.randrange(1, 40)
+        suma = sum(rnd.randrange(0, 501) for _ in range(conteo))
+        assert centesimas(suma, conteo) == (Decimal(suma) / conteo).quantize(Decimal(1), rounding=ROUND_HALF_UP)
+
+
+@pytest.mark.parametrize("asignatura", ASIGNATURAS)
+@pytest.mark.parametrize("periodo", PERIODOS)
+def test_mejores_posicion_y_percentil(incremental, asignatura, periodo):
+    indice, notas = incremental
+    esperado = ranking_esperado(notas, asignatura, periodo)
+    consulta = indice.consultar(asignatura, periodo, limite=len(esperado) + 5)
+    assert consulta["total"] == len(esperado)
+    assert como_tuplas(consulta["mejores"]) == esperado
+    assert como_tuplas(indice.consultar(asignatura, periodo, limite=7)["mejores"]) == esperado[:7]
+    for fila in random.Random(3).sample(esperado, min(50, len(esperado))):
+        assert como_tuplas([indice.consultar(asignatura, periodo, fila[1], limite=0)["estudiante"]]) == [fila]
+
+
+def test_estudiante_sin_notas_en_el_grupo(incremental):
+    indice, _ = incremental
+    assert indice.consultar("No existe", "2024-1", 1)["estudiante"] is None
+
+
+def test_reconstruido_desde_agregados_igual_al_incremental(incremental):
+    indice, notas = incremental
+    agregados = defaultdict(lambda: [Decimal(0), 0])
+    for estudiante_id, asignatura, periodo, calificacion in notas.values():
+        agregados[(estudiante_id, asignatura, periodo)][0] += calificacion
+        agregados[(estudiante_id, asignatura, periodo)][1] += 1
+    reconstruido = IndiceRanking()
+    reconstruido.construir([(e, a, p, suma, conteo) for (e, a, p), (suma, conteo) in agregados.items()])
+    assert reconstruido.promedios() == indice.promedios()
@@ -0,0 +1,92 @@
+"""
+Enrutamiento de lecturas a réplicas con conexiones falsas: round-robin, réplicas
+caídas, read-your-writes tras un commit y grupos de caché recién invalidados.
+"""
+import time
+
+import pytest
+
+from app import database
+from conftest import fabrica
+
+
+def leer(*grupos):
+    conn = database.get_read_connection(*grupos)
+    try:
+        return conn._raw.nombre
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def replicas(instalar_pool, monkeypatch):
+    """Primario y dos réplicas; devuelve el interruptor de caída de replica-b."""
+    monkeypatch.setattr(database, "DB_READ_YOUR_WRITES_SECONDS", 0.3)
+    monkeypatch.setattr(database, "DB_REPLICA_RETRY_SECONDS", 0.3)
+    instalar_pool()
+    caida_b = {"valor": False}
+    database.init_replicas([("replica-a", fabrica("replica-a")), ("replica-b", fabrica("replica-b", caida_b))])
+    return caida_b
+
+
+def caer(caida, indice):
+    caida["valor"] = True
+    # Las conexiones ya abiertas siguen sanas: se simula la caída cerrando su pool
+    database._lectores[indice].pool.close_all()
+
+
+def test_round_robin(replicas):
+    with database.sesion_lectura():
+        lecturas = [leer() for _ in range(4)]
+    assert sorted(lecturas) == ["replica-a", "replica-a", "replica-b", "replica-b"]
+
+
+def test_replica_caida_se_salta_y_se_recupera(replicas):
+    caer(replicas, 1)
+    with database.sesion_lectura():
+        assert {leer() for _ in range(4)} == {"replica-a"}
+
+    time.sleep(0.35)
+    replicas["valor"] = False
+    with database.sesion_lectura():
+        assert {leer() for _ in range(4)} == {"replica-a", "replica-b"}
+
+
+def test_lee_del_primario_tras_escribir(replicas):
+    caer(replicas, 1)
+    with database.sesion_lectura():
+        database.identificar_sesion(42)
+        assert leer() == "replica-a"
+        conn = database.get_db_connection()
+        conn.commit()
+        conn.close()
+        assert leer() == "primario"
+    with database.sesion_lectura():
+        database.identificar_sesion(42)
+        assert leer() == "primario"
+    with database.sesion_lectura():
+        database.identificar_sesion(7)
+        assert leer() == "replica-a"
+
+    time.sleep(0.35)
+    with database.sesion_lectura():
+        database.identificar_sesion(42)
+        assert leer() == "replica-a"
+
+
+def test_grupo_recien_invalidado_lee_del_primario(replicas):
+    caer(replicas, 1)
+    database.registrar_cambio("notas")
+    with database.sesion_lectura():
+        assert leer("notas") == "primario"
+        assert leer("usuarios") == "replica-a"
+
+    time.sleep(0.35)
+    with database.sesion_lectura():
+        assert leer("notas") == "replica-a"
+
+
+def test_sin_replicas_disponibles_lee_del_primario(replicas):
+    database.init_replicas([("replica-b", fabrica("replica-b", {"valor": True}))])
+    assert leer() == "primario"
+    assert not database.get_pool_stats()["replicas"][0]["disponible"]
@@ -0,0 +1,157 @@
+"""
+Generación de boletines e historiales sin base de datos: un archivo por estudiante
+con las notas de la tabla y del archivo de periodos cerrados, una consulta sin buffer
+por lote y el ZIP empaquetado en el pool de procesos.
+"""
+import csv
+import io
+import os
+import random
+import zipfile
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from app.utils import trabajos
+from app.utils.periodos import escribir_archivo
+from conftest import ConexionFalsa
+
+ESTUDIANTES = 500
+ASIGNATURAS = ["Matemáticas", "Física", "Química", "Historia"]
+
+
+class Tablas:
+    """Contenido de las tablas que leen los lotes."""
+
+    def __init__(self, estudiantes, notas):
+        self.estudiantes = estudiantes   # {id: (codigo, nombre)}
+        self.notas = notas               # [(estudiante_id, periodo, asignatura, calificacion)]
+        self.sin_buffer = 0
+
+    def conexion(self):
+        return ConexionFalsa(crear_cursor=lambda conexion, buffered=True, **kwargs: CursorTablas(self, buffered))
+
+
+class CursorTablas:
+    def __init__(self, tablas, buffered):
+        self._tablas = tablas
+        self._buffered = buffered
+        self._filas = []
+
+    def execute(self, sql, params=None):
+        params = list(params or [])
+        if "FROM estudiantes" in sql:
+            self._filas = [(i, *self._tablas.estudiantes[i]) for i in params if i in self._tablas.estudiantes]
+        else:
+            ids = set(params[:-1] if "periodo = %s" in sql else params)
+            periodo = params[-1] if "periodo = %s" in sql else None
+            self._filas = sorted((n for n in self._tablas.notas
+                                  if n[0] in ids and (periodo is None or n[1] == periodo)), key=lambda n: n[0])
+            self._tablas.sin_buffer += not self._buffered
+
+    def fetchall(self):
+        filas, self._filas = self._filas, []
+        return filas
+
+    def __iter__(self):
+        while self._filas:
+            yield self._filas.pop(0)
+
+    def close(self):
+        assert not self._filas, "Cursor cerrado con filas sin leer"
+
+
+def leer_filas(ruta):
+    with open(ruta, encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+
+def escribir_lotes(tablas, tipo, periodo, ids, archivos, directorio):
+    os.makedirs(directorio)
+    conexion = tablas.conexion()
+    for i in range(0, len(ids), trabajos.TRABAJOS_LOTE_ESTUDIANTES):
+        trabajos.escribir_lote(conexion, tipo, periodo, ids[i:i + trabajos.TRABAJOS_LOTE_ESTUDIANTES],
+                               archivos, directorio)
+    return sorted(os.listdir(directorio))
+
+
+@pytest.fixture
+def datos(tmp_path):
+    rnd = random.Random(5)
+    ids = list(range(1, ESTUDIANTES + 1))
+    estudiantes = {i: (f"EST/{i:05d}", f"Estudiante {i}") for i in ids}
+    notas = [(i, rnd.choice(["2024-1", "2024-2"]), rnd.choice(ASIGNATURAS), Decimal(rnd.randrange(0, 501)) / 100)
+             for i in ids for _ in range(rnd.randrange(0, 8))]
+    # 2023-2 está cerrado: sus notas solo están en el archivo columnar
+    inicio = datetime(2023, 8, 1)
+    archivadas = [(n, rnd.choice(ids), rnd.choice(ASIGNATURAS), Decimal(rnd.randrange(0, 501)) / 100, 1,
+                   inicio + timedelta(minutes=n)) for n in range(1, ESTUDIANTES * 3)]
+    borrado = ids[len(ids) // 2]
+    del estudiantes[borrado]
+
+    esperadas = defaultdict(list)
+    for estudiante_id, periodo, asignatura, calificacion in notas:
+        esperadas[estudiante_id].append((periodo, asignatura, float(calificacion)))
+    for _, estudiante_id, asignatura, calificacion, _, _ in archivadas:
+        esperadas[estudiante_id].append(("2023-2", asignatura, float(calificacion)))
+
+    ruta_archivo = str(tmp_path / "notas_2023-2.col")
+    escribir_archivo(ruta_archivo, "2023-2", archivadas)
+    return {"ids": ids, "borrado": borrado, "tablas": Tablas(estudiantes, notas), "archivadas": archivadas,
+            "esperadas": esperadas, "archivo": ruta_archivo}
+
+
+def test_historiales(datos, tmp_path):
+    tablas = datos["tablas"]
+    archivos = escribir_lotes(tablas, "historiales", "2024-1", datos["ids"], [datos["archivo"]],
+                              str(tmp_path / "historiales"))
+
+    assert len(archivos) == len(tablas.estudiantes)
+    assert tablas.sin_buffer == -(-len(datos["ids"]) // trabajos.TRABAJOS_LOTE_ESTUDIANTES)
+    assert all("/" not in a for a in archivos)
+    assert f"EST_{datos['borrado']:05d}_{datos['borrado']}.csv" not in archivos
+
+    # Notas de la tabla y del periodo cerrado, agrupadas por periodo y asignatura
+    for estudiante_id in random.Random(5).sample(sorted(tablas.estudiantes), 50):
+        filas = leer_filas(str(tmp_path / "historiales" / f"EST_{estudiante_id:05d}_{estudiante_id}.csv"))
+        detalle = {(f[0], f[1]): (int(f[2]), float(f[3])) for f in filas[5:] if len(f) == 7}
+        grupos = defaultdict(list)
+        for periodo, asignatura, calificacion in datos["esperadas"][estudiante_id]:
+            grupos[(periodo, asignatura)].append(calificacion)
+        assert detalle == {k: (len(v), round(sum(v) / len(v), 2)) for k, v in grupos.items()}
+        assert filas[1] == ["Estudiante", f"Estudiante {estudiante_id}"]
+
+
+def test_boletin_de_periodo_cerrado(datos, tmp_path):
+    # Solo el archivo: la tabla no tiene notas de 2023-2
+    con_notas = sorted({a[1] for a in datos["archivadas"]} - {datos["borrado"]})
+    escribir_lotes(datos["tablas"], "boletines", "2023-2", con_notas[:100], [datos["archivo"]],
+                   str(tmp_path / "boletines"))
+
+    estudiante_id = con_notas[0]
+    filas = leer_filas(str(tmp_path / "boletines" / f"EST_{estudiante_id:05d}_{estudiante_id}.csv"))
+    conteo = sum(int(f[1]) for f in filas[6:] if len(f) == 6 and f[0] != "Promedio general")
+    assert filas[3] == ["Periodo", "2023-2"]
+    assert conteo == sum(1 for p, _, _ in datos["esperadas"][estudiante_id] if p == "2023-2")
+
+
+def test_zip_desde_el_pool_de_procesos(datos, tmp_path):
+    directorio = str(tmp_path / "historiales")
+    archivos = escribir_lotes(datos["tablas"], "historiales", "2024-1", datos["ids"][:50], [datos["archivo"]],
+                              directorio)
+    destino = str(tmp_path / "resultado.zip")
+    try:
+        # Pool real (spawn): el proceso hijo tiene que poder importar el módulo
+        tamano = trabajos._get_procesos().submit(trabajos.empaquetar, directorio, destino).result()
+    finally:
+        trabajos.detener_trabajos()
+
+    with zipfile.ZipFile(destino) as paquete:
+        nombres = sorted(paquete.namelist())
+        primero = io.TextIOWrapper(paquete.open(nombres[0]), encoding="utf-8").readline().strip()
+    assert nombres == archivos
+    assert not os.path.exists(directorio)
+    assert tamano == os.path.getsize(destino)
+    assert primero == "Historial académico"